@@ -0,0 +1,45 @@
+"""scrape jobs
+
+Revision ID: 3b7f1c2d9a10
+Revises: e8cd8777f74f
+Create Date: 2026-10-19 10:12:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7f1c2d9a10'
+down_revision: Union[str, Sequence[str], None] = 'e8cd8777f74f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('scrape_jobs',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('started_by', sa.String(length=50), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('start_time', sa.DateTime(), nullable=True),
+    sa.Column('end_time', sa.DateTime(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('pages_scraped', sa.Integer(), nullable=False),
+    sa.Column('books_scraped', sa.Integer(), nullable=False),
+    sa.Column('books_total', sa.Integer(), nullable=True),
+    sa.Column('progress', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_scrape_jobs_status'), 'scrape_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_scrape_jobs_status'), table_name='scrape_jobs')
+    op.drop_table('scrape_jobs')
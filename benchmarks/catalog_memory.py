@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Relatório de memória do catálogo em memória: bytes por livro com os tipos
+# inferidos do CSV (antes) e com o schema compacto de Extract.compact_catalog (depois).
+# Uso: python benchmarks/catalog_memory.py [linhas]   (padrão: 1.000.000)
+
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+
+from benchmarks.synthetic import make_catalog
+from services.resources.Extract import compact_catalog
+
+
+def column_bytes(df: pd.DataFrame) -> dict:
+    return {col: int(v) for col, v in df.memory_usage(deep=True, index=False).items()}
+
+
+def main(rows: int):
+    started = time.perf_counter()
+    buf = io.StringIO()
+    make_catalog(rows).to_csv(buf, index=False)
+    buf.seek(0)
+    before = pd.read_csv(buf)  # mesmos tipos que o Extract via antes (inferidos do CSV)
+    print(f"[INFO] {rows} livros sintéticos gerados em {time.perf_counter() - started:.1f}s")
+
+    after = compact_catalog(before)
+
+    b, a = column_bytes(before), column_bytes(after)
+    report = {
+        "rows": rows,
+        "bytes_per_book_before": round(sum(b.values()) / rows, 1),
+        "bytes_per_book_after": round(sum(a.values()) / rows, 1),
+        "total_mb_before": round(sum(b.values()) / 2**20, 1),
+        "total_mb_after": round(sum(a.values()) / 2**20, 1),
+        "columns": {
+            col: {"dtype_before": str(before[col].dtype), "dtype_after": str(after[col].dtype),
+                  "bytes_per_book_before": round(b[col] / rows, 1),
+                  "bytes_per_book_after": round(a[col] / rows, 1)}
+            for col in before.columns
+        },
+    }
+
+    print(f"{'coluna':<14}{'antes':>18}{'depois':>24}{'B/livro':>16}")
+    for col, c in report["columns"].items():
+        print(f"{col:<14}{c['dtype_before']:>18}{c['dtype_after']:>24}"
+              f"{c['bytes_per_book_before']:>8} -> {c['bytes_per_book_after']:<6}")
+    print(f"[OK] bytes/livro: {report['bytes_per_book_before']} -> {report['bytes_per_book_after']} "
+          f"({report['total_mb_before']} MB -> {report['total_mb_after']} MB)")
+    print(json.dumps({k: v for k, v in report.items() if k != "columns"}))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+# Teste de carga das rotas da API contra um servidor local.
+# Para cada tamanho de catálogo: gera livros sintéticos (benchmarks/synthetic.py),
+# publica a silver num diretório temporário (com histórico e tabela de vizinhos),
+# sobe o app num processo separado apontando para ela e mede cada rota em
+# sequência, com N conexões concorrentes durante D segundos. Reporta vazão,
+# latência (p50/p90/p99/máx), status HTTP e RSS do servidor (no fim de cada rota
+# e o pico), e grava tudo em JSON para comparar com uma execução anterior.
+# Ficam de fora trigger/cancel/resume do scraping, que fariam um crawl real, e
+# /auth/refresh, que exige refresh token e o login não emite um.
+#
+# Uso: python benchmarks/load_test.py [--rows 1000 100000 1000000] [--concurrency 8]
+#          [--duration 5] [--routes books,search,...] [--out resultado.json]
+#          [--baseline base.json] [--max-regression 0.25]
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+import numpy as np
+
+from benchmarks.synthetic import make_catalog, WORDS
+import services.pipeline.history as history
+import services.scraper.transformers.clean_books as books_cleaner
+from services.ml import similar
+
+USERNAME, PASSWORD = "bench", "bench-password"
+READY_TIMEOUT = 600
+REQUEST_TIMEOUT = 300
+
+# Servidor: cria o usuário do benchmark e sobe o servidor WSGI do Flask com threads
+SERVER = """
+import logging, os
+import services.api.src.app as m
+logging.getLogger().setLevel(os.environ.get("BENCH_LOG_LEVEL", "WARNING"))
+with m.app.app_context():
+    m.db.create_all()
+    if m.User.find_by_username(os.environ["BENCH_USER"]) is None:
+        user = m.User(username=os.environ["BENCH_USER"])
+        user.set_password(os.environ["BENCH_PASSWORD"])
+        m.db.session.add(user)
+        m.db.session.commit()
+m.app.run(host="127.0.0.1", port=int(os.environ["PORT"]), threaded=True)
+"""
+
+
+def _books_sample(rng, ctx, n):
+    return [ctx["sample"][rng.randrange(len(ctx["sample"]))] for _ in range(n)]
+
+
+# rota -> função (rng, contexto) -> (método, caminho, corpo JSON ou None)
+ROUTES = {
+    "home": lambda rng, ctx: ("GET", "/", None),
+    "health": lambda rng, ctx: ("GET", "/api/v1/health", None),
+    "ready": lambda rng, ctx: ("GET", "/api/v1/ready", None),
+    "apispec": lambda rng, ctx: ("GET", "/apispec.json", None),
+    "login": lambda rng, ctx: ("POST", "/api/v1/auth/login", {"username": USERNAME, "password": PASSWORD}),
+    "books": lambda rng, ctx: ("GET", "/api/v1/books", None),
+    "book": lambda rng, ctx: ("GET", f"/api/v1/books/{rng.choice(ctx['ids'])}", None),
+    "batch": lambda rng, ctx: ("POST", "/api/v1/books/batch", {"ids": rng.sample(ctx["ids"], 50)}),
+    "query": lambda rng, ctx: ("GET", f"/api/v1/books/query?category={quote(rng.choice(ctx['categories']))}"
+                                      f"&min_rating={rng.randint(1, 5)}&limit=50", None),
+    "suggest": lambda rng, ctx: ("GET", f"/api/v1/books/suggest?q={rng.choice(WORDS)[:3]}", None),
+    "search": lambda rng, ctx: ("GET", f"/api/v1/books/search?title={rng.choice(WORDS)}", None),
+    "categories": lambda rng, ctx: ("GET", "/api/v1/categories", None),
+    "top_rated": lambda rng, ctx: ("GET", "/api/v1/books/top-rated", None),
+    "price_range": lambda rng, ctx: (lambda low: ("GET", f"/api/v1/books/price-range?min={low:.2f}"
+                                                          f"&max={low + 1:.2f}", None))(rng.uniform(10, 59)),
+    "stats_overview": lambda rng, ctx: ("GET", "/api/v1/stats/overview", None),
+    "stats_categories": lambda rng, ctx: ("GET", "/api/v1/stats/categories", None),
+    "changes": lambda rng, ctx: ("GET", f"/api/v1/books/changes?since={ctx['version']}", None),
+    "similar": lambda rng, ctx: ("GET", f"/api/v1/books/{rng.choice(ctx['ids'])}/similar?k=10", None),
+    "history": lambda rng, ctx: ("GET", f"/api/v1/books/{rng.choice(ctx['ids'])}/history", None),
+    "price_changes": lambda rng, ctx: ("GET", f"/api/v1/stats/price-changes?since={ctx['today']}", None),
+    "export": lambda rng, ctx: ("GET", "/api/v1/export?format=parquet", None),
+    "export_columns": lambda rng, ctx: ("GET", "/api/v1/export?format=arrow&columns=id,raw_price", None),
+    "training_data": lambda rng, ctx: ("GET", f"/api/v1/ml/training-data?limit=100"
+                                              f"&offset={rng.randrange(ctx['rows'])}", None),
+    "predictions": lambda rng, ctx: ("POST", "/api/v1/ml/predictions", {"books": _books_sample(rng, ctx, 10)}),
+    "scraping_status": lambda rng, ctx: ("GET", "/api/v1/scraping/status", None),
+    "analytics": lambda rng, ctx: ("GET", "/api/v1/analytics", None),
+    "dashboard": lambda rng, ctx: ("GET", "/dashboard", None),
+}
+
+# Status esperados além do 200 (o resto conta como erro)
+EXPECTED = {"login": {200, 503}}  # 503 = pool de hash cheio, recusa prevista
+
+
+def prepare(rows: int, workdir: Path) -> dict:
+    """Publica a silver sintética, o histórico e a tabela de vizinhos; retorna o contexto das rotas."""
+    started = time.perf_counter()
+    df = make_catalog(rows)
+    silver = workdir / "silver"
+    manifest = books_cleaner.publish(df, silver)
+
+    # Mesmo cálculo do pipeline (books_pipeline), em qualquer tamanho de catálogo
+    neighbours_started = time.perf_counter()
+    positions, scores = similar.build_neighbours(df)
+    similar.save_neighbours(df, positions, scores, manifest["version"], silver)
+    print(f"[INFO] Vizinhos de {rows} livros calculados em {time.perf_counter() - neighbours_started:.1f}s")
+    history.append_snapshot(df, datetime.now(), manifest["version"], workdir / "history")
+
+    sample = df.sample(min(rows, 1000), random_state=1)
+    print(f"[INFO] Silver com {rows} livros preparada em {time.perf_counter() - started:.1f}s")
+    return {
+        "rows": rows,
+        "version": manifest["version"],
+        "ids": df["id"].sample(min(rows, 10_000), random_state=2).tolist(),
+        "categories": sorted(df["category"].unique().tolist()),
+        "sample": sample[["title", "category", "raw_price", "instock"]].to_dict(orient="records"),
+        "today": datetime.now().date().isoformat(),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _proc_kb(pid: int, key: str) -> int | None:
+    # VmRSS / VmHWM (pico) do processo, só em Linux
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _mb(kb: int | None) -> float | None:
+    return round(kb / 1024, 1) if kb is not None else None
+
+
+class Server:
+    """Processo do app servindo a silver sintética; pronto quando /api/v1/ready responde 200."""
+
+    def __init__(self, workdir: Path):
+        self.port = _free_port()
+        self.log = open(workdir / "server.log", "w")
+        env = dict(
+            os.environ, PYTHONPATH=ROOT, PORT=str(self.port),
+            DATABASE_URL=f"sqlite:///{workdir / 'bench.db'}",
+            CATALOG_CSV_PATH=str(workdir / "silver" / "books.csv"),
+            HISTORY_DIR=str(workdir / "history"),
+            ML_FEATURES_DIR=str(workdir / "features"),
+            ML_MODEL_PATH=str(workdir / "models" / "rating_ridge.npz"),
+            API_WARMUP="sync", API_RATE_LIMIT="off",
+            LOGIN_USER_BURST="1000000", LOGIN_USER_PER_MINUTE="1000000",
+            LOGIN_IP_BURST="1000000", LOGIN_IP_PER_MINUTE="1000000",
+            BENCH_USER=USERNAME, BENCH_PASSWORD=PASSWORD,
+        )
+        started = time.perf_counter()
+        self.process = subprocess.Popen([sys.executable, "-c", SERVER], cwd=ROOT, env=env,
+                                        stdout=self.log, stderr=subprocess.STDOUT)
+        self._wait_ready()
+        self.startup_s = round(time.perf_counter() - started, 2)
+
+    def _wait_ready(self):
+        deadline = time.perf_counter() + READY_TIMEOUT
+        while time.perf_counter() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Servidor encerrou (código {self.process.returncode}); veja {self.log.name}")
+            try:
+                status, _ = self.request("GET", "/api/v1/ready")
+                if status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise TimeoutError("Servidor não ficou pronto a tempo")
+
+    def request(self, method, path, body=None, token=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=REQUEST_TIMEOUT)
+        try:
+            conn.request(method, path, *_encode(body, token))
+            response = conn.getresponse()
+            return response.status, response.read()
+        finally:
+            conn.close()
+
+    def login(self) -> str:
+        status, data = self.request("POST", "/api/v1/auth/login", {"username": USERNAME, "password": PASSWORD})
+        if status != 200:
+            raise RuntimeError(f"Login do benchmark falhou ({status}): {data[:200]!r}")
+        return json.loads(data)["access_token"]
+
+    def rss_mb(self) -> float | None:
+        return _mb(_proc_kb(self.process.pid, "VmRSS"))
+
+    def peak_rss_mb(self) -> float | None:
+        return _mb(_proc_kb(self.process.pid, "VmHWM"))
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+def _encode(body, token) -> tuple:
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    if body is None:
+        return None, headers
+    headers["Content-Type"] = "application/json"
+    return json.dumps(body).encode("utf-8"), headers
+
+
+def _worker(port, token, route, ctx, deadline, seed, out):
+    # Uma conexão keep-alive por worker; reconecta se o servidor fechar
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=REQUEST_TIMEOUT)
+    rng = random.Random(seed)
+    latencies, statuses, received = [], {}, 0
+    while time.perf_counter() < deadline:
+        method, path, body = route(rng, ctx)
+        payload, headers = _encode(body, token)
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, payload, headers)
+            response = conn.getresponse()
+            received += len(response.read())
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            status = "conn_error"
+        latencies.append(time.perf_counter() - started)
+        statuses[status] = statuses.get(status, 0) + 1
+    conn.close()
+    out.append((latencies, statuses, received))
+
+
+def run_route(server: Server, token: str, name: str, ctx: dict, concurrency: int, duration: float) -> dict:
+    out = []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    threads = [threading.Thread(target=_worker, args=(server.port, token, ROUTES[name], ctx, deadline, i, out))
+               for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array([x for lat, _, _ in out for x in lat]) * 1000
+    statuses = {}
+    for _, st, _ in out:
+        for code, n in st.items():
+            statuses[str(code)] = statuses.get(str(code), 0) + n
+    expected = {str(c) for c in EXPECTED.get(name, {200})}
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) if len(latencies) else (0, 0, 0)
+    return {
+        "requests": int(len(latencies)),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(p50), 2),
+        "p90_ms": round(float(p90), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(latencies.max()), 2) if len(latencies) else 0,
+        "mb_per_s": round(sum(r for _, _, r in out) / elapsed / 2**20, 2),
+        "status": statuses,
+        "errors": sum(n for code, n in statuses.items() if code not in expected),
+        "server_rss_mb": server.rss_mb(),
+    }
+
+
+def run_size(rows: int, routes: list[str], concurrency: int, duration: float) -> dict:
+    with tempfile.TemporaryDirectory(prefix=f"load_{rows}_") as tmp:
+        workdir = Path(tmp)
+        ctx = prepare(rows, workdir)
+        server = Server(workdir)
+        try:
+            print(f"[INFO] Servidor pronto em {server.startup_s}s (porta {server.port}, RSS {server.rss_mb()} MB)")
+            token = server.login()
+            result = {"rows": rows, "concurrency": concurrency, "duration_s": duration,
+                      "startup_s": server.startup_s, "routes": {}}
+            print(f"{'rota':<18}{'req/s':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'máx ms':>10}"
+                  f"{'erros':>7}{'RSS MB':>9}")
+            for name in routes:
+                r = result["routes"][name] = run_route(server, token, name, ctx, concurrency, duration)
+                print(f"{name:<18}{r['rps']:>9}{r['p50_ms']:>10}{r['p90_ms']:>10}{r['p99_ms']:>10}"
+                      f"{r['max_ms']:>10}{r['errors']:>7}{r['server_rss_mb'] or '-':>9}")
+            result["peak_rss_mb"] = server.peak_rss_mb()
+            print(f"[OK] {rows} livros | pico de RSS do servidor: {result['peak_rss_mb']} MB")
+            return result
+        finally:
+            server.stop()
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Compara vazão e p99 por (tamanho, rota) com uma execução anterior; retorna as regressões."""
+    base = {(r["rows"], name): m for r in baseline["results"] for name, m in r["routes"].items()}
+    regressions = []
+    for r in results["results"]:
+        for name, m in r["routes"].items():
+            old = base.get((r["rows"], name))
+            if old is None or not old["rps"] or not old["p99_ms"]:
+                continue
+            rps = m["rps"] / old["rps"] - 1
+            p99 = m["p99_ms"] / old["p99_ms"] - 1
+            flag = rps < -max_regression or p99 > max_regression
+            print(f"{'[WARN]' if flag else '[OK]  '} {r['rows']:>8} {name:<18} req/s {old['rps']} -> {m['rps']} "
+                  f"({rps:+.0%}) | p99 {old['p99_ms']} -> {m['p99_ms']} ms ({p99:+.0%})")
+            if flag:
+                regressions.append(f"{r['rows']}:{name}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga das rotas da API")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="segundos por rota")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="rotas separadas por vírgula")
+    parser.add_argument("--out", help="grava o resultado em JSON neste arquivo")
+    parser.add_argument("--baseline", help="resultado anterior (JSON) para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="queda de vazão ou alta do p99 tolerada (fração)")
+    args = parser.parse_args(argv)
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = [r for r in routes if r not in ROUTES]
+    if unknown:
+        parser.error(f"rotas desconhecidas: {', '.join(unknown)} (disponíveis: {', '.join(ROUTES)})")
+
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": [run_size(rows, routes, args.concurrency, args.duration) for rows in args.rows],
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"[OK] Resultado em {args.out}")
+
+    regressions = []
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text(encoding="utf-8")),
+                              args.max_regression)
+        if regressions:
+            print(f"[WARN] Regressões acima de {args.max_regression:.0%}: {', '.join(regressions)}")
+    print(json.dumps(results))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
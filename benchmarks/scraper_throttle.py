@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# Throttle adaptativo do scraper contra um books.toscrape.com local (stand-in),
+# com latência e capacidade injetáveis. O servidor atende no máximo --capacity
+# requisições por vez (as demais esperam na fila, como um servidor saturado) e
+# responde 429 com Retry-After quando a fila passa de --max-queue.
+# Compara o throttle adaptativo com concorrência fixa.
+# Uso: python benchmarks/scraper_throttle.py [--latency-ms 30] [--capacity 4] [--fixed 8]
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import services.scraper.extractors.scrape_books as scrape_books
+from services.scraper.extractors.transport import AdaptiveThrottle, CONCURRENCY
+
+BOOKS_PER_PAGE = 20
+
+
+def _listing(category: str, page: int, pages: int) -> str:
+    items = "".join(
+        f'<li><h3><a href="../../../{category}-{page}-{i}/index.html" title="{category} {page} {i}">x</a></h3>'
+        f'<p class="star-rating Three"></p><p class="price_color">£{10 + i}.00</p></li>'
+        for i in range(BOOKS_PER_PAGE))
+    nxt = f'<li class="next"><a href="page-{page + 1}.html">next</a></li>' if page < pages else ""
+    return (f'<form class="form-horizontal"><strong>{BOOKS_PER_PAGE * pages}</strong> results</form>'
+            f'<li class="current">Page {page} of {pages}</li><ol class="row">{items}</ol><ul>{nxt}</ul>')
+
+
+class StandinSite:
+    """Site em miniatura servido em 127.0.0.1 com latência, capacidade e fila configuráveis."""
+
+    def __init__(self, categories: int, pages: int, latency_ms: float, jitter_ms: float,
+                 capacity: int, max_queue: int, retry_after: int):
+        self.categories = [f"cat{i}" for i in range(categories)]
+        self.pages = pages
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.slots = threading.BoundedSemaphore(capacity)
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.waiting = 0
+        self.stats = {"requests": 0, "rejected_429": 0, "max_waiting": 0}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def page(self, path: str) -> str:
+        if path in ("/", "/index.html"):
+            links = "".join(f'<li><a href="catalogue/category/books/{c}/index.html">{c}</a></li>'
+                            for c in self.categories)
+            total = len(self.categories) * self.pages * BOOKS_PER_PAGE
+            return (f'<form class="form-horizontal"><strong>{total}</strong> results</form>'
+                    f'<ul class="nav nav-list"><li><ul>{links}</ul></li></ul>')
+        parts = path.strip("/").split("/")
+        if len(parts) == 5 and parts[:3] == ["catalogue", "category", "books"]:
+            name = parts[4]
+            page = 1 if name == "index.html" else int(name.removeprefix("page-").removesuffix(".html"))
+            return _listing(parts[3], page, self.pages)
+        return ('<table class="table table-striped"><tr><th>UPC</th><td>upc</td></tr>'
+                '<tr><th>Availability</th><td>In stock (3 available)</td></tr></table>')
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, como o site real
+            # Cabeçalho e corpo num único write: sem isso, Nagle + ACK atrasado somam ~40 ms
+            wbufsize = 1 << 16
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with site._lock:
+                    site.stats["requests"] += 1
+                    rejected = site.waiting >= site.max_queue
+                    if rejected:
+                        site.stats["rejected_429"] += 1
+                    else:
+                        site.waiting += 1
+                        site.stats["max_waiting"] = max(site.stats["max_waiting"], site.waiting)
+                if rejected:
+                    return self._send(429, b"", {"Retry-After": str(site.retry_after)})  # segundos inteiros
+                try:
+                    with site.slots:
+                        time.sleep(max(0.0, site.latency + random.uniform(-site.jitter, site.jitter)))
+                finally:
+                    with site._lock:
+                        site.waiting -= 1
+                self._send(200, site.page(self.path).encode(), {"Content-Type": "text/html; charset=utf-8"})
+
+            def _send(self, status, body, headers):
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def crawl(site: StandinSite, throttle: AdaptiveThrottle, workdir: Path) -> dict:
+    scrape_books.BASE = site.url
+    scrape_books.START_URL = site.url + "index.html"
+    scrape_books.OUT_PATH = workdir / "books.csv"
+    scrape_books.CHECKPOINT_DIR = workdir / "_checkpoint"
+    scrape_books.IMAGES_DIR = workdir / "images"
+    scrape_books.throttle = throttle
+    site.stats.update(requests=0, rejected_429=0, max_waiting=0)
+
+    started = time.perf_counter()
+    df = scrape_books.main(resume=False)
+    elapsed = time.perf_counter() - started
+    snap = scrape_books.metrics.snapshot()
+    return {
+        "books": len(df),
+        "seconds": round(elapsed, 2),
+        "books_per_s": round(len(df) / elapsed, 1),
+        "product_p50_ms": snap["phases"]["network:product"]["p50_ms"],
+        "server": dict(site.stats),
+        "throttle": throttle.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--categories", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--capacity", type=int, default=4, help="requisições atendidas ao mesmo tempo")
+    parser.add_argument("--max-queue", type=int, default=6, help="fila acima disso recebe 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--fixed", type=int, default=CONCURRENCY, help="concorrência da rodada fixa (0 pula)")
+    args = parser.parse_args()
+
+    runs = {"adaptive": AdaptiveThrottle(max_concurrency=CONCURRENCY)}
+    if args.fixed:
+        runs[f"fixed_{args.fixed}"] = AdaptiveThrottle(min_concurrency=args.fixed, max_concurrency=args.fixed,
+                                                       initial=args.fixed, max_delay=0, slow_factor=float("inf"))
+    results = {}
+    with StandinSite(args.categories, args.pages, args.latency_ms, args.jitter_ms,
+                     args.capacity, args.max_queue, args.retry_after) as site:
+        for name, throttle in runs.items():
+            with tempfile.TemporaryDirectory() as tmp:
+                results[name] = crawl(site, throttle, Path(tmp))
+
+    for name, r in results.items():
+        print(f"{name:<10} {r['books']:>5} livros em {r['seconds']:>6}s ({r['books_per_s']} livros/s) | "
+              f"p50 produto {r['product_p50_ms']} ms | 429: {r['server']['rejected_429']} | "
+              f"concorrência final {r['throttle']['concurrency_limit']}")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Throughput de serialização das respostas de catálogo por encoder.
+# Uso: python benchmarks/serialization.py [tamanhos...]   (padrão: 1000 100000 1000000)
+
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import make_catalog
+from services.resources.Extract import compact_catalog
+from services.resources.encoders import ENCODERS, orjson
+
+
+def bench(encoder, df, min_time: float = 1.0) -> dict:
+    runs, elapsed, size = 0, 0.0, 0
+    while elapsed < min_time or runs < 2:
+        started = time.perf_counter()
+        size = len(encoder.encode(df))
+        elapsed += time.perf_counter() - started
+        runs += 1
+    per_run = elapsed / runs
+    return {"encoder": encoder.name, "rows": len(df), "seconds": round(per_run, 4),
+            "books_per_s": round(len(df) / per_run), "mb_per_s": round(size / per_run / 2**20, 1)}
+
+
+def main(sizes):
+    names = [n for n in ENCODERS if n != "orjson" or orjson is not None]
+    results = []
+    for rows in sizes:
+        df = compact_catalog(make_catalog(rows))
+        for name in names:
+            r = bench(ENCODERS[name](), df, min_time=0.5 if rows >= 1_000_000 else 1.0)
+            results.append(r)
+            print(f"{rows:>9} livros | {name:<9} | {r['seconds']:>8.4f}s | "
+                  f"{r['books_per_s']:>10} livros/s | {r['mb_per_s']:>6} MB/s")
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 100_000, 1_000_000])
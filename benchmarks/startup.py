@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Tempo de inicialização da API: import do app, primeira requisição,
+# /apispec.json (primeira e segunda) e warmup sem ML (catálogo da silver,
+# índices e respostas prontas), cada rodada num processo Python novo.
+# Uso: python benchmarks/startup.py [rodadas]   (padrão: 5)
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Módulos que não devem ser carregados só por importar o app
+LAZY_MODULES = ["bs4", "requests", "services.scraper.extractors.scrape_books",
+                "services.pipeline.books_pipeline", "services.ml.model", "pyarrow.parquet"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import services.api.src.app as app_module
+imported = time.perf_counter()
+loaded = [m for m in %r if m in sys.modules]
+client = app_module.app.test_client()
+assert client.get("/").status_code == 200
+first = time.perf_counter()
+assert client.get("/apispec.json").status_code == 200
+spec = time.perf_counter()
+assert client.get("/apispec.json").status_code == 200
+spec_cached = time.perf_counter()
+warmed = app_module.run_warmup(ml=False)
+warmup = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "first_request_s": first - imported,
+    "apispec_s": spec - first,
+    "apispec_cached_s": spec_cached - spec,
+    "warmup_s": warmup - spec_cached,
+    "warmed": warmed,
+    "loaded": loaded,
+}))
+""" % (LAZY_MODULES,)
+
+
+def run_once() -> dict:
+    env = dict(os.environ, PYTHONPATH=ROOT, API_WARMUP="off",
+               DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "startup.db"))
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(rounds: int):
+    runs = [run_once() for _ in range(rounds)]
+    result = {key: round(statistics.median(r[key] for r in runs) * 1000, 1)
+              for key in ("import_s", "first_request_s", "apispec_s", "apispec_cached_s", "warmup_s")}
+    result["eager_modules"] = sorted({m for r in runs for m in r["loaded"]})
+
+    print(f"import do app        {result['import_s']:>8} ms")
+    print(f"primeira requisição  {result['first_request_s']:>8} ms")
+    print(f"/apispec.json        {result['apispec_s']:>8} ms (gerado)")
+    print(f"/apispec.json        {result['apispec_cached_s']:>8} ms (em cache)")
+    print(f"warmup (sem ML)      {result['warmup_s']:>8} ms")
+    if not all(r["warmed"] for r in runs):
+        print("[WARN] Warmup falhou (a silver em data/silver existe?)")
+    if result["eager_modules"]:
+        print(f"[WARN] Carregados no import: {', '.join(result['eager_modules'])}")
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Gera catálogos sintéticos no schema da silver (data/silver/books.csv) para benchmarks.
+# Uso: python benchmarks/synthetic.py 100000 /tmp/books_100k.csv
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES = [
+    "travel", "mystery", "historical fiction", "sequential art", "classics", "philosophy",
+    "romance", "womens fiction", "fiction", "childrens", "religion", "nonfiction", "music",
+    "default", "science fiction", "sports and games", "add a comment", "fantasy", "new adult",
+    "young adult", "science", "poetry", "paranormal", "art", "psychology", "autobiography",
+    "parenting", "adult fiction", "humor", "horror", "history", "food and drink",
+    "christian fiction", "business", "biography", "thriller", "contemporary", "spirituality",
+    "academic", "self help", "historical", "christian", "suspense", "short stories", "novels",
+    "health", "politics", "cultural", "erotica", "crime",
+]
+
+WORDS = np.array((
+    "the a of and in to night house secret life love war city girl boy dark light story "
+    "last first world time king queen heart road sea river moon sun star dream shadow fire "
+    "ice garden book letter black white red blue golden silent lost found little great new "
+    "old winter summer journey home stranger wild empire ghost song blood stone glass iron"
+).split())
+
+
+def make_catalog(n: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    lengths = rng.integers(2, 7, size=n)
+    picks = rng.integers(0, len(WORDS), size=int(lengths.sum()))
+    words = WORDS[picks]
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    titles = [" ".join(words[bounds[i]:bounds[i + 1]]) for i in range(n)]
+
+    ids = [f"{t.replace(' ', '-')}_{i}" for i, t in enumerate(titles)]
+    urls = [f"https://books.toscrape.com/catalogue/{i}/index.html" for i in ids]
+    upcs = [f"{x:016x}" for x in rng.integers(0, 2**63 - 1, size=n, dtype=np.int64)]
+    images = [f"https://books.toscrape.com/media/cache/{u[:2]}/{u[2:4]}/{u}.jpg" for u in upcs]
+
+    return pd.DataFrame({
+        "title": titles,
+        "book_title": titles,
+        "category": np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), size=n)],
+        "raw_price": np.round(rng.uniform(10, 60, size=n), 2),
+        "rating": rng.integers(1, 6, size=n),
+        "product_url": urls,
+        "id": ids,
+        "instock": rng.integers(0, 23, size=n),
+        "UPC": upcs,
+        "image_url": images,
+        "image_path": np.nan,
+    })
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    out = sys.argv[2] if len(sys.argv) > 2 else f"books_{rows}.csv"
+    make_catalog(rows).to_csv(out, index=False, encoding="utf-8-sig")
+    print(f"[OK] {rows} livros em {out}")
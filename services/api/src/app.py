@@ -1,27 +1,69 @@
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request, exceptions
+import json
 import secrets
+import threading
+from concurrent.futures import TimeoutError as FuturesTimeout
 from datetime import timedelta, datetime
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, send_file, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from sqlalchemy import text
 from flasgger import Swagger
-import threading
 import time
+from time import perf_counter
 import sys
 import os
+from pathlib import Path
+
+import pandas as pd
 
 sys.path.append(
     os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..')))
 from services.database.models.base import db, User
-from services.resources.Extract import Extract
-import services.scraper.extractors.scrape_books as books_scraper
+from services.database.engine import engine_options, install_sqlite_pragmas
+from services.resources.Extract import Extract, NeighboursUnavailable
+from services.resources.encoders import get_encoder
+from services.resources.warmup import Warmup
+from services.auth.hashing import hasher, needs_rehash, HasherOverloaded
+from services.auth.rate_limit import ApiRateLimiter, KeyedRateLimiter
+from services.auth.admin import is_admin
+from services.monitoring import memory, profiling
+from services.monitoring.health import HealthProbe
+from services.jobs.scraping import scrape_jobs
+from services.jobs import events as scraping_events
+# Scraper (bs4, requests), pipeline, histórico/exportação (pyarrow) e ML são
+# importados dentro das rotas que os usam: o import do app fica só com o núcleo.
+
+
+class TimedEncoder:
+    """Encoder do catálogo com o tempo contado na fase "serialize" do perfil da requisição."""
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+        self.name = encoder.name
+
+    def encode(self, df) -> bytes:
+        with profiling.phase("serialize"):
+            return self.encoder.encode(df)
 
 
 extract = Extract()
+json_encoder = TimedEncoder(get_encoder())
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify contado na fase "serialize" quando a requisição está sendo perfilada."""
+
+    def response(self, *args, **kwargs):
+        with profiling.phase("serialize"):
+            return super().response(*args, **kwargs)
+
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
+app.json = TimedJSONProvider(app)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL", 'sqlite:///users.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# WAL, synchronous=NORMAL e pool dimensionado com pre-ping (ver services/database/engine.py)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 
 
 app.config['SECRET_KEY'] = secrets.token_hex(
@@ -29,6 +71,8 @@ app.config['SECRET_KEY'] = secrets.token_hex(
 app.config["JWT_SECRET_KEY"] = secrets.token_hex(32)  # Chave secreta para JWT
 
 db.init_app(app)
+with app.app_context():
+    install_sqlite_pragmas(db.engine)
 jwt = JWTManager(app)
 
 
@@ -83,6 +127,25 @@ swagger_config = {
 app.config["SWAGGER"] = swagger_config
 swagger = Swagger(app)
 
+# O spec só muda com o código: /apispec.json é gerado uma vez e servido como bytes prontos
+_apispec_body = None
+
+
+def _apispec() -> bytes:
+    global _apispec_body
+    if _apispec_body is None:
+        _apispec_body = app.json.dumps(swagger.get_apispecs("apispec")).encode("utf-8")
+    return _apispec_body
+
+
+def _cached_apispec():
+    response = Response(_apispec(), mimetype="application/json")
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+app.view_functions["flasgger.apispec"] = _cached_apispec
+
 #------------------- Tratativas de erro --------------------
 
 
@@ -118,6 +181,39 @@ def bad_request(error):
 #------------------- Endpoints Core --------------------
 
 
+# Listas de livros são serializadas direto do DataFrame (ver services/resources/encoders.py)
+def catalog_response(df, status=200):
+    return Response(json_encoder.encode(df), status=status, mimetype="application/json")
+
+
+def _json_bytes(data) -> bytes:
+    return app.json.dumps(data).encode("utf-8")
+
+
+def _render_categories() -> bytes:
+    categories = extract.get_categories()
+    return _json_bytes({"categories": categories, "total": len(categories)})
+
+
+# Respostas mais acessadas, renderizadas uma vez por versão do catálogo
+# (pré-renderizadas no warmup e descartadas junto com a versão na troca)
+HOT_RESPONSES = {
+    "books": lambda: json_encoder.encode(extract.load_books()),
+    "top_rated": lambda: json_encoder.encode(extract.get_books_top_rated(as_frame=True)),
+    "categories": lambda: _render_categories(),
+    "stats_overview": lambda: _json_bytes(extract.get_overview()),
+    "stats_categories": lambda: _json_bytes(extract.get_category_stats()),
+}
+
+
+def _hot_body(name: str) -> bytes:
+    return extract.snapshot().cached(f"response:{name}", lambda df: HOT_RESPONSES[name]())
+
+
+def hot_response(name: str):
+    return Response(_hot_body(name), status=200, mimetype="application/json")
+
+
 @app.route('/')
 def home():
     """
@@ -136,6 +232,7 @@ def home():
 
 #Retorna lista de livros
 @app.route('/api/v1/books', methods=['GET'])
+@memory.tracked("books")
 def get_books():
     """
 	Lista todos os livros
@@ -161,8 +258,7 @@ def get_books():
 	security:
 		- Bearer: []
 	"""
-    return jsonify(
-        extract.load_books().fillna("").to_dict(orient="records")), 200
+    return hot_response("books")
 
 
 # Retorna detalhes completos de um livro pelo id específico
@@ -195,8 +291,281 @@ def get_book(book_id):
     return jsonify({"msg": "Livro não encontrado!"}), 404
 
 
+# Busca vários livros por id numa única requisição
+BOOKS_BATCH_MAX = int(os.environ.get("BOOKS_BATCH_MAX", 100))
+
+
+@app.route('/api/v1/books/batch', methods=['POST'])
+def get_books_batch():
+    """
+	Recupera vários livros pelo ID em uma única chamada
+	---
+	tags:
+		- Books
+	parameters:
+		- in: body
+		  name: body
+		  required: true
+		  schema:
+			type: object
+			required:
+				- ids
+			properties:
+				ids:
+					type: array
+					items:
+						type: string
+					example: ["its-only-the-himalayas_981"]
+	responses:
+		200:
+			description: Livros encontrados (na ordem pedida) e ids ausentes
+			schema:
+				type: object
+				properties:
+					books:
+						type: array
+						items:
+							type: object
+					missing:
+						type: array
+						items:
+							type: string
+					count:
+						type: integer
+		400:
+			description: Corpo inválido ou ids acima do limite
+	security:
+		- Bearer: []
+	"""
+    data = request.get_json(silent=True) or {}
+    ids = data.get("ids")
+
+    if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+        return jsonify({"msg": "O campo ids deve ser uma lista de strings!"}), 400
+    if len(ids) > BOOKS_BATCH_MAX:
+        return jsonify({"msg": f"Máximo de {BOOKS_BATCH_MAX} ids por requisição!"}), 400
+
+    ids = list(dict.fromkeys(ids))  # remove repetidos mantendo a ordem
+    books, missing = extract.get_books_batch(ids)
+
+    body = (b'{"books":' + json_encoder.encode(books)
+            + b',"missing":' + json.dumps(missing).encode("utf-8")
+            + b',"count":' + str(len(books)).encode("ascii") + b'}')
+    return Response(body, status=200, mimetype="application/json")
+
+
+# Consulta facetada (categoria, rating mínimo, faixa de preço, disponibilidade)
+QUERY_MAX_LIMIT = int(os.environ.get("BOOKS_QUERY_MAX_LIMIT", 500))
+
+
+@app.route('/api/v1/books/query', methods=['GET'])
+def query_books():
+    """
+	Consulta combinada de livros com contagem de facetas
+	---
+	tags:
+		- Books
+	parameters:
+		- name: category
+		  in: query
+		  type: string
+		  required: false
+		  description: Uma ou mais categorias (separadas por vírgula ou parâmetro repetido)
+		- name: min_rating
+		  in: query
+		  type: integer
+		  required: false
+		- name: min_price
+		  in: query
+		  type: number
+		  required: false
+		- name: max_price
+		  in: query
+		  type: number
+		  required: false
+		- name: in_stock
+		  in: query
+		  type: boolean
+		  required: false
+		- name: limit
+		  in: query
+		  type: integer
+		  required: false
+		  default: 50
+		- name: offset
+		  in: query
+		  type: integer
+		  required: false
+		  default: 0
+	responses:
+		200:
+			description: Página de livros, total de resultados e facetas por categoria e rating
+			schema:
+				type: object
+				properties:
+					total:
+						type: integer
+					books:
+						type: array
+						items:
+							type: object
+					facets:
+						type: object
+		400:
+			description: Parâmetros inválidos
+	security:
+		- Bearer: []
+	"""
+    params = {}
+    for name, cast in (("min_rating", int), ("min_price", float), ("max_price", float),
+                       ("limit", int), ("offset", int)):
+        raw = request.args.get(name)
+        if raw is None or raw == "":
+            params[name] = None
+            continue
+        try:
+            params[name] = cast(raw)
+        except ValueError:
+            return jsonify({"msg": f"Parâmetro {name} inválido!"}), 400
+
+    limit = params["limit"] if params["limit"] is not None else 50
+    offset = params["offset"] or 0
+    if not 0 <= limit <= QUERY_MAX_LIMIT or offset < 0:
+        return jsonify({"msg": f"limit deve estar entre 0 e {QUERY_MAX_LIMIT} e offset >= 0!"}), 400
+
+    categories = [c.strip().lower() for value in request.args.getlist("category")
+                  for c in value.split(",") if c.strip()]
+    in_stock = request.args.get("in_stock", "").lower() in ("1", "true", "yes", "sim")
+
+    books, total, facets = extract.query_books(
+        categories=categories, min_rating=params["min_rating"],
+        min_price=params["min_price"], max_price=params["max_price"],
+        in_stock=in_stock, limit=limit, offset=offset)
+
+    body = (b'{"total":' + str(total).encode("ascii")
+            + b',"limit":' + str(limit).encode("ascii")
+            + b',"offset":' + str(offset).encode("ascii")
+            + b',"facets":' + json.dumps(facets).encode("utf-8")
+            + b',"books":' + json_encoder.encode(books) + b'}')
+    return Response(body, status=200, mimetype="application/json")
+
+
+# Autocomplete de títulos (uma chamada por tecla na interface)
+SUGGEST_MAX_LIMIT = int(os.environ.get("SUGGEST_MAX_LIMIT", 50))
+
+
+@app.route('/api/v1/books/suggest', methods=['GET'])
+def suggest_books():
+    """
+	Sugere títulos que começam com o texto digitado
+	---
+	tags:
+		- Books
+	parameters:
+		- name: q
+		  in: query
+		  type: string
+		  required: true
+		  description: Início do título ou de uma palavra do título
+		- name: limit
+		  in: query
+		  type: integer
+		  required: false
+		  default: 10
+	responses:
+		200:
+			description: Lista de sugestões (id e título)
+			schema:
+				type: array
+				items:
+					type: object
+					properties:
+						id:
+							type: string
+						title:
+							type: string
+		400:
+			description: Parâmetros inválidos
+	security:
+		- Bearer: []
+	"""
+    q = request.args.get("q", "")
+    limit = request.args.get("limit", 10, type=int)
+
+    if not q.strip():
+        return jsonify({"msg": "O parâmetro q é obrigatório!"}), 400
+    if not 1 <= limit <= SUGGEST_MAX_LIMIT:
+        return jsonify({"msg": f"limit deve estar entre 1 e {SUGGEST_MAX_LIMIT}!"}), 400
+
+    return jsonify(extract.suggest_titles(q, limit)), 200
+
+
+# Feed de alterações do catálogo para sincronização incremental
+@app.route('/api/v1/books/changes', methods=['GET'])
+def get_books_changes():
+    """
+	Livros adicionados, alterados e removidos desde uma versão do catálogo
+	---
+	tags:
+		- Books
+	parameters:
+		- name: since
+		  in: query
+		  type: integer
+		  required: true
+		  description: Última versão sincronizada pelo cliente (0 para tudo)
+	responses:
+		200:
+			description: Delta líquido até a versão atual, com os livros novos e alterados
+			schema:
+				type: object
+				properties:
+					since:
+						type: integer
+					version:
+						type: integer
+					added:
+						type: array
+						items:
+							type: string
+					changed:
+						type: array
+						items:
+							type: string
+					removed:
+						type: array
+						items:
+							type: string
+					books:
+						type: array
+						items:
+							type: object
+		400:
+			description: Parâmetro since inválido ou maior que a versão atual
+		410:
+			description: Histórico de alterações indisponível para o intervalo (ressincronizar via /api/v1/books)
+	security:
+		- Bearer: []
+	"""
+    since = request.args.get("since", type=int)
+    if since is None or since < 0:
+        return jsonify({"msg": "O parâmetro since deve ser uma versão (inteiro >= 0)!"}), 400
+
+    version, delta, books = extract.get_changes(since)
+    if delta is None:
+        if isinstance(version, int) and since > version:
+            return jsonify({"msg": f"Versão {since} ainda não existe (atual: {version})!"}), 400
+        return jsonify({"msg": "Histórico de alterações indisponível, ressincronize o catálogo completo!",
+                        "version": version}), 410
+
+    body = (json.dumps({"since": since, "version": version, **delta}).encode("utf-8")[:-1]
+            + b',"books":' + json_encoder.encode(books) + b'}')
+    return Response(body, status=200, mimetype="application/json")
+
+
 # Pesquisa livros por título e/ou categoria
 @app.route('/api/v1/books/search', methods=['GET'])
+@memory.tracked("search")
 def search_books():
     """
 	Busca livros por título e/ou categoria
@@ -232,7 +601,7 @@ def search_books():
 
     results = extract.search_books(title, category)
 
-    return results.fillna("").to_dict(orient="records"), 200
+    return catalog_response(results)
 
 
 # Lista todas as categorias de livros disponiveis
@@ -258,11 +627,7 @@ def get_categories():
 		}
 	"""
     try:
-        categories = extract.get_categories()
-        return jsonify({
-            "categories": categories,
-            "total": len(categories)
-        }), 200
+        return hot_response("categories")
 
     except FileNotFoundError:
         print(
@@ -292,29 +657,38 @@ def get_health():
 						type: string
 					database:
 						type: string
+					database_checked_at:
+						type: string
+						description: Momento da última checagem do banco (feita em background)
 					timestamp:
 						type: string
 	"""
-    try:
-        with db.engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        db_status = "Online"
-    except Exception as e:
-        db_status = "Offline"
-
+    probe = health_probe.result()
     health = {
         "status": "Ok",
-        "database": db_status,
+        "database": probe["database"],
+        "database_checked_at": probe["checked_at"],
         "timestamp": datetime.now().isoformat()
     }
     return jsonify(health), 200
 
 
+def _database_online() -> bool:
+    with app.app_context(), db.engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return True
+
+
+# Resultado do SELECT 1 renovado em background; o health só lê o cache
+health_probe = HealthProbe(_database_online)
+
+
 # #------------------- Endpoints de insights --------------------
 
 
 # Retorna total de livros, preço médio, e distribuição por rating
 @app.route('/api/v1/stats/overview', methods=['GET'])
+@memory.tracked("stats_overview")
 def get_stats_overview():
     """
 	Estatísticas gerais da coleção
@@ -329,12 +703,12 @@ def get_stats_overview():
 	security:
 		- Bearer: []
 	"""
-    stats = extract.get_overview()
-    return jsonify(stats), 200
+    return hot_response("stats_overview")
 
 
 # Estatísticas por categoria (lista de categorias com métricas)
 @app.route('/api/v1/stats/categories', methods=['GET'])
+@memory.tracked("stats_categories")
 def get_category_stats():
     """
 	Estatísticas por categoria
@@ -351,9 +725,159 @@ def get_category_stats():
 	security:
 		- Bearer: []
 	"""
+    return hot_response("stats_categories")
+
+
+def _history_frame(df):
+    df = df.copy()
+    df["scraped_at"] = df["scraped_at"].map(lambda ts: ts.isoformat())
+    return df
+
+
+# Livros parecidos (título, categoria, faixa de preço e rating), da tabela de vizinhos do ETL
+SIMILAR_MAX_K = int(os.environ.get("SIMILAR_MAX_K", 20))
+
+
+@app.route('/api/v1/books/<string:book_id>/similar', methods=['GET'])
+def get_similar_books(book_id):
+    """
+	Livros parecidos com um livro
+	---
+	tags:
+		- Books
+	parameters:
+		- name: book_id
+		  in: path
+		  type: string
+		  required: true
+		- name: k
+		  in: query
+		  type: integer
+		  required: false
+		  default: 10
+	responses:
+		200:
+			description: Até k livros parecidos, do mais ao menos parecido, com a nota (score)
+			schema:
+				type: object
+				properties:
+					id:
+						type: string
+					similar:
+						type: array
+						items:
+							type: object
+					scores:
+						type: array
+						items:
+							type: number
+		400:
+			description: Parâmetro k inválido
+		404:
+			description: Livro não encontrado
+		503:
+			description: Tabela de vizinhos da versão atual ainda não gerada (pipeline ou warmup)
+	security:
+		- Bearer: []
+	"""
+    k = request.args.get("k", 10, type=int)
+    if not 1 <= k <= SIMILAR_MAX_K:
+        return jsonify({"msg": f"k deve estar entre 1 e {SIMILAR_MAX_K}!"}), 400
+
+    try:
+        books, scores = extract.get_similar(book_id, k)
+    except NeighboursUnavailable:
+        response = jsonify({"msg": "Livros parecidos ainda não disponíveis para esta versão do catálogo."})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+    if books is None:
+        return jsonify({"msg": "Livro não encontrado!"}), 404
+
+    body = (b'{"id":' + json.dumps(book_id).encode("utf-8")
+            + b',"similar":' + json_encoder.encode(books)
+            + b',"scores":' + json.dumps([round(float(s), 4) for s in scores]).encode("ascii") + b'}')
+    return Response(body, status=200, mimetype="application/json")
+
+
+# Histórico de preço e estoque de um livro (um ponto por execução do pipeline)
+@app.route('/api/v1/books/<string:book_id>/history', methods=['GET'])
+def get_book_history(book_id):
+    """
+	Histórico de preço e estoque de um livro
+	---
+	tags:
+		- Books
+	parameters:
+		- name: book_id
+		  in: path
+		  type: string
+		  required: true
+	responses:
+		200:
+			description: Pontos (scraped_at, raw_price, instock) em ordem de coleta
+			schema:
+				type: object
+				properties:
+					id:
+						type: string
+					history:
+						type: array
+						items:
+							type: object
+		404:
+			description: Livro sem histórico
+	security:
+		- Bearer: []
+	"""
+    import services.pipeline.history as price_history
+
+    history = price_history.book_history(book_id)
+    if history.empty:
+        return jsonify({"msg": "Nenhum histórico para este livro!"}), 404
+
+    body = (b'{"id":' + json.dumps(book_id).encode("utf-8")
+            + b',"history":' + json_encoder.encode(_history_frame(history)) + b'}')
+    return Response(body, status=200, mimetype="application/json")
+
+
+# Mudanças de preço entre execuções desde uma data
+@app.route('/api/v1/stats/price-changes', methods=['GET'])
+def get_price_changes():
+    """
+	Mudanças de preço observadas desde uma data
+	---
+	tags:
+		- Stats
+	parameters:
+		- name: since
+		  in: query
+		  type: string
+		  required: true
+		  description: Data (AAAA-MM-DD) ou data e hora ISO
+	responses:
+		200:
+			description: Total de mudanças, altas, quedas e a lista de mudanças
+			schema:
+				type: object
+		400:
+			description: Parâmetro since inválido
+	security:
+		- Bearer: []
+	"""
+    import services.pipeline.history as price_history
+
+    since = price_history.parse_since(request.args.get("since"))
+    if since is None:
+        return jsonify({"msg": "O parâmetro since deve ser uma data ISO (AAAA-MM-DD)!"}), 400
+
+    changes = price_history.price_changes(since)
+    increases = int((changes["new_price"] > changes["old_price"]).sum())
+    summary = {"since": since.isoformat(), "total": len(changes),
+               "increases": increases, "decreases": len(changes) - increases}
 
-    stats_category = extract.get_category_stats()
-    return jsonify(stats_category), 200
+    body = (json.dumps(summary).encode("utf-8")[:-1]
+            + b',"changes":' + json_encoder.encode(_history_frame(changes)) + b'}')
+    return Response(body, status=200, mimetype="application/json")
 
 
 # Retorna os livros com a melhor avaliação
@@ -376,8 +900,7 @@ def get_top_rated():
 		- Bearer: []
 	"""
     try:
-        books = extract.get_books_top_rated()
-        return books, 200
+        return hot_response("top_rated")
     except Exception as e:
         print(e)
         return {"msg": "Erro interno ao retornar requisição!"}, 500
@@ -417,8 +940,8 @@ def get_price_range():
         min_value = request.args.get('min', type=float)
         max_value = request.args.get('max', type=float)
         if min_value is not None or max_value is not None:
-            books = extract.get_books_price_range(min_value, max_value)
-            return books, 200
+            books = extract.get_books_price_range(min_value, max_value, as_frame=True)
+            return catalog_response(books)
         else:
             return {
                 "msg":
@@ -429,7 +952,135 @@ def get_price_range():
         return {"msg": "Erro interno ao retornar requisição!"}, 500
 
 
+# Exportação em lote da silver em formato colunar (ou CSV)
+@app.route('/api/v1/export', methods=['GET'])
+def export_books():
+    """
+	Exporta o catálogo em Parquet, Arrow ou CSV
+	---
+	tags:
+		- Books
+	parameters:
+		- name: format
+		  in: query
+		  type: string
+		  enum: [parquet, arrow, csv]
+		  required: false
+		  default: parquet
+		- name: columns
+		  in: query
+		  type: string
+		  required: false
+		  description: Colunas separadas por vírgula (padrão todas)
+	produces:
+		- application/vnd.apache.parquet
+		- application/vnd.apache.arrow.stream
+		- text/csv
+	responses:
+		200:
+			description: Arquivo da silver publicada (ou stream com as colunas pedidas)
+		400:
+			description: Formato ou colunas inválidas
+	security:
+		- Bearer: []
+	"""
+    from services.resources import export as catalog_export
+
+    fmt = request.args.get("format", "parquet").lower()
+    if fmt not in catalog_export.FORMATS:
+        return jsonify({"msg": f"Formato inválido! Use: {', '.join(catalog_export.FORMATS)}"}), 400
+
+    snapshot = extract.snapshot()
+    silver_dir = Path(extract.csv_path).parent
+    available = catalog_export.source_schema(silver_dir, snapshot).names
+
+    columns = [c.strip() for c in request.args.get("columns", "").split(",") if c.strip()]
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        return jsonify({"msg": f"Colunas inexistentes: {', '.join(unknown)}"}), 400
+
+    name, mimetype = catalog_export.FORMATS[fmt]
+    download_name = f"books-v{snapshot.version}{Path(name).suffix}"
+
+    published = catalog_export.published_file(silver_dir, fmt)
+    if (not columns or columns == available) and published is not None:
+        # Arquivo publicado como está: send_file usa o file_wrapper (sendfile) do servidor
+        return send_file(published, mimetype=mimetype, as_attachment=True,
+                         download_name=download_name, conditional=True)
+
+    stream = catalog_export.stream_export(silver_dir, snapshot, fmt, columns or available)
+    return Response(stream, mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename={download_name}"})
+
+
 #------------------- Desafios adicionais (Bonus) --------------------
+# Limites de tentativas de login (token bucket por usuário e por IP)
+login_user_limiter = KeyedRateLimiter(
+    capacity=float(os.environ.get("LOGIN_USER_BURST", 5)),
+    per_minute=float(os.environ.get("LOGIN_USER_PER_MINUTE", 10)))
+login_ip_limiter = KeyedRateLimiter(
+    capacity=float(os.environ.get("LOGIN_IP_BURST", 20)),
+    per_minute=float(os.environ.get("LOGIN_IP_PER_MINUTE", 60)))
+
+
+def _too_many_attempts(retry_after):
+    response = jsonify({"error": "Muitas tentativas de login, tente novamente mais tarde"})
+    response.headers["Retry-After"] = str(max(1, int(retry_after + 0.999)))
+    return response, 429
+
+
+# Limite e cota por cliente (identidade do JWT; sem token, o IP), com custo por rota.
+# API_RATE_BACKEND=sqlite divide os buckets entre os workers da máquina (API_RATE_DB).
+API_RATE_LIMIT = os.environ.get("API_RATE_LIMIT", "on").lower() != "off"
+# Custo em tokens por endpoint; os demais custam 1
+ROUTE_COSTS = {
+    "get_books": 10, "export_books": 20, "get_training_data": 10,
+    "get_category_stats": 5, "get_stats_overview": 2, "search_books": 2,
+    "query_books": 2, "get_books_batch": 2,
+}
+# Health, readiness, login (tem limite próprio) e Swagger não consomem tokens
+RATE_EXEMPT = {"home", "get_health", "get_ready", "login", "static"}
+
+api_limiter = ApiRateLimiter(
+    burst=float(os.environ.get("API_RATE_BURST", 200)),
+    per_minute=float(os.environ.get("API_RATE_PER_MINUTE", 600)),
+    daily_quota=float(os.environ.get("API_DAILY_QUOTA", 100000)),
+    backend=os.environ.get("API_RATE_BACKEND", "memory").lower(),
+    path=os.environ.get("API_RATE_DB", str(Path(__file__).resolve().parents[3] / "data" / "ratelimit.db")),
+) if API_RATE_LIMIT else None
+
+
+def _enforce_rate_limit():
+    endpoint = request.endpoint
+    if api_limiter is None or endpoint is None or endpoint in RATE_EXEMPT or endpoint.startswith("flasgger."):
+        return None
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None  # token inválido: a própria rota responde 401
+    key = f"user:{identity}" if identity is not None else f"ip:{request.remote_addr or '-'}"
+
+    decision = api_limiter.check(key, ROUTE_COSTS.get(endpoint, 1))
+    g.rate_limit = decision
+    if not decision.allowed:
+        logger.warning(f"Limite de requisições ({decision.policy}) excedido para {key}")
+        response = jsonify({"error": "Limite de requisições excedido, tente novamente mais tarde",
+                            "policy": decision.policy})
+        response.headers["Retry-After"] = str(max(1, int(decision.retry_after + 0.999)))
+        return response, 429
+    return None
+
+
+def _rate_limit_headers(response):
+    decision = g.pop("rate_limit", None)
+    if decision is not None:
+        response.headers["RateLimit-Limit"] = str(int(decision.limit))
+        response.headers["RateLimit-Remaining"] = str(max(0, int(decision.remaining)))
+        response.headers["RateLimit-Reset"] = str(int(decision.reset + 0.999))
+        response.headers["RateLimit-Policy"] = api_limiter.policy_header()
+
+
 # Implementar autenticação JWT para proteger certos endpoints Desafio 1
 # Obter token JWT
 @app.route('/api/v1/auth/login', methods=['POST'])
@@ -465,6 +1116,10 @@ def login():
                         type: string
         401:
             description: Credenciais inválidas
+        429:
+            description: Limite de tentativas excedido (ver header Retry-After)
+        503:
+            description: Serviço de autenticação sobrecarregado
     """
     try:
         data = request.get_json()
@@ -478,12 +1133,39 @@ def login():
             return jsonify({"error":
                             "Username and password are required"}), 400
 
-        user = User.query.filter_by(username=username).first()
-
-        if not user or not user.check_password(password):
+        # Token bucket antes de qualquer hash: barra credential stuffing cedo
+        allowed, retry_after = login_ip_limiter.hit(request.remote_addr or "-")
+        if allowed:
+            allowed, retry_after = login_user_limiter.hit(username.lower())
+        if not allowed:
+            logger.warning(f"Limite de login excedido para o User:{username}")
+            return _too_many_attempts(retry_after)
+
+        user = User.find_by_username(username)
+
+        # O hash roda no pool dedicado, nunca na thread da requisição
+        try:
+            valid = hasher.verify(user, password)
+        except HasherOverloaded:
+            logger.warning("Pool de hash de senha saturado, login recusado")
+            response = jsonify({"error": "Serviço de autenticação sobrecarregado"})
+            response.headers["Retry-After"] = "1"
+            return response, 503
+
+        if not valid:
             logger.warning(f"Tentativa de login falhor para o User:{username}")
             return jsonify({"error": "Credenciais inválidas"}), 401
 
+        # Parâmetros de hash mudaram desde o cadastro: regrava com o método atual
+        if needs_rehash(getattr(user, "password_hash", None)):
+            try:
+                user.password_hash = hasher.hash(password)
+                db.session.commit()
+                logger.info(f"Hash de senha atualizado para o usuario: {username}")
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Falha ao atualizar hash de senha: {e}")
+
         # user = db.session.query(User).filter_by(username=username).first()
         # if not user or user.password != password:  # futuramente use hash
         #     return jsonify({"error": "Invalid credentials"}), 401
@@ -520,15 +1202,23 @@ def login():
         }), 500
 
 
-# Variável global pra controlar o status do scraping
-scraping_status = {
-    "running": False,
-    "started_by": None,
-    "start_time": None,
-    "end_time": None,
-    "books_scraped": 0,
-    "error": None
-}
+# Jobs de scraping persistidos no banco (estado compartilhado entre workers).
+# Cada job roda o pipeline completo e, ao publicar, troca o catálogo em memória.
+def _on_catalog_published(manifest):
+    snapshot = extract.reload()
+    logger.info(f"Catálogo atualizado para a versão {snapshot.version}")
+    if WARMUP_MODE != "off":
+        # Aquece a nova versão antes da próxima requisição pagar a construção
+        warmup.run(_warmup_steps(ml=False), version=lambda: extract.snapshot().version)
+
+
+def _run_pipeline(progress, resume):
+    import services.pipeline.books_pipeline as books_pipeline
+
+    return books_pipeline.run(progress=progress, on_publish=_on_catalog_published, resume=resume)
+
+
+scrape_jobs.init_app(app, target=_run_pipeline)
 
 
 # Executa mais uma extração, por web Scrapping
@@ -536,56 +1226,26 @@ scraping_status = {
 @jwt_required()
 def trigger_scraping():
     """
-    Dispara o scraping de livros manualmente.
+    Dispara o pipeline de livros (scraping, limpeza e publicação da silver).
     ---
     tags:
         - Scraping
     responses:
         200:
             description: Scraping iniciado com sucesso.
+        400:
+            description: Já existe um scraping em execução.
     """
     try:
         current_user = get_jwt_identity()
 
-        if scraping_status["running"]:
+        job = scrape_jobs.enqueue(current_user)
+        if job is None:
             return jsonify({"message": "Scraping já está em execução!"}), 400
 
-        def run_scraping():
-            try:
-                scraping_status.update({
-                    "running": True,
-                    "started_by": current_user,
-                    "start_time": datetime.now().isoformat(),
-                    "end_time": None,
-                    "error": None,
-                    "books_scraped": 0
-                })
-                print(f"[SCRAPER] Iniciado por {current_user} às {scraping_status['start_time']}")
-
-                # Executa o scraping real
-                books_scraper.main()
-
-                # Após o término, lê o CSV pra contabilizar livros
-                import pandas as pd
-                df = pd.read_csv(books_scraper.OUT_PATH, encoding="utf-8-sig")
-                scraping_status["books_scraped"] = len(df)
-
-                scraping_status["end_time"] = datetime.now().isoformat()
-                scraping_status["running"] = False
-                print("[SCRAPER] Finalizado com sucesso!")
-            except Exception as e:
-                scraping_status.update({
-                    "running": False,
-                    "error": str(e),
-                    "end_time": datetime.now().isoformat()
-                })
-                print(f"[SCRAPER] Erro: {e}")
-
-        # Dispara thread
-        threading.Thread(target=run_scraping, daemon=True).start()
-
         return jsonify({
             "message": "Scraping iniciado com sucesso.",
+            "job_id": job.id,
             "started_by": current_user,
             "status": "em execução"
         }), 200
@@ -602,12 +1262,111 @@ def get_scraping_status():
     ---
     tags:
         - Scraping
+    parameters:
+        - name: job_id
+          in: query
+          type: integer
+          required: false
+          description: Job específico (padrão é o mais recente)
+    responses:
+        200:
+            description: Status do job, com progresso por categoria, throughput e ETA.
+    """
+    job_id = request.args.get("job_id", type=int)
+    job = scrape_jobs.get(job_id) if job_id else scrape_jobs.latest()
+    if job is None:
+        if job_id:
+            return jsonify({"msg": "Job não encontrado!"}), 404
+        return jsonify({"running": False, "status": None, "books_scraped": 0}), 200
+    return jsonify(job.to_dict()), 200
+
+
+@app.route("/api/v1/scraping/events", methods=["GET"])
+@jwt_required()
+def get_scraping_events():
+    """
+    Stream (Server-Sent Events) do progresso de um job de scraping.
+    ---
+    tags:
+        - Scraping
+    produces:
+        - text/event-stream
+    parameters:
+        - name: job_id
+          in: query
+          type: integer
+          required: false
+          description: Job específico (padrão é o mais recente)
+        - name: Last-Event-ID
+          in: header
+          type: integer
+          required: false
+          description: Último evento recebido; a reconexão continua a partir dele
     responses:
         200:
-            description: Status atual do scraping.
+            description: "Eventos snapshot, started, stage, crawl_started, category_started, page_done, category_finished, error, published, status e finished (fim do stream)"
+        404:
+            description: Nenhum job encontrado
     """
-    return jsonify(scraping_status), 200
+    job_id = request.args.get("job_id", type=int)
+    job = scrape_jobs.get(job_id) if job_id else scrape_jobs.latest()
+    if job is None:
+        return jsonify({"msg": "Job não encontrado!"}), 404
+    job_id = job.id
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    db.session.commit()  # não segura a transação de leitura durante o stream
 
+    body = scraping_events.stream(scrape_jobs.events, job_id, lambda: scrape_jobs.state(job_id), last_id)
+    return Response(stream_with_context(body), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/api/v1/scraping/cancel", methods=["POST"])
+@jwt_required()
+def cancel_scraping():
+    """
+    Cancela o scraping em execução.
+    ---
+    tags:
+        - Scraping
+    responses:
+        200:
+            description: Cancelamento solicitado.
+        400:
+            description: Nenhum scraping em execução.
+    """
+    job = scrape_jobs.cancel(request.args.get("job_id", type=int))
+    if job is None:
+        return jsonify({"message": "Nenhum scraping em execução!"}), 400
+    return jsonify({"message": "Cancelamento solicitado.", "job_id": job.id,
+                    "status": job.status}), 200
+
+
+@app.route("/api/v1/scraping/resume", methods=["POST"])
+@jwt_required()
+def resume_scraping():
+    """
+    Retoma um scraping cancelado, com falha ou interrompido.
+    ---
+    tags:
+        - Scraping
+    parameters:
+        - name: job_id
+          in: query
+          type: integer
+          required: false
+          description: Job a retomar (padrão é o mais recente)
+    responses:
+        200:
+            description: Job reenfileirado.
+        400:
+            description: Nenhum job retomável ou já existe scraping em execução.
+    """
+    job = scrape_jobs.resume(request.args.get("job_id", type=int))
+    if job is None:
+        return jsonify({"message": "Nenhum scraping para retomar!"}), 400
+    return jsonify({"message": "Scraping retomado.", "job_id": job.id,
+                    "status": job.status}), 200
 
 
 # Refresh token (mantido em /api/v1/auth/refresh)
@@ -637,22 +1396,156 @@ def refresh():
 
 #Desafio 2 - Endpoints protegidos para retornar dados de treinamento e previsões do modelo
 # Endpoint protegido para retornar dados de treinamento
+ML_PAGE_MAX = int(os.environ.get("ML_TRAINING_PAGE_MAX", 10000))
+
+
 @app.route('/api/v1/ml/training-data', methods=['GET'])
 @jwt_required()
 def get_training_data():
-    current_user = get_jwt_identity()
-    # Implementar a lógica para retornar os dados de treinamento
-    return jsonify({"message":
-                    "Dados de treinamento retornados com sucesso."}), 200
+    """
+	Matriz de features para treino (uma linha por livro, rótulo = rating)
+	---
+	tags:
+		- ML
+	parameters:
+		- name: format
+		  in: query
+		  type: string
+		  enum: [json, parquet]
+		  required: false
+		  default: json
+		- name: offset
+		  in: query
+		  type: integer
+		  required: false
+		  default: 0
+		- name: limit
+		  in: query
+		  type: integer
+		  required: false
+		  default: 1000
+	responses:
+		200:
+			description: Página da matriz (json) ou o Parquet completo da versão atual
+		400:
+			description: Parâmetros inválidos
+	security:
+		- Bearer: []
+	"""
+    matrix = _training_matrix()
+
+    fmt = request.args.get("format", "json").lower()
+    if fmt == "parquet":
+        return send_file(matrix.path, mimetype="application/vnd.apache.parquet", as_attachment=True,
+                         download_name=matrix.path.name, conditional=True)
+    if fmt != "json":
+        return jsonify({"msg": "Formato inválido! Use: json, parquet"}), 400
+
+    offset = request.args.get("offset", 0, type=int)
+    limit = request.args.get("limit", 1000, type=int)
+    if offset < 0 or not 1 <= limit <= ML_PAGE_MAX:
+        return jsonify({"msg": f"limit deve estar entre 1 e {ML_PAGE_MAX} e offset >= 0!"}), 400
+
+    return jsonify({"message": "Dados de treinamento retornados com sucesso.",
+                    **matrix.page(offset, limit)}), 200
 
 
 # Endpoint protegido para retornar previsões do modelo
+# Modelo carregado uma vez (lazy) e pedidos concorrentes agrupados em micro-lotes
+ML_PREDICT_MAX = int(os.environ.get("ML_PREDICT_MAX", 1000))
+ML_PREDICT_TIMEOUT = float(os.environ.get("ML_PREDICT_TIMEOUT", 10))
+
+rating_model = None        # ModelHolder, criado no primeiro uso
+prediction_batcher = None  # MicroBatcher, idem
+_ml_lock = threading.Lock()
+
+
+def _training_matrix():
+    from services.ml import features as ml_features
+
+    return ml_features.get_matrix(extract.snapshot())
+
+
+def _prediction_service():
+    global rating_model, prediction_batcher
+    with _ml_lock:
+        if rating_model is None or prediction_batcher is None:
+            from services.ml.model import ModelHolder, MicroBatcher
+
+            rating_model = rating_model or ModelHolder()
+            prediction_batcher = prediction_batcher or MicroBatcher(lambda X: rating_model.get().predict(X))
+    return rating_model, prediction_batcher
+
+
 @app.route('/api/v1/ml/predictions', methods=['POST'])
 @jwt_required()
 def get_predictions():
-    current_user = get_jwt_identity()
-    # Implementar a lógica para retornar as previsões
-    return jsonify({"message": "Previsões retornadas com sucesso."}), 200
+    """
+	Prevê o rating de um ou mais livros
+	---
+	tags:
+		- ML
+	parameters:
+		- in: body
+		  name: body
+		  required: true
+		  schema:
+			type: object
+			properties:
+				books:
+					type: array
+					items:
+						type: object
+						properties:
+							title:
+								type: string
+							category:
+								type: string
+							raw_price:
+								type: number
+							instock:
+								type: integer
+					example: [{"title": "a light in the attic", "category": "poetry", "raw_price": 51.77, "instock": 22}]
+	responses:
+		200:
+			description: Rating previsto para cada livro, na ordem enviada, e latência da inferência
+		400:
+			description: Corpo inválido ou livros acima do limite
+		503:
+			description: Modelo indisponível ou inferência sem resposta no tempo limite
+	security:
+		- Bearer: []
+	"""
+    started = perf_counter()
+    data = request.get_json(silent=True) or {}
+    books = data.get("books", [data["book"]] if isinstance(data.get("book"), dict) else None)
+
+    if not isinstance(books, list) or not books or not all(isinstance(b, dict) for b in books):
+        return jsonify({"msg": "O campo books deve ser uma lista de objetos!"}), 400
+    if len(books) > ML_PREDICT_MAX:
+        return jsonify({"msg": f"Máximo de {ML_PREDICT_MAX} livros por requisição!"}), 400
+
+    try:
+        holder, batcher = _prediction_service()
+        model = holder.get(_training_matrix)
+        X = model.spec.transform(pd.DataFrame(books))
+        result = batcher.submit(X).result(timeout=ML_PREDICT_TIMEOUT)
+    except FuturesTimeout:
+        return jsonify({"msg": "Inferência sem resposta no tempo limite!"}), 503
+    except FileNotFoundError as e:
+        return jsonify({"msg": str(e)}), 503
+
+    return jsonify({
+        "message": "Previsões retornadas com sucesso.",
+        "model": {"name": "rating_ridge", "trained_on": model.trained_on},
+        "predictions": [{"rating": round(float(y), 3)} for y in result["predictions"]],
+        "latency_ms": {
+            "total": round((perf_counter() - started) * 1000, 3),
+            "queue": round(result["queue_ms"], 3),
+            "inference": round(result["inference_ms"], 3),
+        },
+        "batch": {"rows": result["batch_rows"], "requests": result["batch_requests"]},
+    }), 200
 
 
 # Adição de configurações para o JWT_Manager
@@ -860,6 +1753,31 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Inicialização por processo, na primeira requisição: com servidor pre-fork (--preload)
+# o import roda no mestre e threads/executores criados ali não sobrevivem ao fork
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def _start_worker():
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+        try:
+            # Expira jobs sem heartbeat (worker morto) e reenvia os que estavam na fila
+            scrape_jobs.recover()
+        except Exception as e:
+            db.session.rollback()
+            print(f"[WARN] Recuperação dos jobs de scraping falhou: {e}")
+        if WARMUP_MODE == "background":
+            # /api/v1/ready também passa por aqui: a primeira checagem do balanceador dispara o warmup
+            threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
+
+
 @app.before_request
 def log_request_info():
     """ if "Authorization" not in request.headers and "access_token" in session:
@@ -868,14 +1786,32 @@ def log_request_info():
 
     # Inicia o timer para medir o tempo da requisição
     request.start_time = time()
+    _start_worker()
+    _start_profile()
     # Faz log básico da requisição
-    logger.info(
-        f"Request: {request.method} {request.url} - Body: {request.get_data()}"
-    )
+    with profiling.phase("log"):
+        logger.info(
+            f"Request: {request.method} {request.url} - Body: {request.get_data()}"
+        )
+
+    # Rate limit e token contam como "auth" no perfil; a view começa depois deles
+    with profiling.phase("auth"):
+        denied = _authorize_request()
+    if denied:
+        return denied
+    profile = g.get("profile")
+    if profile is not None:
+        profile.handler_started()
+
+
+def _authorize_request():
+    limited = _enforce_rate_limit()
+    if limited:
+        return limited
 
     public_routes = [
         "/", "/apidocs/", "/apispec.json", "/flasgger_static/",
-        "/api/v1/auth/login", "/api/v1/health"
+        "/api/v1/auth/login", "/api/v1/health", "/api/v1/ready"
     ]
 
     # Libera tudo que comece com /apidocs ou /flasgger_static (Swagger UI)
@@ -898,12 +1834,17 @@ def log_request_info():
 
 @app.after_request
 def log_response_info(response):
+    profile = g.pop("profile", None)
+    if profile is not None:
+        profile.handler_finished()
+    _rate_limit_headers(response)
     try:
-        if not response.direct_passthrough:
-            body = response.get_data(as_text=True)
-        else:
-            body = "<streaming or static file>"
-        logger.info(f"Response: {response.status} - Body: {body}")
+        with profiling.phase("log"):
+            if not (response.direct_passthrough or response.is_streamed):
+                body = response.get_data(as_text=True)
+            else:
+                body = "<streaming or static file>"
+            logger.info(f"Response: {response.status} - Body: {body}")
     except Exception as e:
         logger.error(f"Error logging response: {e}")
     finally:
@@ -911,17 +1852,235 @@ def log_response_info(response):
             duration = time() - request.start_time
             logger.info(
                 f"Request to {request.path} took {duration:.4f} seconds")
+        if profile is not None:
+            _finish_profile(profile, response)
         return response
 
 
+# Profiling sob demanda: header X-Profile (sample | cprofile) de um admin ou amostragem
+def _start_profile():
+    header = request.headers.get(profiling.HEADER)
+    sampled = profiling.sampled()
+    if not header and not sampled:
+        return
+
+    started = perf_counter()
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    mode, reason = profiling.choose_mode(header, is_admin(identity), sampled)
+    if mode is not None:
+        g.profile = profiling.RequestProfile(mode, reason, request.method, request.path)
+        g.profile.start(auth_seconds=perf_counter() - started)
+
+
+def _finish_profile(profile, response):
+    try:
+        profile.stop()
+        meta = profile.save(response.status_code)
+        response.headers["X-Profile-Id"] = meta["id"]
+    except Exception as e:
+        logger.error(f"Falha ao gravar o perfil da requisição: {e}")
+
+
+@app.teardown_request
+def _stop_profile(exc):
+    # Requisição que não passou pelo after_request: não deixa o profiler ligado
+    profile = g.pop("profile", None)
+    if profile is not None:
+        profile.stop()
+
+
+def _forbidden_unless_admin():
+    if not is_admin(get_jwt_identity()):
+        return jsonify({"msg": "Acesso restrito a administradores!"}), 403
+    return None
+
+
+@app.route('/api/v1/admin/profiles', methods=['GET'])
+@jwt_required()
+def list_request_profiles():
+    """
+	Perfis de requisição gravados (mais recentes primeiro)
+	---
+	tags:
+		- Admin
+	parameters:
+		- name: limit
+		  in: query
+		  type: integer
+		  required: false
+		  default: 50
+	responses:
+		200:
+			description: Metadados de cada perfil (rota, status, duração e tempo por fase)
+		403:
+			description: Usuário não é administrador
+	security:
+		- Bearer: []
+	"""
+    denied = _forbidden_unless_admin()
+    if denied:
+        return denied
+    limit = min(max(request.args.get("limit", 50, type=int), 1), profiling.PROFILE_KEEP)
+    profiles = profiling.list_profiles(limit=limit)
+    return jsonify({"profiles": profiles, "total": len(profiles)}), 200
+
+
+@app.route('/api/v1/admin/profiles/<string:profile_id>', methods=['GET'])
+@jwt_required()
+def get_request_profile(profile_id):
+    """
+	Download de um perfil de requisição
+	---
+	tags:
+		- Admin
+	parameters:
+		- name: profile_id
+		  in: path
+		  type: string
+		  required: true
+		- name: format
+		  in: query
+		  type: string
+		  enum: [json, collapsed, prof]
+		  required: false
+		  default: json
+		  description: collapsed = pilhas para flamegraph (modo sample); prof = pstats (modo cprofile)
+	responses:
+		200:
+			description: Arquivo do perfil
+		403:
+			description: Usuário não é administrador
+		404:
+			description: Perfil ou formato inexistente
+	security:
+		- Bearer: []
+	"""
+    denied = _forbidden_unless_admin()
+    if denied:
+        return denied
+    fmt = request.args.get("format", "json").lower()
+    path = profiling.profile_file(profile_id, fmt)
+    if path is None:
+        return jsonify({"msg": "Perfil não encontrado neste formato!"}), 404
+    mimetype = {"json": "application/json", "collapsed": "text/plain"}.get(fmt, "application/octet-stream")
+    return send_file(path, mimetype=mimetype, as_attachment=fmt != "json", download_name=path.name)
+
+
+def _memory_report(derived: bool = True) -> dict:
+    try:
+        catalog = memory.catalog_footprint(extract.snapshot(), derived=derived)
+    except FileNotFoundError:
+        catalog = None  # silver ainda não publicada
+    return {
+        "process": memory.process_memory(),
+        "catalog": catalog,
+        "routes": memory.allocations.to_dict(),
+        "sample_rate": memory.MEMORY_SAMPLE_RATE,
+    }
+
+
+@app.route('/api/v1/admin/memory', methods=['GET'])
+@jwt_required()
+def get_memory_report():
+    """
+	Uso de memória do worker
+	---
+	tags:
+		- Admin
+	responses:
+		200:
+			description: RSS do processo, catálogo por coluna, estruturas derivadas (índices e caches) e pico de alocação por rota (tracemalloc, amostrado por MEMORY_SAMPLE_RATE)
+		403:
+			description: Usuário não é administrador
+	security:
+		- Bearer: []
+	"""
+    denied = _forbidden_unless_admin()
+    if denied:
+        return denied
+    return jsonify(_memory_report()), 200
+
+
 #Dashboard simples para visualizar as métricas de uso da API (pode ser uma rota protegida que retorna dados em formato JSON)
 @app.route('/api/v1/analytics', methods=['GET'])
 @jwt_required()
 def get_analytics():
-    current_user = get_jwt_identity()
-    # Implementar a lógica para retornar as métricas de uso da API
-    return jsonify(
-        {"message": "Métricas de uso da API retornadas com sucesso."}), 200
+    """
+	Métricas de uso da API
+	---
+	tags:
+		- Admin
+	responses:
+		200:
+			description: Memória do worker (processo, catálogo e pico de alocação por rota)
+	security:
+		- Bearer: []
+	"""
+    report = _memory_report(derived=False)
+    return jsonify({
+        "message": "Métricas de uso da API retornadas com sucesso.",
+        "memory": {
+            "rss_mb": report["process"]["rss_mb"],
+            "peak_rss_mb": report["process"]["peak_rss_mb"],
+            "catalog_mb": report["catalog"]["frame_mb"] if report["catalog"] else None,
+            "routes_peak_mb": {route: r["peak_mb_max"] for route, r in report["routes"].items()},
+        },
+    }), 200
+
+
+#------------------- Warmup e readiness --------------------
+# background: aquece numa thread iniciada na primeira requisição do processo
+# (_start_worker) e /api/v1/ready responde 503 até terminar
+# sync: aquece no import (o worker só sobe aquecido) | off: sem warmup
+WARMUP_MODE = os.environ.get("API_WARMUP", "background").lower()
+WARMUP_ML = os.environ.get("API_WARMUP_ML", "1") != "0"
+
+warmup = Warmup()
+
+
+def _warmup_steps(ml: bool = WARMUP_ML) -> list:
+    steps = [
+        ("catalog", lambda: extract.snapshot(), True),
+        ("indexes", lambda: extract.warm(neighbours=False), True),
+        ("responses", lambda: [_hot_body(name) for name in HOT_RESPONSES], True),
+        ("neighbours", lambda: extract.warm(neighbours=True), False),
+        ("apispec", _apispec, False),
+    ]
+    if ml:
+        steps += [("ml_features", _training_matrix, False),
+                  ("ml_model", lambda: _prediction_service()[0].get(_training_matrix), False)]
+    return steps
+
+
+def run_warmup(ml: bool = WARMUP_ML) -> bool:
+    with app.app_context():
+        return warmup.run(_warmup_steps(ml), version=lambda: extract.snapshot().version)
+
+
+@app.route('/api/v1/ready', methods=['GET'])
+def get_ready():
+    """
+	Readiness do worker (warmup concluído)
+	---
+	tags:
+		- Health
+	responses:
+		200:
+			description: Worker aquecido; inclui a versão do catálogo e a duração de cada passo
+			schema:
+				type: object
+		503:
+			description: Warmup ainda em andamento ou com falha
+	"""
+    return jsonify(warmup.to_dict()), 200 if warmup.ready else 503
+
+
+if WARMUP_MODE == "sync":
+    run_warmup()
 
 
 #------------------- Rodar aplicação --------------------
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+# Usuários administradores (rotas /api/v1/admin/* e header de profiling).
+# Não há papéis no banco: a lista vem de API_ADMIN_USERS (separada por vírgula).
+
+import os
+
+ADMIN_USERS = {u.strip() for u in os.environ.get("API_ADMIN_USERS", "").split(",") if u.strip()}
+
+
+def is_admin(identity) -> bool:
+    return identity is not None and str(identity) in ADMIN_USERS
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Hash de senhas fora da thread da requisição: um pool pequeno e dedicado com
+# limite de fila, para que rajadas de login não consumam os workers da API.
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from werkzeug.security import generate_password_hash, check_password_hash
+
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+HASH_WORKERS         = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+HASH_QUEUE_DEPTH     = int(os.environ.get("PASSWORD_HASH_QUEUE", 8))
+HASH_TIMEOUT         = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 10))
+
+
+class HasherOverloaded(Exception):
+    """Fila do pool de hash cheia ou hash sem resposta a tempo: a requisição deve ser recusada (503)."""
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = HASH_WORKERS, queue_depth: int = HASH_QUEUE_DEPTH,
+                 timeout: float = HASH_TIMEOUT):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        # Vagas = tarefas em execução + tarefas aguardando na fila
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix="pwhash")
+        return self._executor
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherOverloaded()
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeout:
+            raise HasherOverloaded() from None
+
+    def verify(self, user, password: str) -> bool:
+        # Usuário inexistente também paga um hash completo: o tempo de resposta
+        # não revela quais usuários existem
+        if user is None:
+            self.run(check_password_hash, dummy_hash(), password)
+            return False
+        return bool(self.run(user.check_password, password))
+
+    def hash(self, password: str) -> str:
+        return self.run(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+
+_current_prefix = None
+
+
+def current_hash_prefix() -> str:
+    # O prefixo do werkzeug ("scrypt:32768:8:1", "pbkdf2:sha256:1000000") carrega
+    # os parâmetros efetivos; calculado uma vez a partir de um hash descartável.
+    global _current_prefix
+    if _current_prefix is None:
+        _current_prefix = generate_password_hash("", PASSWORD_HASH_METHOD).split("$", 1)[0]
+    return _current_prefix
+
+
+_dummy_hash = None
+
+
+def dummy_hash() -> str:
+    # Hash descartável com os parâmetros atuais, comparado quando o usuário não existe
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = generate_password_hash(os.urandom(16).hex(), PASSWORD_HASH_METHOD)
+    return _dummy_hash
+
+
+def needs_rehash(password_hash) -> bool:
+    if not password_hash or "$" not in password_hash:
+        return False
+    return password_hash.split("$", 1)[0] != current_hash_prefix()
+
+
+def hash_password(password: str) -> str:
+    return generate_password_hash(password, PASSWORD_HASH_METHOD)
+
+
+def check_password(password_hash: str, password: str) -> bool:
+    return check_password_hash(password_hash, password)
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+# Token bucket por chave (usuário, IP, ...): em memória (KeyedRateLimiter, ou
+# StripedRateLimiter com um lock por fatia de chaves) ou num SQLite local
+# compartilhado entre os workers da máquina (SQLiteRateLimiter).
+# ApiRateLimiter combina um limite de rajada e uma cota diária por cliente.
+
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float, now: float | None = None):
+        self.capacity = capacity
+        self.rate = rate  # tokens por segundo
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def consume(self, amount: float = 1, now: float | None = None) -> tuple[bool, float]:
+        """Retorna (permitido, segundos até haver tokens suficientes)."""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True, 0.0
+
+        missing = amount - self.tokens
+        return False, missing / self.rate if self.rate > 0 else float("inf")
+
+    def copy(self) -> "TokenBucket":
+        bucket = TokenBucket(self.capacity, self.rate, self.updated)
+        bucket.tokens = self.tokens
+        return bucket
+
+
+class KeyedRateLimiter:
+    def __init__(self, capacity: float, per_minute: float, max_keys: int = 10000):
+        if capacity <= 0 or per_minute <= 0:
+            # Sem reposição o Retry-After seria infinito
+            raise ValueError("capacidade e reposição por minuto do limite devem ser maiores que zero")
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, amount: float = 1) -> tuple[bool, float]:
+        allowed, retry_after, _ = self.take(key, amount)
+        return allowed, retry_after
+
+    def take(self, key: str, amount: float = 1, dry_run: bool = False) -> tuple[bool, float, float]:
+        """Como hit, mais os tokens que restam no bucket. dry_run só consulta, sem gastar."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if dry_run:
+                bucket = bucket.copy() if bucket is not None else TokenBucket(self.capacity, self.rate, now)
+            elif bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self._buckets[key] = TokenBucket(self.capacity, self.rate, now)
+            allowed, retry_after = bucket.consume(amount, now)
+            return allowed, retry_after, bucket.tokens
+
+    def refund(self, key: str, amount: float = 1):
+        """Devolve tokens de um take que não valeu (outra política negou a requisição)."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.tokens = min(self.capacity, bucket.tokens + amount)
+
+    def _prune(self, now: float):
+        # Remove buckets que já estariam cheios (chaves ociosas)
+        full_after = self.capacity / self.rate if self.rate > 0 else float("inf")
+        idle = [k for k, b in self._buckets.items() if now - b.updated >= full_after]
+        for k in idle:
+            del self._buckets[k]
+        if len(self._buckets) >= self.max_keys:
+            oldest = sorted(self._buckets, key=lambda k: self._buckets[k].updated)
+            for k in oldest[: len(oldest) // 2]:
+                del self._buckets[k]
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class StripedRateLimiter:
+    """KeyedRateLimiter dividido em fatias por hash da chave: clientes diferentes raramente disputam o mesmo lock."""
+
+    def __init__(self, capacity: float, per_minute: float, shards: int = 16, max_keys: int = 100000):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self._shards = [KeyedRateLimiter(capacity, per_minute, max(1, max_keys // shards))
+                        for _ in range(shards)]
+
+    def _shard(self, key: str) -> KeyedRateLimiter:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def take(self, key: str, amount: float = 1, dry_run: bool = False) -> tuple[bool, float, float]:
+        return self._shard(key).take(key, amount, dry_run)
+
+    def refund(self, key: str, amount: float = 1):
+        self._shard(key).refund(key, amount)
+
+    def reset(self):
+        for shard in self._shards:
+            shard.reset()
+
+
+class SQLiteRateLimiter:
+    """
+    Buckets numa tabela SQLite local, para que os workers da mesma máquina
+    dividam o limite. Cada take é uma transação curta (BEGIN IMMEDIATE) e o
+    tempo é o relógio de parede, comum a todos os processos.
+    """
+
+    _PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, capacity: float, per_minute: float, name: str = "default"):
+        self.path = path
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.name = name
+        self._local = threading.local()
+        self._takes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_buckets ("
+                         "name TEXT, key TEXT, tokens REAL, updated REAL, PRIMARY KEY (name, key))")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # estado descartável: perder o último segundo não importa
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, amount: float = 1, dry_run: bool = False) -> tuple[bool, float, float]:
+        now = time.time()
+        conn = self._connect()
+        if dry_run:
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE name = ? AND key = ?",
+                               (self.name, key)).fetchone()
+            bucket = TokenBucket(self.capacity, self.rate, now)
+            if row is not None:
+                bucket.tokens, bucket.updated = row
+            allowed, retry_after = bucket.consume(amount, now)
+            return allowed, retry_after, bucket.tokens
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE name = ? AND key = ?",
+                               (self.name, key)).fetchone()
+            bucket = TokenBucket(self.capacity, self.rate, now)
+            if row is not None:
+                bucket.tokens, bucket.updated = row
+            allowed, retry_after = bucket.consume(amount, now)
+            conn.execute("INSERT OR REPLACE INTO rate_buckets VALUES (?, ?, ?, ?)",
+                         (self.name, key, bucket.tokens, bucket.updated))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._takes += 1
+        if self._takes % self._PRUNE_EVERY == 0:
+            self._prune(now)
+        return allowed, retry_after, bucket.tokens
+
+    def refund(self, key: str, amount: float = 1):
+        self._connect().execute(
+            "UPDATE rate_buckets SET tokens = MIN(?, tokens + ?) WHERE name = ? AND key = ?",
+            (self.capacity, amount, self.name, key))
+
+    def _prune(self, now: float):
+        # Buckets que já estariam cheios equivalem a não existir
+        full_after = self.capacity / self.rate if self.rate > 0 else float("inf")
+        self._connect().execute("DELETE FROM rate_buckets WHERE name = ? AND updated < ?",
+                                (self.name, now - full_after))
+
+    def reset(self):
+        self._connect().execute("DELETE FROM rate_buckets WHERE name = ?", (self.name,))
+
+
+class RateDecision(NamedTuple):
+    allowed: bool
+    policy: str        # política mais restritiva no momento (a que negou, se negou)
+    limit: float
+    remaining: float
+    reset: float       # segundos até o bucket dessa política encher de novo
+    retry_after: float
+
+
+class ApiRateLimiter:
+    """
+    Limite por cliente com custo por rota: rajada (burst tokens, repostos a
+    per_minute por minuto) e, se daily_quota > 0, uma cota de daily_quota
+    tokens reposta ao longo de 24h. backend: "memory" ou "sqlite" (path).
+    """
+
+    def __init__(self, burst: float, per_minute: float, daily_quota: float = 0,
+                 backend: str = "memory", path: str | None = None):
+        if burst <= 0 or per_minute <= 0:
+            raise ValueError("API_RATE_BURST e API_RATE_PER_MINUTE devem ser maiores que zero "
+                             "(use API_RATE_LIMIT=off para desligar o limite)")
+
+        def make(name, capacity, per_min):
+            if backend == "sqlite":
+                return SQLiteRateLimiter(path, capacity, per_min, name=name)
+            return StripedRateLimiter(capacity, per_min)
+
+        self.policies = [("burst", make("burst", burst, per_minute))]
+        if daily_quota > 0:
+            self.policies.append(("daily", make("daily", daily_quota, daily_quota / 1440)))
+
+    def _decide(self, name, limiter, key: str, cost: float, dry_run: bool) -> RateDecision:
+        allowed, retry_after, remaining = limiter.take(key, cost, dry_run)
+        reset = (limiter.capacity - remaining) / limiter.rate
+        return RateDecision(allowed, name, limiter.capacity, remaining, reset, retry_after)
+
+    def check(self, key: str, cost: float = 1) -> RateDecision:
+        # Primeiro só consulta: requisição negada por uma política não gasta das outras
+        for name, limiter in self.policies:
+            decision = self._decide(name, limiter, key, cost, dry_run=True)
+            if not decision.allowed:
+                return decision
+
+        tightest, taken = None, []
+        for name, limiter in self.policies:
+            decision = self._decide(name, limiter, key, cost, dry_run=False)
+            if not decision.allowed:
+                # Outra requisição do mesmo cliente gastou entre a consulta e o take
+                for spent in taken:
+                    spent.refund(key, cost)
+                return decision
+            taken.append(limiter)
+            if tightest is None or decision.remaining / decision.limit < tightest.remaining / tightest.limit:
+                tightest = decision
+        return tightest
+
+    def policy_header(self) -> str:
+        """RateLimit-Policy: "limite;w=janela" de cada política (janela = tempo para encher o bucket)."""
+        return ", ".join(f"{int(l.capacity)};w={int(l.capacity / l.rate)}" for _, l in self.policies)
+
+    def reset(self):
+        for _, limiter in self.policies:
+            limiter.reset()
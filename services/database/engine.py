@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Configuração do engine do banco da aplicação (usuários e jobs de scraping).
+# Em SQLite: journal WAL (leitores não bloqueiam o escritor), synchronous=NORMAL
+# (seguro em WAL, sem fsync a cada commit), busy_timeout para esperar o lock em
+# vez de falhar, e um pool de conexões dimensionado com pre-ping.
+
+import os
+
+from sqlalchemy import event
+
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 4))
+DB_POOL_TIMEOUT_S = float(os.environ.get("DB_POOL_TIMEOUT_S", 10))
+DB_POOL_RECYCLE_S = int(os.environ.get("DB_POOL_RECYCLE_S", 1800))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", 5000))
+# Statements preparados que o driver sqlite3 mantém por conexão (padrão do Python: 128)
+DB_CACHED_STATEMENTS = int(os.environ.get("DB_CACHED_STATEMENTS", 256))
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": DB_BUSY_TIMEOUT_MS,
+    "temp_store": "MEMORY",
+    "cache_size": -16000,  # ~16 MB de páginas por conexão
+}
+
+
+def _is_memory(uri: str) -> bool:
+    return uri in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in uri
+
+
+def engine_options(uri: str) -> dict:
+    """SQLALCHEMY_ENGINE_OPTIONS para a URI (pool dimensionado só onde há QueuePool)."""
+    options = {"pool_pre_ping": True}
+    if not uri.startswith("sqlite"):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                       pool_timeout=DB_POOL_TIMEOUT_S, pool_recycle=DB_POOL_RECYCLE_S)
+        return options
+    options["connect_args"] = {"check_same_thread": False, "timeout": DB_BUSY_TIMEOUT_MS / 1000,
+                               "cached_statements": DB_CACHED_STATEMENTS}
+    if not _is_memory(uri):  # em memória o Flask-SQLAlchemy usa StaticPool (uma conexão)
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                       pool_timeout=DB_POOL_TIMEOUT_S)
+    return options
+
+
+def install_sqlite_pragmas(engine):
+    """Aplica SQLITE_PRAGMAS em cada conexão nova do engine (no-op fora do SQLite)."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in SQLITE_PRAGMAS.items():
+                if name == "journal_mode" and _is_memory(str(engine.url)):
+                    continue  # banco em memória não tem WAL
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
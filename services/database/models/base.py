@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam, select
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.auth import hashing
 
 db = SQLAlchemy()
 
@@ -12,11 +13,17 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    @classmethod
+    def find_by_username(cls, username):
+        # Statement montado uma vez: o SQLAlchemy reaproveita a compilação e o
+        # sqlite3 o statement preparado da conexão (só o parâmetro muda)
+        return db.session.execute(_USER_BY_USERNAME, {"username": username}).scalar_one_or_none()
+
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hashing.hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return hashing.check_password(self.password_hash, password)
 
     def to_dict(self):
         return {
@@ -24,3 +31,6 @@ class User(db.Model):
             "username": self.username,
             "created_at": self.created_at.isoformat()
         }
+
+
+_USER_BY_USERNAME = select(User).where(User.username == bindparam("username")).limit(1)
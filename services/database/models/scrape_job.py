@@ -0,0 +1,72 @@
+import json
+from datetime import datetime
+from services.database.models.base import db
+
+# Estados de um job de scraping
+QUEUED     = "queued"
+RUNNING    = "running"
+CANCELLING = "cancelling"
+CANCELLED  = "cancelled"
+FAILED     = "failed"
+FINISHED   = "finished"
+INTERRUPTED = "interrupted"
+
+ACTIVE_STATES    = (QUEUED, RUNNING, CANCELLING)
+RESUMABLE_STATES = (CANCELLED, FAILED, INTERRUPTED)
+
+
+class ScrapeJob(db.Model):
+    __tablename__ = "scrape_jobs"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    status = db.Column(db.String(20), nullable=False, default=QUEUED, index=True)
+    started_by = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    start_time = db.Column(db.DateTime)
+    end_time = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    pages_scraped = db.Column(db.Integer, nullable=False, default=0)
+    books_scraped = db.Column(db.Integer, nullable=False, default=0)
+    books_total = db.Column(db.Integer)
+    progress = db.Column(db.Text)  # JSON: estágio do pipeline e contadores por categoria
+    error = db.Column(db.Text)
+
+    @property
+    def progress_data(self) -> dict:
+        return json.loads(self.progress) if self.progress else {}
+
+    @property
+    def categories(self) -> dict:
+        return self.progress_data.get("categories", {})
+
+    def to_dict(self):
+        elapsed = None
+        if self.start_time:
+            elapsed = ((self.end_time or datetime.utcnow()) - self.start_time).total_seconds()
+
+        throughput = (self.books_scraped / elapsed) if elapsed else 0.0
+        eta = None
+        if self.status == RUNNING and throughput > 0 and self.books_total:
+            eta = round(max(self.books_total - self.books_scraped, 0) / throughput, 1)
+
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "running": self.status in ACTIVE_STATES,
+            "started_by": self.started_by,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "start_time": self.start_time.isoformat() if self.start_time else None,
+            "end_time": self.end_time.isoformat() if self.end_time else None,
+            "attempts": self.attempts,
+            "pages_scraped": self.pages_scraped,
+            "books_scraped": self.books_scraped,
+            "books_total": self.books_total,
+            "throughput_books_per_s": round(throughput, 3),
+            "eta_seconds": eta,
+            "stage": self.progress_data.get("stage"),
+            "catalog_version": self.progress_data.get("catalog_version"),
+            "http": self.progress_data.get("http"),
+            "categories": self.categories,
+            "error": self.error,
+        }
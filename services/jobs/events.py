@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# Eventos de progresso do scraping para /api/v1/scraping/events (SSE).
+# O ScrapeProgress publica cada callback do scraper no barramento do processo;
+# cada conexão SSE espera no barramento em vez de consultar o status em loop.
+# Job rodando em outro worker não gera eventos aqui: a conexão então lê o
+# estado do banco a cada SSE_POLL_S e envia "status" quando ele muda.
+
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from time import monotonic
+
+SSE_POLL_S      = float(os.environ.get("SSE_POLL_S", 2))
+SSE_HEARTBEAT_S = float(os.environ.get("SSE_HEARTBEAT_S", 15))
+EVENTS_PER_JOB  = int(os.environ.get("SSE_EVENTS_PER_JOB", 2000))
+JOBS_KEPT       = 5
+
+FINISHED = "finished"
+
+
+class ScrapeEventBus:
+    """Últimos EVENTS_PER_JOB eventos de cada job, com id crescente por job (Last-Event-ID)."""
+
+    def __init__(self, per_job: int = EVENTS_PER_JOB, jobs_kept: int = JOBS_KEPT):
+        self.per_job = per_job
+        self.jobs_kept = jobs_kept
+        self._jobs = OrderedDict()  # job_id -> {"next": int, "events": deque[(id, tipo, dados)]}
+        self._cond = threading.Condition()
+
+    def publish(self, job_id: int, kind: str, data: dict):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._jobs[job_id] = {"next": 1, "events": deque(maxlen=self.per_job)}
+                while len(self._jobs) > self.jobs_kept:
+                    self._jobs.popitem(last=False)
+            job["events"].append((job["next"], kind, data))
+            job["next"] += 1
+            self._cond.notify_all()
+
+    def last_id(self, job_id: int) -> int:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return job["next"] - 1 if job else 0
+
+    def _since(self, job_id: int, last_id: int) -> list:
+        job = self._jobs.get(job_id)
+        if job is None or job["next"] - 1 <= last_id:
+            return []
+        return [e for e in job["events"] if e[0] > last_id]
+
+    def wait(self, job_id: int, last_id: int, timeout: float) -> list:
+        """Eventos com id > last_id; bloqueia até haver algum ou até o timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._since(job_id, last_id), timeout)
+            return self._since(job_id, last_id)
+
+
+def format_event(kind: str, data, event_id: int | None = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {kind}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _finished_from(state: dict | None) -> dict:
+    if state is None:
+        return {"status": None}
+    return {"status": state["status"], "books_scraped": state["books_scraped"],
+            "pages_scraped": state["pages_scraped"], "error": state.get("error")}
+
+
+def stream(bus: ScrapeEventBus, job_id: int, poll, last_id: int | None = None):
+    """
+    Gera o texto SSE de um job. `poll()` devolve o estado do job no banco
+    (to_dict) ou None. Sem last_id, começa com um "snapshot" do estado atual;
+    com last_id (header Last-Event-ID), reenvia o que o barramento ainda tiver.
+    Termina no evento "finished".
+    """
+    if last_id is None:
+        state = poll()
+        last_id = bus.last_id(job_id)
+        yield format_event("snapshot", state)
+        if state is None or not state["running"]:
+            yield format_event(FINISHED, _finished_from(state))
+            return
+    else:
+        state = None
+
+    last_sent = monotonic()
+    while True:
+        events = bus.wait(job_id, last_id, SSE_POLL_S)
+        for event_id, kind, data in events:
+            yield format_event(kind, data, event_id)
+            last_id = event_id
+            if kind == FINISHED:
+                return
+        if events:
+            last_sent = monotonic()
+            continue
+
+        # Nada no barramento: o job pode estar em outro worker ou ter terminado sem eventos aqui
+        current = poll()
+        if current is None or not current["running"]:
+            yield format_event(FINISHED, _finished_from(current))
+            return
+        if state is None or any(current[k] != state[k] for k in ("status", "stage", "pages_scraped", "books_scraped")):
+            state = current
+            yield format_event("status", current)
+            last_sent = monotonic()
+        elif monotonic() - last_sent >= SSE_HEARTBEAT_S:
+            yield ": keepalive\n\n"  # comentário SSE: mantém proxies e o cliente conectados
+            last_sent = monotonic()
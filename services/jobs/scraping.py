@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+# Jobs de scraping persistidos no SQLite da aplicação: o estado é compartilhado
+# entre workers, sobrevive a restarts e a transição "nenhum job ativo -> novo job"
+# é feita numa única instrução SQL (sem check-then-set).
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, update, literal
+from sqlalchemy.orm import aliased
+
+from services.database.models.base import db
+from services.jobs.events import ScrapeEventBus, FINISHED as EVENT_FINISHED
+from services.database.models.scrape_job import (
+    ScrapeJob, QUEUED, RUNNING, CANCELLING, CANCELLED, FAILED, FINISHED,
+    INTERRUPTED, ACTIVE_STATES, RESUMABLE_STATES)
+
+JOB_WORKERS    = int(os.environ.get("SCRAPING_WORKERS", 1))
+FLUSH_INTERVAL = float(os.environ.get("SCRAPING_PROGRESS_FLUSH", 2))
+STALE_AFTER    = float(os.environ.get("SCRAPING_STALE_AFTER", 300))
+# Heartbeat independente dos callbacks: transform, similar e publish não geram progresso
+HEARTBEAT_INTERVAL = float(os.environ.get("SCRAPING_HEARTBEAT", 30))
+
+
+class JobCancelled(Exception):
+    """Levantada dentro do scraper quando o job foi cancelado."""
+
+
+class ScrapeProgress:
+    """
+    Recebe os callbacks do scraper e grava contadores por categoria no job.
+    A gravação (e a checagem de cancelamento) acontece no máximo a cada
+    FLUSH_INTERVAL segundos; cada callback também vira um evento no
+    barramento do runner, entregue na hora às conexões SSE.
+    """
+
+    def __init__(self, runner, job_id: int, categories: dict | None = None):
+        self.runner = runner
+        self.job_id = job_id
+        self.categories = categories or {}
+        self.books_total = None
+        self.stage = None
+        self.catalog_version = None
+        self.http = None
+        self._last_flush = 0.0
+
+    def to_json(self) -> str:
+        return json.dumps({"stage": self.stage, "catalog_version": self.catalog_version,
+                           "http": self.http, "categories": self.categories})
+
+    @property
+    def pages_done(self) -> int:
+        return sum(c["pages_done"] for c in self.categories.values())
+
+    @property
+    def books_done(self) -> int:
+        return sum(c["books_done"] for c in self.categories.values())
+
+    def _emit(self, kind: str, **data):
+        self.runner.events.publish(self.job_id, kind, data)
+
+    def _category(self, name: str) -> dict:
+        return self.categories.setdefault(name, {
+            "status": "pending", "pages_done": 0, "pages_total": None,
+            "books_done": 0, "books_total": None,
+            "started_at": None, "finished_at": None,
+        })
+
+    # ---- callbacks chamados pelo pipeline ----
+    def stage_started(self, name: str):
+        self.stage = name
+        self._emit("stage", stage=name)
+        self.flush(force=True)
+
+    def published(self, version):
+        self.stage = "published"
+        self.catalog_version = version
+        self._emit("published", catalog_version=version)
+        self.flush(force=True)
+
+    # ---- callbacks chamados pelo scraper ----
+    def crawl_started(self, categories: list[str], books_total: int | None = None):
+        for name in categories:
+            self._category(name)
+        self.books_total = books_total
+        self._emit("crawl_started", categories=list(categories), books_total=books_total)
+        self.flush(force=True)
+
+    def category_started(self, name: str, books_total: int | None = None,
+                         pages_total: int | None = None):
+        cat = self._category(name)
+        cat.update(status="running", books_total=books_total, pages_total=pages_total,
+                   started_at=datetime.utcnow().isoformat())
+        self._emit("category_started", category=name, books_total=books_total, pages_total=pages_total)
+        self.flush()
+
+    def category_restored(self, name: str, pages: int, books: int, done: bool):
+        # Categoria (parcialmente) coletada numa execução anterior, vinda do checkpoint
+        cat = self._category(name)
+        cat.update(pages_done=pages, books_done=books, status="done" if done else "pending")
+        self._emit("category_restored", category=name, pages_done=pages, books_done=books, done=done)
+        self.flush()
+
+    def page_done(self, name: str, books: int):
+        cat = self._category(name)
+        cat["pages_done"] += 1
+        cat["books_done"] += books
+        # Contadores absolutos: um cliente que perdeu eventos se corrige no próximo
+        self._emit("page_done", category=name, pages_done=cat["pages_done"], books_done=cat["books_done"],
+                   pages_scraped=self.pages_done, books_scraped=self.books_done, books_total=self.books_total)
+        self.flush()
+
+    def category_finished(self, name: str):
+        cat = self._category(name)
+        cat.update(status="done", finished_at=datetime.utcnow().isoformat())
+        self._emit("category_finished", category=name, pages_done=cat["pages_done"], books_done=cat["books_done"])
+        self.flush()
+
+    def transport_metrics(self, snapshot: dict):
+        # Tempos de rede vs. parse do scraper; gravados junto com o próximo flush
+        self.http = snapshot
+
+    def error(self, name: str | None, message: str):
+        if name:
+            self._category(name)["last_error"] = message
+        self._emit("error", category=name, message=message)
+        self.flush()
+
+    def flush(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+
+        db.session.execute(
+            update(ScrapeJob).where(ScrapeJob.id == self.job_id).values(
+                pages_scraped=self.pages_done,
+                books_scraped=self.books_done,
+                books_total=self.books_total,
+                progress=self.to_json(),
+                heartbeat_at=datetime.utcnow()))
+        status = db.session.execute(
+            select(ScrapeJob.status).where(ScrapeJob.id == self.job_id)).scalar()
+        db.session.commit()
+
+        if status == CANCELLING:
+            raise JobCancelled()
+
+
+class ScrapeJobRunner:
+    def __init__(self, workers: int = JOB_WORKERS, stale_after: float = STALE_AFTER):
+        self.workers = workers
+        self.stale_after = stale_after
+        self.app = None
+        self.target = None
+        self.events = ScrapeEventBus()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, target):
+        """`target(progress, resume)` executa o pipeline e retorna os livros publicados."""
+        self.app = app
+        self.target = target
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix="scrape-job")
+        return self._executor
+
+    # ---- consultas ----
+    def latest(self) -> ScrapeJob | None:
+        return db.session.execute(
+            select(ScrapeJob).order_by(ScrapeJob.id.desc()).limit(1)).scalar()
+
+    def get(self, job_id: int) -> ScrapeJob | None:
+        return db.session.get(ScrapeJob, job_id)
+
+    def state(self, job_id: int) -> dict | None:
+        """to_dict() lido agora do banco (não do cache da sessão), encerrando a transação de leitura."""
+        job = db.session.execute(
+            select(ScrapeJob).where(ScrapeJob.id == job_id)
+            .execution_options(populate_existing=True)).scalar()
+        state = job.to_dict() if job is not None else None
+        db.session.commit()
+        return state
+
+    # ---- comandos ----
+    def _expire_stale(self):
+        # Jobs cujo worker morreu (sem heartbeat) deixam de bloquear novos jobs
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        db.session.execute(
+            update(ScrapeJob)
+            .where(ScrapeJob.status.in_(ACTIVE_STATES),
+                   db.func.coalesce(ScrapeJob.heartbeat_at, ScrapeJob.created_at) < cutoff)
+            .values(status=INTERRUPTED, end_time=datetime.utcnow(),
+                    error="Job interrompido (worker sem heartbeat)"))
+
+    def enqueue(self, started_by: str) -> ScrapeJob | None:
+        """Cria um job se não houver outro ativo; retorna None caso contrário."""
+        self._expire_stale()
+
+        active = aliased(ScrapeJob)
+        no_active = ~select(active.id).where(active.status.in_(ACTIVE_STATES)).exists()
+        now = datetime.utcnow()
+        stmt = insert(ScrapeJob).from_select(
+            ["status", "started_by", "created_at", "attempts", "pages_scraped", "books_scraped"],
+            select(literal(QUEUED), literal(started_by), literal(now, db.DateTime),
+                   literal(0), literal(0), literal(0)).where(no_active))
+        result = db.session.execute(stmt)
+        db.session.commit()
+
+        if not result.rowcount:
+            return None
+
+        job_id = result.lastrowid
+        self._submit(job_id)
+        return self.get(job_id)
+
+    def cancel(self, job_id: int | None = None) -> ScrapeJob | None:
+        job = self.get(job_id) if job_id else self.latest()
+        if job is None or job.status not in ACTIVE_STATES:
+            return None
+
+        now = datetime.utcnow()
+        db.session.execute(
+            update(ScrapeJob).where(ScrapeJob.id == job.id, ScrapeJob.status == QUEUED)
+            .values(status=CANCELLED, end_time=now))
+        db.session.execute(
+            update(ScrapeJob).where(ScrapeJob.id == job.id, ScrapeJob.status == RUNNING)
+            .values(status=CANCELLING))
+        db.session.commit()
+        db.session.refresh(job)
+        return job
+
+    def resume(self, job_id: int | None = None) -> ScrapeJob | None:
+        self._expire_stale()
+
+        job = self.get(job_id) if job_id else self.latest()
+        if job is None or job.status not in RESUMABLE_STATES:
+            return None
+
+        active = aliased(ScrapeJob)
+        result = db.session.execute(
+            update(ScrapeJob)
+            .where(ScrapeJob.id == job.id, ScrapeJob.status.in_(RESUMABLE_STATES),
+                   ~select(active.id).where(active.status.in_(ACTIVE_STATES)).exists())
+            .values(status=QUEUED, error=None, end_time=None, heartbeat_at=None,
+                    created_at=datetime.utcnow()))
+        db.session.commit()
+
+        if not result.rowcount:
+            return None
+
+        self._submit(job.id)
+        db.session.refresh(job)
+        return job
+
+    def recover(self):
+        """Chamado na subida: expira jobs órfãos e reenvia os que estavam na fila."""
+        self._expire_stale()
+        db.session.commit()
+        queued = db.session.execute(
+            select(ScrapeJob.id).where(ScrapeJob.status == QUEUED)).scalars().all()
+        for job_id in queued:
+            self._submit(job_id)
+
+    # ---- execução ----
+    def _submit(self, job_id: int):
+        self._get_executor().submit(self._run, job_id)
+
+    def _finish(self, job_id: int, status: str, **values):
+        db.session.execute(
+            update(ScrapeJob)
+            .where(ScrapeJob.id == job_id, ScrapeJob.status.in_((RUNNING, CANCELLING)))
+            .values(status=status, end_time=datetime.utcnow(), **values))
+        db.session.commit()
+        self.events.publish(job_id, EVENT_FINISHED, {
+            "status": status, "books_scraped": values.get("books_scraped"),
+            "pages_scraped": values.get("pages_scraped"), "error": values.get("error")})
+
+    def _heartbeat(self, job_id: int, stop: threading.Event):
+        with self.app.app_context():
+            try:
+                while not stop.wait(HEARTBEAT_INTERVAL):
+                    try:
+                        db.session.execute(
+                            update(ScrapeJob)
+                            .where(ScrapeJob.id == job_id, ScrapeJob.status.in_((RUNNING, CANCELLING)))
+                            .values(heartbeat_at=datetime.utcnow()))
+                        db.session.commit()
+                    except Exception as e:  # banco ocupado: tenta de novo no próximo intervalo
+                        db.session.rollback()
+                        print(f"[WARN] Heartbeat do job {job_id} falhou: {e}")
+            finally:
+                db.session.remove()
+
+    def _run(self, job_id: int):
+        stop_heartbeat = threading.Event()
+        with self.app.app_context():
+            try:
+                now = datetime.utcnow()
+                claimed = db.session.execute(
+                    update(ScrapeJob)
+                    .where(ScrapeJob.id == job_id, ScrapeJob.status == QUEUED)
+                    .values(status=RUNNING, start_time=now, heartbeat_at=now,
+                            attempts=ScrapeJob.attempts + 1)).rowcount
+                db.session.commit()
+                if not claimed:
+                    return
+                threading.Thread(target=self._heartbeat, args=(job_id, stop_heartbeat),
+                                 name=f"scrape-job-{job_id}-heartbeat", daemon=True).start()
+
+                job = self.get(job_id)
+                resume = job.attempts > 1
+                progress = ScrapeProgress(self, job_id)
+                self.events.publish(job_id, "started", {"job_id": job_id, "attempt": job.attempts,
+                                                        "started_by": job.started_by})
+                print(f"[SCRAPER] Job {job_id} iniciado por {job.started_by} (tentativa {job.attempts})")
+
+                try:
+                    rows = self.target(progress, resume)
+                except JobCancelled:
+                    db.session.rollback()
+                    self._finish(job_id, CANCELLED, pages_scraped=progress.pages_done,
+                                 books_scraped=progress.books_done,
+                                 progress=progress.to_json())
+                    print(f"[SCRAPER] Job {job_id} cancelado")
+                    return
+                except Exception as e:
+                    db.session.rollback()
+                    self._finish(job_id, FAILED, error=str(e),
+                                 pages_scraped=progress.pages_done,
+                                 books_scraped=progress.books_done,
+                                 progress=progress.to_json())
+                    print(f"[SCRAPER] Job {job_id} erro: {e}")
+                    return
+
+                books = len(rows) if rows is not None else progress.books_done
+                self._finish(job_id, FINISHED, books_scraped=books,
+                             pages_scraped=progress.pages_done,
+                             progress=progress.to_json())
+                print(f"[SCRAPER] Job {job_id} finalizado com sucesso! Livros: {books}")
+            finally:
+                stop_heartbeat.set()
+                db.session.remove()
+
+
+scrape_jobs = ScrapeJobRunner()
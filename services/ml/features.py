@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# Matriz de features para treino a partir da silver: categoria (one-hot e
+# ordinal), preço normalizado, estoque, tamanho do título e tokens do título
+# por hashing. Calculada uma vez por versão do catálogo e guardada em Parquet
+# (data/features/), então os jobs de treino não refazem features do CSV.
+
+import json
+import os
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FEATURES_DIR = Path(os.environ.get("ML_FEATURES_DIR",
+                                   Path(__file__).resolve().parents[2] / "data" / "features"))
+TITLE_HASH_DIM = int(os.environ.get("ML_TITLE_HASH_DIM", 64))
+FEATURE_SET_VERSION = 1  # mudar quando a definição das features mudar (invalida o cache)
+
+SPEC_KEY = b"feature_spec"
+
+
+def _token_buckets(tokens: np.ndarray, dim: int) -> tuple[np.ndarray, np.ndarray]:
+    # crc32 só uma vez por token distinto (o vocabulário é bem menor que o corpus)
+    codes, uniques = pd.factorize(tokens)
+    hashed = np.array([zlib.crc32(t.encode("utf-8")) for t in uniques], dtype=np.uint32)
+    buckets = (hashed % dim).astype(np.int64)
+    signs = np.where((hashed >> 31) & 1, -1.0, 1.0).astype(np.float32)
+    return buckets[codes], signs[codes]
+
+
+def hash_titles(titles: pd.Series, dim: int = TITLE_HASH_DIM) -> np.ndarray:
+    """Bag-of-words com hashing assinado, normalizado em L2 (n x dim, float32)."""
+    n = len(titles)
+    out = np.zeros(n * dim, dtype=np.float32)
+    tokens = titles.reset_index(drop=True).fillna("").astype(str).str.split().explode()
+    tokens = tokens[tokens.notna() & (tokens != "")]
+    if len(tokens):
+        rows = tokens.index.to_numpy(dtype=np.int64)
+        buckets, signs = _token_buckets(tokens.to_numpy(dtype=object), dim)
+        out += np.bincount(rows * dim + buckets, weights=signs, minlength=n * dim).astype(np.float32)
+    out = out.reshape(n, dim)
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    return np.divide(out, norms, out=out, where=norms > 0)
+
+
+class FeatureSpec:
+    """Parâmetros ajustados na silver (categorias, média/desvio do preço) para transformar qualquer livro."""
+
+    def __init__(self, categories: list[str], price_mean: float, price_std: float,
+                 hash_dim: int = TITLE_HASH_DIM):
+        self.categories = list(categories)
+        self.price_mean = float(price_mean)
+        self.price_std = float(price_std) or 1.0
+        self.hash_dim = int(hash_dim)
+        self._category_index = pd.Index(self.categories)
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame) -> "FeatureSpec":
+        categories = sorted(df["category"].dropna().astype(str).unique().tolist()) if "category" in df.columns else []
+        price = pd.to_numeric(df["raw_price"] if "raw_price" in df.columns else pd.Series(dtype="float64"),
+                              errors="coerce").astype("float64")
+        return cls(categories, np.nanmean(price) if price.notna().any() else 0.0,
+                   np.nanstd(price) if price.notna().sum() > 1 else 1.0)
+
+    @property
+    def names(self) -> list[str]:
+        return (["price_z", "price_log", "instock_log1p", "title_tokens", "category_code"]
+                + [f"cat={c}" for c in self.categories]
+                + [f"title_hash_{i}" for i in range(self.hash_dim)])
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        n = len(df)
+        index = df.index
+
+        def numeric(col):
+            values = df[col] if col in df.columns else pd.Series(np.nan, index=index)
+            return pd.to_numeric(values, errors="coerce").astype("float64").to_numpy()
+
+        price = numeric("raw_price")
+        price = np.where(np.isnan(price), self.price_mean, price)
+        instock = np.nan_to_num(numeric("instock"), nan=0.0).clip(min=0)
+
+        titles = (df["title"] if "title" in df.columns else pd.Series("", index=index)).fillna("").astype(str)
+        codes = self._category_index.get_indexer(
+            (df["category"] if "category" in df.columns else pd.Series("", index=index)).astype(str))
+
+        onehot = np.zeros((n, len(self.categories)), dtype=np.float32)
+        known = np.flatnonzero(codes >= 0)
+        onehot[known, codes[known]] = 1.0
+
+        dense = np.column_stack([
+            (price - self.price_mean) / self.price_std,
+            np.log1p(price.clip(min=0)),
+            np.log1p(instock),
+            titles.str.split().str.len().fillna(0).to_numpy(dtype="float64"),
+            codes.astype("float64"),
+        ]).astype(np.float32)
+
+        return np.hstack([dense, onehot, hash_titles(titles, self.hash_dim)])
+
+    def to_dict(self) -> dict:
+        return {"categories": self.categories, "price_mean": self.price_mean,
+                "price_std": self.price_std, "hash_dim": self.hash_dim,
+                "feature_set_version": FEATURE_SET_VERSION}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FeatureSpec":
+        return cls(data["categories"], data["price_mean"], data["price_std"], data["hash_dim"])
+
+
+class FeatureMatrix:
+    """Matriz pronta para treino de uma versão do catálogo (ids, X, rótulo = rating)."""
+
+    def __init__(self, version, spec: FeatureSpec, ids: np.ndarray, X: np.ndarray,
+                 labels: np.ndarray, path: Path | None = None):
+        self.version = version
+        self.spec = spec
+        self.ids = ids
+        self.X = X
+        self.labels = labels
+        self.path = path
+
+    @property
+    def names(self) -> list[str]:
+        return self.spec.names
+
+    def page(self, offset: int, limit: int) -> dict:
+        rows = slice(offset, offset + limit)
+        return {
+            "version": self.version,
+            "total": len(self.ids),
+            "offset": offset,
+            "limit": limit,
+            "features": self.names,
+            "label": "rating",
+            "ids": self.ids[rows].tolist(),
+            "labels": self.labels[rows].tolist(),
+            "X": self.X[rows].astype(np.float64).round(6).tolist(),
+        }
+
+
+def features_path(version, features_dir: Path | None = None) -> Path:
+    features_dir = Path(features_dir or FEATURES_DIR)
+    return features_dir / f"features-v{version}-f{FEATURE_SET_VERSION}.parquet"
+
+
+def build_matrix(df: pd.DataFrame, version) -> FeatureMatrix:
+    spec = FeatureSpec.fit(df)
+    X = spec.transform(df)
+    ids = df["id"].to_numpy(dtype=object, na_value="") if "id" in df.columns else np.arange(len(df)).astype(str)
+    rating = df["rating"] if "rating" in df.columns else pd.Series(0, index=df.index)
+    labels = pd.to_numeric(rating, errors="coerce").fillna(0).to_numpy(dtype=np.int8)
+    return FeatureMatrix(version, spec, ids, X, labels)
+
+
+def save_matrix(matrix: FeatureMatrix, path: Path) -> Path:
+    columns = {"id": pa.array(matrix.ids.tolist(), pa.string()),
+               "label": pa.array(matrix.labels, pa.int8())}
+    for i, name in enumerate(matrix.names):
+        columns[name] = pa.array(matrix.X[:, i], pa.float32())
+    table = pa.table(columns).replace_schema_metadata(
+        {SPEC_KEY: json.dumps(matrix.spec.to_dict()).encode("utf-8")})
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+    matrix.path = path
+    return path
+
+
+def load_matrix(path: Path, version) -> FeatureMatrix:
+    table = pq.read_table(path)
+    spec = FeatureSpec.from_dict(json.loads(table.schema.metadata[SPEC_KEY]))
+    X = np.column_stack([table.column(name).to_numpy() for name in spec.names]).astype(np.float32, copy=False)
+    return FeatureMatrix(version, spec, np.array(table.column("id").to_pylist(), dtype=object), X,
+                         table.column("label").to_numpy(), path)
+
+
+def get_matrix(snapshot, features_dir: Path | None = None) -> FeatureMatrix:
+    """
+    Matriz da versão servida: memória (cache do snapshot) -> disco -> cálculo.
+    Só é recalculada quando o catálogo muda de versão.
+    """
+    def build(df):
+        path = features_path(snapshot.version, features_dir)
+        if path.exists():
+            return load_matrix(path, snapshot.version)
+        matrix = build_matrix(df, snapshot.version)
+        save_matrix(matrix, path)
+        print(f"[INFO] Features da versão {snapshot.version} gravadas em {path}")
+        return matrix
+
+    return snapshot.cached("ml_features", build)
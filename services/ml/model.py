@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# Modelo de rating (regressão ridge sobre a matriz de features) para
+# /api/v1/ml/predictions. O modelo é carregado uma única vez (sob lock) e fica
+# em memória; pedidos concorrentes são agrupados em micro-lotes numa janela
+# curta e a inferência roda vetorizada sobre o lote inteiro.
+
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+
+from services.ml.features import FeatureSpec, FeatureMatrix
+
+MODEL_PATH = Path(os.environ.get("ML_MODEL_PATH",
+                                 Path(__file__).resolve().parents[2] / "data" / "models" / "rating_ridge.npz"))
+RIDGE_ALPHA = float(os.environ.get("ML_RIDGE_ALPHA", 1.0))
+BATCH_WINDOW_MS = float(os.environ.get("ML_BATCH_WINDOW_MS", 5))
+BATCH_MAX_ROWS = int(os.environ.get("ML_BATCH_MAX_ROWS", 1024))
+
+
+class RatingModel:
+    """Ridge em forma fechada; prevê o rating (0 a 5) de livros quaisquer via FeatureSpec."""
+
+    def __init__(self, spec: FeatureSpec, weights: np.ndarray, bias: float, trained_on=None):
+        self.spec = spec
+        self.weights = weights.astype(np.float32)
+        self.bias = float(bias)
+        self.trained_on = trained_on
+
+    @classmethod
+    def train(cls, matrix: FeatureMatrix, alpha: float = RIDGE_ALPHA) -> "RatingModel":
+        X = matrix.X.astype(np.float64)
+        y = matrix.labels.astype(np.float64)
+        x_mean, y_mean = X.mean(axis=0), y.mean()
+        Xc = X - x_mean
+        gram = Xc.T @ Xc + alpha * np.eye(X.shape[1])
+        weights = np.linalg.solve(gram, Xc.T @ (y - y_mean))
+        return cls(matrix.spec, weights, y_mean - x_mean @ weights, matrix.version)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return np.clip(X @ self.weights + self.bias, 0.0, 5.0)
+
+    def save(self, path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(tmp, weights=self.weights, bias=np.float64(self.bias),
+                 spec=np.array(json.dumps(self.spec.to_dict())),
+                 trained_on=np.array(str(self.trained_on)))
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "RatingModel":
+        with np.load(path) as data:
+            spec = FeatureSpec.from_dict(json.loads(str(data["spec"])))
+            return cls(spec, data["weights"], float(data["bias"]), str(data["trained_on"]))
+
+
+class ModelHolder:
+    """Carrega o modelo uma vez (lazy, thread-safe); treina e grava se não houver arquivo."""
+
+    def __init__(self, path: Path | None = None):
+        self.path = path
+        self._model = None
+        self._lock = threading.Lock()
+
+    def get(self, matrix_source=None) -> RatingModel:
+        model = self._model
+        if model is None:
+            with self._lock:
+                model = self._model
+                if model is None:
+                    model = self._model = self._load_or_train(matrix_source)
+        return model
+
+    def _load_or_train(self, matrix_source) -> RatingModel:
+        path = Path(self.path or MODEL_PATH)
+        if path.exists():
+            model = RatingModel.load(path)
+            print(f"[INFO] Modelo carregado de {path}")
+            return model
+        if matrix_source is None:
+            raise FileNotFoundError(f"Modelo não encontrado em {path}")
+        model = RatingModel.train(matrix_source())
+        model.save(path)
+        print(f"[OK] Modelo treinado na versão {model.trained_on} e gravado em {path}")
+        return model
+
+    def reset(self):
+        with self._lock:
+            self._model = None
+
+
+class MicroBatcher:
+    """
+    Agrupa pedidos concorrentes: o worker espera até `window_ms` (ou até
+    `max_rows` linhas) e executa uma única chamada vetorizada para o lote.
+    """
+
+    def __init__(self, predict, window_ms: float = BATCH_WINDOW_MS, max_rows: int = BATCH_MAX_ROWS):
+        self.predict = predict
+        self.window = window_ms / 1000
+        self.max_rows = max_rows
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._loop, name="ml-batcher", daemon=True)
+                    self._worker.start()
+
+    def submit(self, X: np.ndarray) -> Future:
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((X, future, time.perf_counter()))
+        return future
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            rows = len(batch[0][0])
+            deadline = time.perf_counter() + self.window
+            while rows < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            self._run(batch, rows)
+
+    def _run(self, batch: list, rows: int):
+        started = time.perf_counter()
+        try:
+            y = self.predict(np.vstack([X for X, _, _ in batch]))
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        inference_ms = (time.perf_counter() - started) * 1000
+
+        offset = 0
+        for X, future, queued_at in batch:
+            future.set_result({
+                "predictions": y[offset:offset + len(X)],
+                "queue_ms": (started - queued_at) * 1000,
+                "inference_ms": inference_ms,
+                "batch_rows": rows,
+                "batch_requests": len(batch),
+            })
+            offset += len(X)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+# Tabela de vizinhos para /api/v1/books/<id>/similar, calculada no ETL.
+# Similaridade = cosseno dos títulos (TF-IDF com hashing dos tokens normalizados
+# pelo clean_books) + mesma categoria + mesma faixa de preço + rating próximo.
+# Os títulos ficam numa matriz esparsa (CSR) e os candidatos de cada livro vêm
+# de um índice invertido dos tokens mais pesados, restrito à mesma categoria,
+# mais os vizinhos de faixa de preço e rating: só esses pares são pontuados,
+# sem matriz n x n. Na API a consulta é só uma leitura dos k vizinhos já guardados.
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from services.ml.features import _token_buckets
+
+NEIGHBOURS_FILE = "neighbours.parquet"
+NEIGHBOURS_K = int(os.environ.get("SIMILAR_K", 20))
+HASH_DIM = int(os.environ.get("SIMILAR_HASH_DIM", 512))
+BLOCK_ROWS = int(os.environ.get("SIMILAR_BLOCK_ROWS", 1024))
+# Tokens de cada título usados para achar candidatos e quantos livros vizinhos
+# em cada lista do índice invertido (de cada lado) viram candidatos
+TOP_TOKENS = int(os.environ.get("SIMILAR_TOP_TOKENS", 4))
+TOKEN_WINDOW = int(os.environ.get("SIMILAR_TOKEN_WINDOW", 16))
+PRICE_BANDS = 5
+
+# Pesos de cada sinal na nota final (somam 1)
+W_TITLE, W_CATEGORY, W_PRICE, W_RATING = 0.6, 0.2, 0.1, 0.1
+
+META_KEY = b"neighbours"
+
+
+def _expand(starts: np.ndarray, lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Índices de todos os intervalos [start, start+length) concatenados e o intervalo de cada um."""
+    owner = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.arange(len(owner)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets, owner
+
+
+class SparseRows:
+    """Matriz esparsa em CSR (indptr, colunas ordenadas por linha, pesos)."""
+
+    def __init__(self, indptr: np.ndarray, columns: np.ndarray, weights: np.ndarray, dim: int):
+        self.indptr = indptr
+        self.columns = columns
+        self.weights = weights
+        self.dim = dim
+        self.rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.indptr) - 1, self.dim
+
+    def dense(self, start: int, end: int) -> np.ndarray:
+        """Linhas [start, end) densas."""
+        lo, hi = self.indptr[start], self.indptr[end]
+        out = np.zeros((end - start, self.dim), dtype=np.float32)
+        out[self.rows[lo:hi] - start, self.columns[lo:hi]] = self.weights[lo:hi]
+        return out
+
+    def dot(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Produto interno das linhas a[i] e b[i], par a par (linhas de a em [a.min(), a.max()])."""
+        if not len(a):
+            return np.zeros(0, dtype=np.float32)
+        start = int(a.min())
+        block = self.dense(start, int(a.max()) + 1)  # bloco pequeno e denso; b continua esparso
+        entries, pair = _expand(self.indptr[b], np.diff(self.indptr)[b])
+        prod = block[a[pair] - start, self.columns[entries]] * self.weights[entries]
+        return np.bincount(pair, weights=prod, minlength=len(a)).astype(np.float32)
+
+    def toarray(self) -> np.ndarray:
+        dense = np.zeros(self.shape, dtype=np.float32)
+        dense[self.rows, self.columns] = self.weights
+        return dense
+
+
+def title_tfidf(titles: pd.Series, dim: int = HASH_DIM) -> SparseRows:
+    """TF-IDF (tf sublinear) sobre tokens com hashing, normalizado em L2 (n x dim, esparsa)."""
+    n = len(titles)
+    tokens = titles.reset_index(drop=True).fillna("").astype(str).str.split().explode()
+    tokens = tokens[tokens.notna() & (tokens != "")]
+    if not len(tokens):
+        return SparseRows(np.zeros(n + 1, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                          np.zeros(0, dtype=np.float32), dim)
+
+    buckets, _ = _token_buckets(tokens.to_numpy(dtype=object), dim)
+    keys, counts = np.unique(tokens.index.to_numpy(dtype=np.int64) * dim + buckets, return_counts=True)
+    rows, columns = keys // dim, keys % dim
+
+    doc_freq = np.bincount(columns, minlength=dim)
+    idf = np.log((1 + n) / (1 + doc_freq)) + 1
+    weights = np.log1p(counts) * idf[columns]
+    norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=n))
+    weights = (weights / norms[rows]).astype(np.float32)
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=n))))
+    return SparseRows(indptr, columns, weights, dim)
+
+
+def _price_bands(price: pd.Series) -> np.ndarray:
+    price = pd.to_numeric(price, errors="coerce").astype("float64")
+    bands = np.full(len(price), -1, dtype=np.int16)
+    valid = price.notna().to_numpy()
+    if valid.any():
+        ranks = price[valid].rank(method="first", pct=True).to_numpy()
+        bands[valid] = np.minimum((ranks * PRICE_BANDS).astype(np.int16), PRICE_BANDS - 1)
+    return bands
+
+
+class _Windows:
+    """
+    Itens ordenados por uma chave, divididos em grupos: os candidatos de um item
+    são os até `width` vizinhos de cada lado dentro do mesmo grupo.
+    """
+
+    def __init__(self, owners: np.ndarray, group: np.ndarray, order: np.ndarray, width: int):
+        self.owners = owners[order]  # livro de cada item, na ordem da chave
+        self.position = np.empty(len(order), dtype=np.int64)
+        self.position[order] = np.arange(len(order))
+        sorted_group = group[order]
+        bounds = np.flatnonzero(np.diff(sorted_group)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(order)]))
+        run = np.repeat(np.arange(len(starts)), ends - starts)
+        self.lo, self.hi = starts[run], ends[run]
+        self.width = width
+
+    def pairs(self, items: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        p = self.position[items]
+        lo = np.maximum(self.lo[p], p - self.width)
+        hi = np.minimum(self.hi[p], p + self.width + 1)
+        near, which = _expand(lo, hi - lo)
+        keep = near != p[which]
+        return self.owners[p[which][keep]], self.owners[near[keep]]
+
+
+def build_neighbours(df: pd.DataFrame, k: int = NEIGHBOURS_K, block_rows: int = BLOCK_ROWS,
+                     top_tokens: int = TOP_TOKENS, window: int = TOKEN_WINDOW) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k vizinhos de cada linha na mesma categoria: (posições n x k int32, notas
+    n x k float32). Linhas com menos de k candidatos ficam com posição -1 no fim.
+    """
+    n = len(df)
+    k = max(0, min(k, n - 1))
+    if k == 0:
+        return np.zeros((n, 0), dtype=np.int32), np.zeros((n, 0), dtype=np.float32)
+
+    T = title_tfidf(df["title"] if "title" in df.columns else pd.Series("", index=df.index))
+    category = (pd.factorize(df["category"].astype(str))[0] if "category" in df.columns
+                else np.zeros(n, dtype=np.int64))
+    bands = _price_bands(df["raw_price"] if "raw_price" in df.columns else pd.Series(np.nan, index=df.index))
+    rating = pd.to_numeric(df.get("rating", pd.Series(0, index=df.index)), errors="coerce").fillna(0)
+    rating = rating.to_numpy(dtype=np.float32)
+
+    # Índice invertido (categoria, token) sobre os top_tokens mais pesados de cada título,
+    # cada lista ordenada por faixa de preço e rating
+    by_weight = np.lexsort((-T.weights, T.rows))
+    rank = np.arange(len(by_weight)) - T.indptr[T.rows[by_weight]]
+    top = np.sort(by_weight[rank < top_tokens])  # entradas da CSR, agrupadas por linha
+    top_rows = T.rows[top]
+    top_ptr = np.concatenate(([0], np.cumsum(np.bincount(top_rows, minlength=n))))
+    token_group = category[top_rows].astype(np.int64) * T.dim + T.columns[top]
+    tokens = _Windows(top_rows, token_group,
+                      np.lexsort((top_rows, rating[top_rows], bands[top_rows], token_group)), window)
+    # Sem token em comum: os vizinhos de faixa de preço e rating na mesma categoria
+    rows = np.arange(n)
+    fallback = _Windows(rows, category, np.lexsort((rows, rating, bands, category)), k)
+
+    positions = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+
+    for start in range(0, n, block_rows):
+        end = min(start + block_rows, n)
+        a1, b1 = tokens.pairs(np.arange(top_ptr[start], top_ptr[end]))
+        a2, b2 = fallback.pairs(np.arange(start, end))
+        pair = np.sort(np.concatenate((a1, a2)).astype(np.int64) * n + np.concatenate((b1, b2)))
+        pair = pair[np.concatenate(([True], pair[1:] != pair[:-1]))]  # sem pares repetidos
+        a, b = pair // n, pair % n
+
+        S = W_TITLE * T.dot(a, b)
+        S += W_CATEGORY * (category[a] == category[b])
+        S += W_PRICE * ((bands[a] == bands[b]) & (bands[a] >= 0))
+        S += W_RATING * (1 - np.abs(rating[a] - rating[b]) / 5)
+
+        # Notas em [0, 1]: uma chave só ordena por linha e, dentro dela, da maior nota para a menor
+        order = np.argsort((a - start) * 2.0 + (1.0 - S), kind="stable")
+        a, b, S = a[order], b[order], S[order]
+        first = np.searchsorted(a, np.arange(start, end))
+        rank = np.arange(len(a)) - first[a - start]
+        keep = rank < k
+        positions[a[keep], rank[keep]] = b[keep]
+        scores[a[keep], rank[keep]] = S[keep]
+
+    return positions, scores
+
+
+def save_neighbours(df: pd.DataFrame, positions: np.ndarray, scores: np.ndarray,
+                    version, silver_dir: Path) -> Path:
+    ids = df["id"].to_numpy(dtype=object, na_value="")
+    found = positions >= 0  # livros com menos de k candidatos
+    offsets = pa.array(np.concatenate(([0], np.cumsum(found.sum(axis=1)))).astype(np.int32))
+    table = pa.table({
+        "id": pa.array(ids.tolist(), pa.string()),
+        "neighbours": pa.ListArray.from_arrays(offsets, pa.array(ids[positions[found]].tolist(), pa.string())),
+        "scores": pa.ListArray.from_arrays(offsets, pa.array(scores[found], pa.float32())),
+    }).replace_schema_metadata({META_KEY: json.dumps({"version": version}).encode("utf-8")})
+
+    path = Path(silver_dir) / NEIGHBOURS_FILE
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+class NeighbourTable:
+    """Vizinhos alinhados às linhas de uma versão do catálogo (posições, notas)."""
+
+    def __init__(self, positions: np.ndarray, scores: np.ndarray):
+        self.positions = positions
+        self.scores = scores
+
+    def lookup(self, pos: int, k: int) -> tuple[np.ndarray, np.ndarray]:
+        neighbours, scores = self.positions[pos, :k], self.scores[pos, :k]
+        keep = neighbours >= 0
+        return neighbours[keep], scores[keep]
+
+
+def build_table(df: pd.DataFrame) -> NeighbourTable:
+    """Calcula os vizinhos em memória (warmup de uma versão publicada sem a tabela)."""
+    return NeighbourTable(*build_neighbours(df))
+
+
+def load_neighbours(df: pd.DataFrame, version, silver_dir: Path) -> NeighbourTable | None:
+    """
+    Lê a tabela gravada pelo ETL para esta versão e traduz ids -> posições.
+    Retorna None se ela não existir ou for de outra versão (nada é calculado aqui).
+    """
+    path = Path(silver_dir) / NEIGHBOURS_FILE
+    try:
+        metadata = pq.read_schema(path).metadata or {}  # só o rodapé: a tabela é lida se for da versão
+    except FileNotFoundError:
+        return None
+    if json.loads(metadata.get(META_KEY, b"{}")).get("version") != version:
+        return None
+
+    table = pq.read_table(path)
+    index = pd.Index(df["id"].to_numpy(dtype=object, na_value=""))
+    rows = index.get_indexer(table.column("id").to_pylist())
+    neighbours = table.column("neighbours").combine_chunks()
+    offsets = neighbours.offsets.to_numpy()
+    lengths = np.diff(offsets)
+    k = int(lengths.max()) if len(lengths) else 0
+
+    positions = np.full((len(df), k), -1, dtype=np.int32)
+    scores = np.zeros((len(df), k), dtype=np.float32)
+    flat = index.get_indexer(neighbours.flatten().to_pylist())
+    flat_scores = table.column("scores").combine_chunks().flatten().to_numpy()
+    found = rows >= 0
+
+    if (lengths == k).all():
+        # Caso normal: k vizinhos por livro, cópia vetorizada
+        positions[rows[found]] = flat.reshape(-1, k)[found]
+        scores[rows[found]] = flat_scores.reshape(-1, k)[found]
+    else:
+        # Categorias pequenas deixam livros com menos de k vizinhos
+        entry_row = np.repeat(rows, lengths)
+        column = np.arange(len(flat)) - np.repeat(offsets[:-1], lengths)
+        keep = entry_row >= 0
+        positions[entry_row[keep], column[keep]] = flat[keep]
+        scores[entry_row[keep], column[keep]] = flat_scores[keep]
+    return NeighbourTable(positions, scores)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# Health check em cache: uma thread refaz a checagem a cada HEALTH_PROBE_INTERVAL_S
+# e /api/v1/health só lê o último resultado, sem abrir conexão por requisição.
+# A thread sobe na primeira leitura; se parar de atualizar (resultado com mais de
+# 3 intervalos), a leitura checa na hora.
+
+import os
+import threading
+from datetime import datetime
+from time import monotonic
+
+HEALTH_PROBE_INTERVAL_S = float(os.environ.get("HEALTH_PROBE_INTERVAL_S", 5))
+
+
+class HealthProbe:
+    def __init__(self, check, interval_s: float = HEALTH_PROBE_INTERVAL_S):
+        self.check = check  # () -> bool
+        self.interval_s = interval_s
+        self._result = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def probe(self) -> dict:
+        try:
+            ok = bool(self.check())
+        except Exception:
+            ok = False
+        result = {"database": "Online" if ok else "Offline",
+                  "checked_at": datetime.now().isoformat()}
+        with self._lock:
+            self._result, self._checked = result, monotonic()
+        return result
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.probe()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="health-probe", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def result(self) -> dict:
+        with self._lock:
+            result, age = self._result, monotonic() - self._checked
+        if result is None or age > 3 * self.interval_s:
+            result = self.probe()
+        self.start()
+        return result
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# Contabilidade de memória do worker: tamanho do catálogo por coluna, das
+# estruturas derivadas de cada versão (índices, caches, respostas prontas) e o
+# pico de alocação por rota, medido com tracemalloc numa amostra das requisições
+# (MEMORY_SAMPLE_RATE). Só uma requisição é rastreada por vez; como o tracemalloc
+# vê o processo inteiro, com requisições concorrentes o pico é um limite superior.
+
+import functools
+import os
+import random
+import resource
+import sys
+import threading
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+MEMORY_SAMPLE_RATE = float(os.environ.get("MEMORY_SAMPLE_RATE", 0.01))
+TRACE_FRAMES = int(os.environ.get("MEMORY_TRACE_FRAMES", 1))
+TOP_SITES = 5
+
+_trace_lock = threading.Lock()
+
+
+def _mb(n: int | float) -> float:
+    return round(n / 2**20, 3)
+
+
+def deep_nbytes(obj, _seen: set | None = None, _depth: int = 0) -> int:
+    """Estimativa dos bytes de um objeto e do que ele referencia (arrays, frames, dicts, atributos)."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen or _depth > 8:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True, index=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(obj, pd.Index):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        size = obj.nbytes if obj.base is None or id(obj.base) not in seen else 0
+        if obj.dtype == object and obj.size:
+            head = obj.ravel()[:1000]
+            size += int(sum(sys.getsizeof(x) for x in head) / len(head) * obj.size)
+        return size
+    if isinstance(obj, (bytes, bytearray, str, int, float, bool)) or obj is None:
+        return sys.getsizeof(obj)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return size + sum(deep_nbytes(k, seen, _depth + 1) + deep_nbytes(v, seen, _depth + 1)
+                          for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(deep_nbytes(x, seen, _depth + 1) for x in obj)
+    fields = getattr(obj, "__dict__", None)
+    if fields is not None:
+        size += deep_nbytes(fields, seen, _depth + 1)
+    for slot in getattr(type(obj), "__slots__", ()):
+        size += deep_nbytes(getattr(obj, slot, None), seen, _depth + 1)
+    return size
+
+
+def catalog_footprint(snapshot, derived: bool = True) -> dict:
+    """Bytes do catálogo servido por coluna e, opcionalmente, de cada estrutura derivada da versão."""
+    df = snapshot.df
+    columns = df.memory_usage(deep=True, index=False)
+    report = {
+        "version": snapshot.version,
+        "rows": int(len(df)),
+        "columns_mb": {col: _mb(int(n)) for col, n in columns.items()},
+        "frame_mb": _mb(int(columns.sum())),
+        "bytes_per_book": round(int(columns.sum()) / len(df), 1) if len(df) else 0,
+    }
+    if derived:
+        sizes = {name: deep_nbytes(value) for name, value in snapshot.derived().items()}
+        report["derived_mb"] = {name: _mb(n) for name, n in sorted(sizes.items(), key=lambda kv: -kv[1])}
+        report["total_mb"] = _mb(int(columns.sum()) + sum(sizes.values()))
+    return report
+
+
+def process_memory() -> dict:
+    """RSS atual e pico do processo (/proc em Linux; getrusage como alternativa)."""
+    out = {"pid": os.getpid(), "rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    out["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("VmHWM:"):
+                    out["peak_rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        # ru_maxrss vem em KB no Linux e em bytes no macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        out["peak_rss_mb"] = round(peak / (2**20 if sys.platform == "darwin" else 1024), 1)
+    return out
+
+
+class RouteAllocations:
+    """Pico de alocação (tracemalloc) por rota, nas requisições amostradas deste worker."""
+
+    def __init__(self):
+        self.routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, peak: int, retained: int, top: list):
+        with self._lock:
+            r = self.routes.setdefault(route, {"samples": 0, "peak_mb_max": 0.0, "_peak_sum": 0})
+            r["samples"] += 1
+            r["_peak_sum"] += peak
+            r["peak_mb_last"] = _mb(peak)
+            r["retained_mb_last"] = _mb(retained)
+            r["last_sampled_at"] = datetime.now().isoformat(timespec="seconds")
+            if _mb(peak) >= r["peak_mb_max"]:
+                r["peak_mb_max"] = _mb(peak)
+                r["top_sites_at_max"] = top
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {route: {**{k: v for k, v in r.items() if not k.startswith("_")},
+                            "peak_mb_avg": _mb(r["_peak_sum"] / r["samples"])}
+                    for route, r in self.routes.items()}
+
+    def reset(self):
+        with self._lock:
+            self.routes.clear()
+
+
+allocations = RouteAllocations()
+
+
+def _top_sites(snapshot: tracemalloc.Snapshot) -> list[dict]:
+    snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),
+                                       tracemalloc.Filter(False, __file__)))
+    return [{"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "mb": _mb(stat.size), "blocks": stat.count}
+            for stat in snapshot.statistics("lineno")[:TOP_SITES]]
+
+
+def tracked(route: str):
+    """Mede o pico de alocação da view numa amostra das requisições (uma rastreada por vez)."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not (MEMORY_SAMPLE_RATE > 0 and random.random() < MEMORY_SAMPLE_RATE):
+                return view(*args, **kwargs)
+            if not _trace_lock.acquire(blocking=False):
+                return view(*args, **kwargs)
+            try:
+                started_here = not tracemalloc.is_tracing()
+                if started_here:
+                    tracemalloc.start(TRACE_FRAMES)
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                result = view(*args, **kwargs)
+                current, peak = tracemalloc.get_traced_memory()
+                top = _top_sites(tracemalloc.take_snapshot())
+                allocations.record(route, peak - base, current - base, top)
+                return result
+            finally:
+                if started_here:
+                    tracemalloc.stop()
+                _trace_lock.release()
+        return wrapper
+    return decorator
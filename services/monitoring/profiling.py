@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# Profiling sob demanda por requisição. Ativado pelo header X-Profile (só para
+# administradores) ou por amostragem (PROFILE_SAMPLE_RATE). Dois modos:
+#   sample   - thread que amostra a pilha da requisição a cada PROFILE_INTERVAL_MS
+#              e grava pilhas colapsadas (formato do flamegraph.pl / speedscope)
+#   cprofile - profiler determinístico (cProfile), gravado como .prof (pstats)
+# Além disso, cada perfil traz o tempo por fase (auth, load, filter, serialize, log).
+# Os perfis ficam em PROFILE_DIR (compartilhado entre workers), com os PROFILE_KEEP mais recentes.
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import secrets
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", Path(__file__).resolve().parents[2] / "data" / "profiles"))
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 1))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 200))
+
+HEADER = "X-Profile"
+MODES = ("sample", "cprofile")
+# Extensão do arquivo de cada formato para download
+FORMATS = {"json": ".json", "collapsed": ".collapsed", "prof": ".prof"}
+
+_ID_RE = re.compile(r"^\d{8}T\d{6}-[0-9a-f]{6}$")
+_current: ContextVar = ContextVar("request_profile", default=None)
+
+
+@contextmanager
+def phase(name: str):
+    """Soma o tempo do bloco na fase `name` do perfil ativo (sem custo quando não há perfil)."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, perf_counter() - started)
+
+
+def sampled() -> bool:
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def choose_mode(header_value: str | None, admin: bool, was_sampled: bool) -> tuple[str | None, str | None]:
+    """(modo, motivo) para esta requisição, ou (None, None) se não deve ser perfilada."""
+    if header_value and admin:
+        value = header_value.strip().lower()
+        return (value if value in MODES else "sample"), "header"
+    if was_sampled:
+        return "sample", "sampled"
+    return None, None
+
+
+class StackSampler:
+    """Amostra a pilha de uma thread e conta as pilhas colapsadas ("a;b;c" -> n)."""
+
+    def __init__(self, thread_id: int, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ";".join(reversed(names))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in sorted(self.stacks.items(), key=lambda kv: -kv[1]))
+
+
+class RequestProfile:
+    """Perfil de uma requisição: fases, amostras de pilha ou cProfile."""
+
+    def __init__(self, mode: str, reason: str, method: str, path: str):
+        self.id = f"{datetime.now():%Y%m%dT%H%M%S}-{secrets.token_hex(3)}"
+        self.mode = mode
+        self.reason = reason
+        self.method = method
+        self.path = path
+        self.phases = {}
+        self._started = None
+        self._handler_started = None
+        self._handler_phases = 0.0
+        self._token = None
+        self._sampler = None
+        self._profiler = None
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def start(self, auth_seconds: float = 0.0):
+        self._started = perf_counter() - auth_seconds
+        self.add("auth", auth_seconds)
+        self._token = _current.set(self)
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident())
+            self._sampler.start()
+
+    def handler_started(self):
+        # Chamado depois do log, do rate limit e da autenticação do before_request
+        self._handler_started = perf_counter()
+        self._handler_phases = sum(self.phases.values())
+
+    def handler_finished(self):
+        # Fim da view: o que não caiu em nenhuma fase medida dentro dela conta como filter
+        if self._handler_started is not None:
+            handler = perf_counter() - self._handler_started
+            inner = sum(self.phases.values()) - self._handler_phases
+            self.add("filter", max(0.0, handler - inner))
+            self._handler_started = None
+
+    def stop(self):
+        self.handler_finished()
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:  # contexto diferente do start (não deveria acontecer no Flask)
+                _current.set(None)
+            self._token = None
+
+    def save(self, status: int, profile_dir: Path | None = None) -> dict:
+        profile_dir = Path(profile_dir or PROFILE_DIR)
+        profile_dir.mkdir(parents=True, exist_ok=True)
+
+        meta = {
+            "id": self.id,
+            "created_at": datetime.now().isoformat(timespec="milliseconds"),
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "mode": self.mode,
+            "reason": self.reason,
+            "duration_ms": round((perf_counter() - self._started) * 1000, 3),
+            "phases_ms": {k: round(v * 1000, 3) for k, v in self.phases.items()},
+        }
+        if self._profiler is not None:
+            self._profiler.dump_stats(profile_dir / f"{self.id}.prof")
+            meta["formats"] = ["json", "prof"]
+            meta["top"] = _top_functions(self._profiler)
+        else:
+            (profile_dir / f"{self.id}.collapsed").write_text(self._sampler.collapsed(), encoding="utf-8")
+            meta["formats"] = ["json", "collapsed"]
+            meta["samples"] = self._sampler.samples
+            meta["interval_ms"] = PROFILE_INTERVAL_MS
+
+        (profile_dir / f"{self.id}.json").write_text(json.dumps(meta), encoding="utf-8")
+        _prune(profile_dir)
+        return meta
+
+
+def _top_functions(profiler: cProfile.Profile, limit: int = 20) -> list[dict]:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = sorted(stats.stats.items(), key=lambda kv: -kv[1][3])[:limit]
+    return [{"function": f"{name} ({Path(file).name}:{line})", "calls": nc,
+             "tottime_ms": round(tt * 1000, 3), "cumtime_ms": round(ct * 1000, 3)}
+            for (file, line, name), (cc, nc, tt, ct, _) in rows]
+
+
+def _prune(profile_dir: Path):
+    metas = sorted(profile_dir.glob("*.json"))
+    for old in metas[:max(0, len(metas) - PROFILE_KEEP)]:
+        for ext in FORMATS.values():
+            old.with_suffix(ext).unlink(missing_ok=True)
+
+
+def list_profiles(profile_dir: Path | None = None, limit: int = 50) -> list[dict]:
+    profile_dir = Path(profile_dir or PROFILE_DIR)
+    if not profile_dir.exists():
+        return []
+    out = []
+    for path in sorted(profile_dir.glob("*.json"), reverse=True)[:limit]:
+        try:
+            out.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue  # removido ou ainda sendo gravado por outro worker
+    return out
+
+
+def profile_file(profile_id: str, fmt: str, profile_dir: Path | None = None) -> Path | None:
+    if not _ID_RE.match(profile_id) or fmt not in FORMATS:
+        return None
+    path = Path(profile_dir or PROFILE_DIR) / f"{profile_id}{FORMATS[fmt]}"
+    return path if path.exists() else None
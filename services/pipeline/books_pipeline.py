@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Pipeline completo em processo: extract (scraper -> bronze), transform
+# (clean_books -> silver), publish (gravação atômica + aviso ao catálogo da API)
+# e o snapshot de preço/estoque no histórico particionado (services/pipeline/history.py).
+# Uso manual: python -m services.pipeline.books_pipeline
+
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import services.ml.similar as similar
+import services.pipeline.history as history
+import services.scraper.extractors.scrape_books as books_scraper
+import services.scraper.transformers.clean_books as books_cleaner
+
+
+class _NoProgress:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def run(progress=None, on_publish=None, resume: bool | None = None) -> pd.DataFrame:
+    """
+    Executa os três estágios e retorna a silver publicada.
+    `resume` é repassado ao scraper (retomar do checkpoint do crawl).
+    `on_publish(manifest)` é chamado depois que os arquivos novos estão no lugar,
+    para a API trocar o catálogo em memória sem restart.
+    """
+    progress = progress or _NoProgress()
+    timings = {}
+    scraped_at = datetime.now()
+
+    started = time.perf_counter()
+    progress.stage_started("extract")
+    bronze = books_scraper.main(progress=progress, resume=resume)
+    timings["extract"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    progress.stage_started("transform")
+    silver = books_cleaner.clean(bronze)
+    timings["transform"] = time.perf_counter() - started
+
+    # Vizinhos mais próximos calculados aqui, não por requisição na API
+    started = time.perf_counter()
+    progress.stage_started("similar")
+    neighbours = similar.build_neighbours(silver.reset_index(drop=True))
+    timings["similar"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    progress.stage_started("publish")
+    manifest = books_cleaner.publish(silver, before_manifest=lambda version: similar.save_neighbours(
+        silver, *neighbours, version, books_cleaner.SILVER_DIR))
+    if on_publish is not None:
+        on_publish(manifest)
+    timings["publish"] = time.perf_counter() - started
+
+    # Snapshot de preço/estoque desta execução (falha aqui não desfaz a publicação)
+    started = time.perf_counter()
+    try:
+        history.append_snapshot(silver, scraped_at, manifest["version"])
+    except Exception as e:
+        print(f"[WARN] Histórico de preços não gravado ({e})")
+    timings["history"] = time.perf_counter() - started
+
+    progress.published(manifest["version"])
+    print(f"[PIPELINE] Silver v{manifest['version']} publicada com {len(silver)} livros | "
+          + " | ".join(f"{k}: {v:.1f}s" for k, v in timings.items()))
+
+    return silver
+
+
+if __name__ == "__main__":
+    run()
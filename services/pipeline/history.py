@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Histórico de preço e estoque: cada execução do pipeline acrescenta um snapshot
+# da silver em data/history/scrape_date=AAAA-MM-DD/run-*.parquet (partição Hive).
+# As consultas usam pyarrow.dataset: o filtro por data poda partições inteiras e
+# o filtro por id é empurrado para as estatísticas dos row groups (arquivos
+# ordenados por id).
+# Backfill manual com a silver atual: python -m services.pipeline.history
+
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+HISTORY_DIR = Path(os.environ.get("HISTORY_DIR", Path(__file__).resolve().parents[2] / "data" / "history"))
+ROW_GROUP_SIZE = int(os.environ.get("HISTORY_ROW_GROUP_SIZE", 65536))
+
+# Schema fixo: snapshots sem alguma coluna gravam nulos, e o dataset é aberto
+# com ele em vez de inferir do primeiro arquivo encontrado
+SNAPSHOT_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("title", pa.string()),
+    ("category", pa.string()),
+    ("raw_price", pa.float64()),
+    ("instock", pa.float64()),
+    ("rating", pa.float64()),
+    ("scraped_at", pa.timestamp("us")),
+    ("catalog_version", pa.string()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("scrape_date", pa.string())]), flavor="hive")
+DATASET_SCHEMA = SNAPSHOT_SCHEMA.append(pa.field("scrape_date", pa.string()))
+
+
+def append_snapshot(df: pd.DataFrame, scraped_at: datetime | None = None,
+                    catalog_version=None, history_dir: Path | None = None) -> Path:
+    """Grava o snapshot de uma execução na partição do dia; retorna o arquivo criado."""
+    history_dir = history_dir or HISTORY_DIR
+    scraped_at = scraped_at or datetime.now()
+
+    snap = pd.DataFrame(index=df.index)
+    for col in ("id", "title", "category"):
+        snap[col] = df[col].astype(str) if col in df.columns else None
+    for col in ("raw_price", "instock", "rating"):
+        snap[col] = pd.to_numeric(df[col], errors="coerce") if col in df.columns else None
+    snap["scraped_at"] = pd.Timestamp(scraped_at).as_unit("us")
+    snap["catalog_version"] = None if catalog_version is None else str(catalog_version)
+    snap = snap.sort_values("id", kind="stable")
+
+    partition = history_dir / f"scrape_date={scraped_at.date().isoformat()}"
+    partition.mkdir(parents=True, exist_ok=True)
+    out = partition / f"run-{scraped_at.strftime('%Y%m%dT%H%M%S%f')}.parquet"
+
+    tmp = out.with_name(f".{out.name}.tmp")
+    table = pa.Table.from_pandas(snap, schema=SNAPSHOT_SCHEMA, preserve_index=False)
+    pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, out)
+    return out
+
+
+def _dataset(history_dir: Path | None = None):
+    history_dir = history_dir or HISTORY_DIR
+    if not history_dir.exists():
+        return None
+    dataset = ds.dataset(history_dir, schema=DATASET_SCHEMA, format="parquet",
+                         partitioning=PARTITIONING)
+    return dataset if dataset.files else None
+
+
+def book_history(book_id: str, history_dir: Path | None = None) -> pd.DataFrame:
+    """Série de preço/estoque de um livro, em ordem de coleta."""
+    dataset = _dataset(history_dir)
+    if dataset is None:
+        return pd.DataFrame(columns=["scraped_at", "raw_price", "instock"])
+
+    table = dataset.to_table(columns=["scraped_at", "raw_price", "instock", "catalog_version"],
+                             filter=ds.field("id") == book_id)
+    return table.to_pandas().sort_values("scraped_at", kind="stable").reset_index(drop=True)
+
+
+def _baseline(dataset, since_ts: pd.Timestamp, history_dir: Path) -> pd.DataFrame | None:
+    """Último preço de cada livro na partição mais recente com coleta antes de `since`."""
+    days = sorted((p.name.split("=", 1)[1] for p in history_dir.glob("scrape_date=*")
+                   if p.name.split("=", 1)[1] <= since_ts.date().isoformat()), reverse=True)
+    for day in days:
+        table = dataset.to_table(
+            columns=["id", "title", "scraped_at", "raw_price"],
+            filter=(ds.field("scrape_date") == day)
+                   & (ds.field("scraped_at") < pa.scalar(since_ts.to_pydatetime(), pa.timestamp("us"))))
+        if table.num_rows:
+            df = table.to_pandas().sort_values(["id", "scraped_at"], kind="stable")
+            return df.drop_duplicates("id", keep="last")
+    return None
+
+
+def price_changes(since: datetime, history_dir: Path | None = None) -> pd.DataFrame:
+    """
+    Mudanças de preço entre execuções consecutivas coletadas a partir de `since`.
+    Lê as partições de `since` em diante e, como base, a última partição anterior
+    (a mudança entre a última coleta antes de `since` e a primeira depois conta).
+    """
+    empty = pd.DataFrame(columns=["id", "title", "scraped_at", "old_price", "new_price"])
+    history_dir = history_dir or HISTORY_DIR
+    dataset = _dataset(history_dir)
+    if dataset is None:
+        return empty
+
+    since_ts = pd.Timestamp(since).as_unit("us")
+    table = dataset.to_table(
+        columns=["id", "title", "scraped_at", "raw_price"],
+        filter=(ds.field("scrape_date") >= since_ts.date().isoformat())
+               & (ds.field("scraped_at") >= pa.scalar(since_ts.to_pydatetime(), pa.timestamp("us"))))
+    if table.num_rows == 0:
+        return empty
+
+    df = table.to_pandas()
+    baseline = _baseline(dataset, since_ts, history_dir)
+    if baseline is not None:
+        df = pd.concat([baseline, df], ignore_index=True)
+    df = df.sort_values(["id", "scraped_at"], kind="stable")
+    df["old_price"] = df.groupby("id", sort=False)["raw_price"].shift()
+    changed = df["old_price"].notna() & df["raw_price"].notna() & (df["old_price"] != df["raw_price"])
+    out = df.loc[changed, ["id", "title", "scraped_at", "old_price", "raw_price"]]
+    return out.rename(columns={"raw_price": "new_price"}).reset_index(drop=True)
+
+
+def parse_since(value: str) -> datetime | None:
+    """Aceita data (AAAA-MM-DD) ou data e hora ISO."""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def main():
+    from services.scraper.transformers.clean_books import SILVER_DIR, read_manifest
+
+    silver = pd.read_csv(SILVER_DIR / "books.csv")
+    manifest = read_manifest()
+    published_at = manifest.get("published_at")
+    scraped_at = datetime.fromisoformat(published_at) if published_at else datetime.now()
+    out = append_snapshot(silver, scraped_at, manifest.get("version"))
+    print(f"[OK] Snapshot com {len(silver)} livros gravado em {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,287 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 from flask import jsonify, request
 
-CSV_PATH = "data/silver/books.csv"
+from services.monitoring.profiling import phase
+from services.resources.indexes import CatalogIndex
+from services.resources.suggest import TitleSuggester
+from services.scraper.transformers.clean_books import read_changes
+
+CSV_PATH = os.environ.get("CATALOG_CSV_PATH", "data/silver/books.csv")
+MANIFEST_PATH = os.environ.get("CATALOG_MANIFEST_PATH", os.path.join(os.path.dirname(CSV_PATH), "manifest.json"))
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    STRING_DTYPE = "string"
+
+STRING_COLUMNS = ["id", "title", "book_title", "UPC", "product_url", "image_url", "image_path"]
+PRICE_DECIMALS = 2
+
+
+def compact_catalog(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Schema compacto do catálogo servido: category como categoria (dicionário),
+    rating int8, raw_price float32, instock inteiro e strings em Arrow.
+    """
+    df = df.copy()
+
+    if "category" in df.columns:
+        df["category"] = df["category"].astype("category")
+
+    if "rating" in df.columns:
+        df["rating"] = pd.to_numeric(df["rating"], errors="coerce").fillna(0).astype("int8")
+
+    if "raw_price" in df.columns:
+        df["raw_price"] = pd.to_numeric(df["raw_price"], errors="coerce").astype("float32")
+
+    if "instock" in df.columns:
+        instock = pd.to_numeric(df["instock"], errors="coerce")
+        df["instock"] = instock.astype("Int32") if instock.isna().any() else instock.astype("int32")
+
+    for col in STRING_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(STRING_DTYPE)
+
+    return df
+
+
+def to_records(df: pd.DataFrame) -> list[dict]:
+    """
+    Converte para lista de dicts serializáveis (faltantes viram "", como antes,
+    e infinitos viram None, já que JSON não tem Infinity), desfazendo os tipos
+    compactos: categorias/Arrow -> objeto, float32 -> float.
+    """
+    if df.empty:
+        return []
+
+    columns = {}
+    for name, col in df.items():
+        if col.dtype == np.float32:
+            col = col.astype("float64").round(PRICE_DECIMALS)
+        elif isinstance(col.dtype, pd.CategoricalDtype) or pd.api.types.is_extension_array_dtype(col.dtype):
+            col = col.astype(object).where(col.notna(), None)
+        infinite = np.isinf(col.to_numpy()) if pd.api.types.is_float_dtype(col.dtype) else None
+        col = col.fillna("")
+        if infinite is not None and infinite.any():
+            col = col.astype(object).where(~infinite, None)
+        columns[name] = col
+
+    return pd.DataFrame(columns, index=df.index).to_dict(orient="records")
+
+
+def _build_id_index(df: pd.DataFrame) -> tuple[pd.Index, np.ndarray]:
+    ids = pd.Index(df["id"].to_numpy(dtype=object, na_value=""))
+    first = ~ids.duplicated(keep="first")  # id repetido: vale a primeira ocorrência
+    return ids[first], np.flatnonzero(first)
+
+
+class NeighboursUnavailable(Exception):
+    """Tabela de vizinhos ausente ou de outra versão: a rota responde 503 até o ETL/warmup gerá-la."""
+
+
+class CatalogSnapshot:
+    """
+    Uma versão imutável do catálogo. Estruturas derivadas (índices, caches)
+    são guardadas aqui, então morrem junto com a versão na troca.
+    """
+
+    def __init__(self, df: pd.DataFrame, version, source_key):
+        self.df = df
+        self.version = version
+        self.source_key = source_key
+        self.loaded_at = datetime.now().isoformat()
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def cached(self, name: str, build):
+        value = self._derived.get(name)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = self._derived[name] = build(self.df)
+        return value
+
+    def derived(self) -> dict:
+        """Cópia rasa das estruturas derivadas já construídas (para contabilidade de memória)."""
+        with self._lock:
+            return dict(self._derived)
+
 
 class Extract:
+    def __init__(self, csv_path: str = CSV_PATH, manifest_path: str = MANIFEST_PATH):
+        self.csv_path = csv_path
+        self.manifest_path = manifest_path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _source_key(self):
+        # O publish troca a CSV antes do manifesto: só o manifesto anuncia a versão nova.
+        # Sem manifesto (silver gerada manualmente), vale o arquivo da CSV.
+        try:
+            st = os.stat(self.manifest_path)
+            source = "manifest"
+        except FileNotFoundError:
+            st = os.stat(self.csv_path)
+            source = "csv"
+        return (source, st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _read_version(self, source_key):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return int(json.load(f)["version"])
+        except (FileNotFoundError, ValueError, KeyError):
+            # Sem manifesto (silver gerada manualmente): versão derivada do arquivo
+            return f"mtime-{source_key[2]}"
+
+    def _load(self, source_key) -> CatalogSnapshot:
+        df = compact_catalog(pd.read_csv(self.csv_path))
+        return CatalogSnapshot(df, self._read_version(source_key), source_key)
+
+    def snapshot(self) -> CatalogSnapshot:
+        # Um stat por chamada; a silver só é relida quando o publish troca o arquivo
+        with phase("load"):
+            key = self._source_key()
+            snap = self._snapshot
+            if snap is None or snap.source_key != key:
+                with self._lock:
+                    snap = self._snapshot
+                    if snap is None or snap.source_key != key:
+                        snap = self._snapshot = self._load(key)
+        return snap
+
+    def reload(self) -> CatalogSnapshot:
+        with self._lock:
+            self._snapshot = self._load(self._source_key())
+            return self._snapshot
+
     def load_books(self):
-        df = pd.read_csv(CSV_PATH)
-        df["id"] = df["id"] # o id do livro não é numero inteiro
-        return df
+        return self.snapshot().df
 
     def get_books(self):
         df = self.load_books()
-        return jsonify(df.to_dict(orient="records")), 200
+        return jsonify(to_records(df)), 200
+
+    def _positions(self, snapshot: CatalogSnapshot, ids: list) -> np.ndarray:
+        # Índice hash id -> posição, construído uma vez por versão do catálogo
+        keys, positions = snapshot.cached("id_index", _build_id_index)
+        idx = keys.get_indexer(ids)
+        return np.where(idx >= 0, positions[idx], -1)
 
     def get_book(self, book_id):
-        df = self.load_books()
-        book = df.loc[df["id"] == book_id]
-        if book.empty:
+        snapshot = self.snapshot()
+        pos = self._positions(snapshot, [book_id])[0]
+        if pos < 0:
             return {}
-        return book.iloc[0].to_dict()
+        return to_records(snapshot.df.iloc[[pos]])[0]
+
+    def get_books_batch(self, ids: list) -> tuple[pd.DataFrame, list]:
+        """Livros encontrados (na ordem pedida) e ids ausentes, numa única busca no índice."""
+        snapshot = self.snapshot()
+        positions = self._positions(snapshot, ids)
+        found = positions >= 0
+        missing = [book_id for book_id, ok in zip(ids, found.tolist()) if not ok]
+        return snapshot.df.iloc[positions[found]], missing
+
+    def query_books(self, categories = None, min_rating = None, min_price = None,
+                    max_price = None, in_stock = False, limit = 50, offset = 0):
+        """
+        Consulta combinada sobre os índices bitmap da versão atual.
+        Retorna (página de livros, total de resultados, facetas do resultado).
+        """
+        snapshot = self.snapshot()
+        index = snapshot.cached("bitmap_index", CatalogIndex)
+        result = index.query(categories, min_rating, min_price, max_price, in_stock)
+        positions = result.positions()
+        page = snapshot.df.iloc[positions[offset:offset + limit]]
+        return page, len(positions), index.facets(result)
+
+    def suggest_titles(self, query, limit = 10):
+        """Completações de título (id e título) pelo índice de prefixos da versão atual."""
+        return self.snapshot().cached("title_suggester", TitleSuggester).suggest(query, limit)
+
+    def get_changes(self, since: int):
+        """
+        Delta líquido entre a versão `since` e a versão servida, compondo os
+        diffs gravados a cada publish. Retorna (versão, delta, livros novos/alterados)
+        ou (versão, None, None) se algum diff do intervalo não existir mais
+        (o cliente deve ressincronizar tudo).
+        """
+        snapshot = self.snapshot()
+        if not isinstance(snapshot.version, int) or since > snapshot.version:
+            return snapshot.version, None, None
+
+        silver_dir = Path(self.manifest_path).parent
+        first, last = {}, {}
+
+        for version in range(since + 1, snapshot.version + 1):
+            changes = read_changes(version, silver_dir)
+            if changes is None:
+                return snapshot.version, None, None
+            for kind in ("added", "changed", "removed"):
+                for book_id in changes[kind]:
+                    first.setdefault(book_id, kind)
+                    last[book_id] = kind
+
+        delta = {"added": [], "changed": [], "removed": []}
+        for book_id, kind in first.items():
+            existed = kind != "added"
+            exists = last[book_id] != "removed"
+            if existed and exists:
+                delta["changed"].append(book_id)
+            elif exists:
+                delta["added"].append(book_id)
+            elif existed:
+                delta["removed"].append(book_id)
+
+        positions = self._positions(snapshot, delta["added"] + delta["changed"])
+        return snapshot.version, delta, snapshot.df.iloc[positions[positions >= 0]]
+
+    def get_similar(self, book_id, k = 10):
+        """
+        Até k livros parecidos (com a nota), lidos da tabela de vizinhos da versão atual.
+        Sem tabela para a versão, levanta NeighboursUnavailable (nada é calculado na requisição).
+        """
+        snapshot = self.snapshot()
+        pos = self._positions(snapshot, [book_id])[0]
+        if pos < 0:
+            return None, None
+
+        table = self._neighbours(snapshot)
+        if table is None:
+            raise NeighboursUnavailable(snapshot.version)
+        positions, scores = table.lookup(pos, k)
+        return snapshot.df.iloc[positions], scores
+
+    def _neighbours(self, snapshot: CatalogSnapshot, build: bool = False):
+        from services.ml.similar import load_neighbours, build_table  # pyarrow só quando usado
+
+        table = snapshot.cached("neighbours", lambda df: load_neighbours(
+            df, snapshot.version, Path(self.csv_path).parent))
+        if table is None and build:
+            # Fora do lock da versão: as requisições seguem lendo (e recebendo 503) enquanto calcula
+            print(f"[INFO] Tabela de vizinhos ausente para a versão {snapshot.version}; calculando no warmup")
+            built = build_table(snapshot.df)
+            table = snapshot.cached("neighbours", lambda df: built)
+        return table
+
+    def warm(self, neighbours: bool = True) -> CatalogSnapshot:
+        """Carrega a versão atual e constrói os índices das rotas de consulta (usado no warmup)."""
+        snapshot = self.snapshot()
+        snapshot.cached("id_index", _build_id_index)
+        snapshot.cached("bitmap_index", CatalogIndex)
+        snapshot.cached("title_suggester", TitleSuggester)
+        if neighbours:
+            self._neighbours(snapshot, build=True)
+        return snapshot
 
     def search_books(self, title = "", category = ""):
         books = self.load_books()
@@ -30,26 +293,26 @@ class Extract:
         df = self.load_books()
         categories = sorted(df["category"].dropna().unique().tolist())
         return categories
-    
-    def get_books_top_rated(self):
+
+    def get_books_top_rated(self, as_frame = False):
         df = self.load_books()
         books = df[df["rating"] == 5]
-        return books.fillna("").to_dict(orient="records")
+        return books if as_frame else to_records(books)
 
-    def get_books_price_range(self, min = 0, max = 0):
+    def get_books_price_range(self, min = 0, max = 0, as_frame = False):
         df = self.load_books()
         if min is not None:
             df = df[df["raw_price"] >= min]
         if max is not None:
             df = df[df["raw_price"] <= max]
-        return df.fillna("").to_dict(orient="records")
+        return df if as_frame else to_records(df)
 
     def get_overview(self, books = None):
         if books is None or books.empty:
             books = self.load_books()
-        
-        average_price = round(books["raw_price"].mean(), 2)
-        rating_distribution = books["rating"].value_counts().to_dict()
+
+        average_price = round(float(books["raw_price"].astype("float64").mean()), 2)
+        rating_distribution = {int(k): int(v) for k, v in books["rating"].value_counts().items()}
 
         stats = {
             "total_books": len(books),
@@ -58,7 +321,7 @@ class Extract:
         }
 
         return stats
-    
+
     def get_category_stats(self):
         categories = self.get_categories()
         stats_category = {}
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# Serialização das respostas de catálogo direto do DataFrame para bytes JSON,
+# sem passar por to_dict(orient="records") + encoder stdlib do Flask.
+# Escolha do encoder: API_JSON_ENCODER=auto|orjson|columnar|stdlib
+
+import json
+import os
+from json.encoder import encode_basestring_ascii
+
+import numpy as np
+import pandas as pd
+
+from services.resources.Extract import to_records, PRICE_DECIMALS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_ENCODER = os.environ.get("API_JSON_ENCODER", "auto")
+
+
+def _plain(col: pd.Series) -> pd.Series:
+    # Mesmos ajustes do to_records: float32 volta a float arredondado
+    if col.dtype == np.float32:
+        return col.astype("float64").round(PRICE_DECIMALS)
+    return col
+
+
+class StdlibEncoder:
+    """Caminho antigo: lista de dicts + json da stdlib."""
+    name = "stdlib"
+
+    def encode(self, df: pd.DataFrame) -> bytes:
+        return json.dumps(to_records(df)).encode("utf-8")
+
+
+class ColumnarEncoder:
+    """
+    Escreve o JSON coluna a coluna: cada coluna vira uma lista de fragmentos
+    já codificados (categorias são codificadas uma vez por valor distinto) e as
+    linhas são montadas com um template "%s", sem criar um dict por livro.
+    """
+    name = "columnar"
+
+    def _fragments(self, col: pd.Series) -> list:
+        col = _plain(col)
+        dtype = col.dtype
+
+        if isinstance(dtype, pd.CategoricalDtype):
+            cats = [encode_basestring_ascii(str(c)) for c in dtype.categories]
+            table = np.array(cats + ['""'], dtype=object)
+            codes = col.cat.codes.to_numpy()
+            return table[np.where(codes < 0, len(cats), codes)].tolist()
+
+        if pd.api.types.is_bool_dtype(dtype) and not col.isna().any():
+            return ["true" if v else "false" for v in col.tolist()]
+
+        if pd.api.types.is_integer_dtype(dtype):
+            if col.isna().any():
+                return [str(v) if v is not None else '""'
+                        for v in col.astype(object).where(col.notna(), None).tolist()]
+            return list(map(str, col.tolist()))
+
+        if pd.api.types.is_float_dtype(dtype):
+            values = col.to_numpy(dtype="float64")
+            out = list(map(float.__repr__, values.tolist()))
+            # repr daria "nan"/"inf", inválidos em JSON: faltante vira "" e infinito, null
+            for i in np.flatnonzero(~np.isfinite(values)).tolist():
+                out[i] = '""' if values[i] != values[i] else "null"
+            return out
+
+        values = col.to_numpy(dtype=object, na_value="")
+        if pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+            return list(map(encode_basestring_ascii, values.tolist()))
+
+        # Coluna objeto mista: caminho lento, valor a valor
+        return [json.dumps("" if v is None or (isinstance(v, float) and v != v) else v, default=str)
+                for v in values.tolist()]
+
+    def encode(self, df: pd.DataFrame) -> bytes:
+        if df.empty:
+            return b"[]"
+
+        keys = [json.dumps(str(k)).replace("%", "%%") for k in df.columns]
+        template = "{" + ",".join(f"{k}:%s" for k in keys) + "}"
+        columns = [self._fragments(df[c]) for c in df.columns]
+        body = ",".join(map(template.__mod__, zip(*columns)))
+        return ("[" + body + "]").encode("ascii")
+
+
+class OrjsonEncoder:
+    """orjson sobre listas nativas por coluna (tolist em C), sem to_dict do pandas."""
+    name = "orjson"
+
+    def encode(self, df: pd.DataFrame) -> bytes:
+        if df.empty:
+            return b"[]"
+
+        keys = [str(k) for k in df.columns]
+        columns = []
+        for c in df.columns:
+            col = _plain(df[c])
+            if isinstance(col.dtype, pd.CategoricalDtype) or pd.api.types.is_extension_array_dtype(col.dtype):
+                values = col.to_numpy(dtype=object, na_value="")
+            elif pd.api.types.is_float_dtype(col.dtype) and col.isna().any():
+                values = col.astype(object).where(col.notna(), "").to_numpy()
+            else:
+                values = col.to_numpy()
+                if values.dtype == object:
+                    values = col.where(col.notna(), "").to_numpy()
+            columns.append(values.tolist())
+
+        return orjson.dumps([dict(zip(keys, row)) for row in zip(*columns)])
+
+
+ENCODERS = {e.name: e for e in (StdlibEncoder, ColumnarEncoder, OrjsonEncoder)}
+
+
+def get_encoder(name: str = JSON_ENCODER):
+    if name == "auto":
+        name = "orjson" if orjson is not None else "columnar"
+    if name == "orjson" and orjson is None:
+        raise ImportError("API_JSON_ENCODER=orjson requer o pacote orjson")
+    if name not in ENCODERS:
+        raise ValueError(f"Encoder JSON desconhecido: {name}")
+    return ENCODERS[name]()
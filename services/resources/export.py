@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# Exportação em lote da silver (/api/v1/export) sem passar por to_dict/JSON.
+# Sem filtro de colunas o arquivo publicado é enviado como está (send_file,
+# sendfile no servidor WSGI); com filtro, os row groups do Parquet são lidos só
+# com as colunas pedidas e reescritos em lotes (Arrow IPC, Parquet ou CSV).
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BATCH_ROWS = int(os.environ.get("EXPORT_BATCH_ROWS", 65536))
+
+# formato -> (arquivo publicado na silver, mimetype)
+FORMATS = {
+    "parquet": ("books.parquet", "application/vnd.apache.parquet"),
+    "arrow": ("books.arrows", "application/vnd.apache.arrow.stream"),
+    "csv": ("books.csv", "text/csv"),
+}
+
+
+class _ChunkSink:
+    """Destino de escrita em memória que é esvaziado a cada lote enviado."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = b"".join(self.chunks)
+        self.chunks.clear()
+        return out
+
+
+def published_file(silver_dir: Path, fmt: str) -> Path | None:
+    # Absoluto: o send_file do Flask resolve caminhos relativos contra app.root_path, não o CWD
+    path = (Path(silver_dir) / FORMATS[fmt][0]).resolve()
+    return path if path.exists() else None
+
+
+def _frame_to_table(df: pd.DataFrame) -> pa.Table:
+    # Sem Parquet publicado: desfaz o schema compacto (float32, categorias) antes de exportar
+    columns = {}
+    for name, col in df.items():
+        if col.dtype == np.float32:
+            col = col.astype("float64").round(2)
+        elif isinstance(col.dtype, pd.CategoricalDtype):
+            col = col.astype(object).where(col.notna(), None)
+        columns[name] = col
+    return pa.Table.from_pandas(pd.DataFrame(columns), preserve_index=False)
+
+
+def source_schema(silver_dir: Path, snapshot) -> pa.Schema:
+    parquet = published_file(silver_dir, "parquet")
+    if parquet is not None:
+        return pq.ParquetFile(parquet).schema_arrow.remove_metadata()
+    return _frame_to_table(snapshot.df.head(0)).schema.remove_metadata()
+
+
+def _batches(silver_dir: Path, snapshot, columns: list[str]):
+    parquet = published_file(silver_dir, "parquet")
+    if parquet is not None:
+        # Leitura por row group só das colunas pedidas: memória limitada a um lote
+        yield from pq.ParquetFile(parquet).iter_batches(batch_size=BATCH_ROWS, columns=columns)
+        return
+
+    table = _frame_to_table(snapshot.df[columns])
+    yield from table.to_batches(max_chunksize=BATCH_ROWS)
+
+
+def stream_export(silver_dir: Path, snapshot, fmt: str, columns: list[str]):
+    """Gera os bytes da exportação lote a lote."""
+    schema = pa.schema([source_schema(silver_dir, snapshot).field(c) for c in columns])
+    batches = _batches(silver_dir, snapshot, columns)
+
+    if fmt == "csv":
+        yield "\ufeff".encode("utf-8")  # mesmo BOM do books.csv publicado
+        header = True
+        for batch in batches:
+            yield batch.to_pandas().to_csv(index=False, header=header).encode("utf-8")
+            header = False
+        if header:
+            yield (",".join(columns) + "\n").encode("utf-8")
+        return
+
+    sink = _ChunkSink()
+    if fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+        for batch in batches:
+            writer.write_batch(batch.cast(schema) if batch.schema != schema else batch)
+            yield sink.drain()
+    else:
+        writer = pq.ParquetWriter(sink, schema)
+        for batch in batches:
+            writer.write_batch(batch.cast(schema) if batch.schema != schema else batch)
+            yield sink.drain()
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# Índices bitmap do catálogo para a consulta facetada (/api/v1/books/query).
+# Cada valor de categoria/rating vira um bitset (uint64 por 64 livros); filtros
+# são interseções bit a bit e as contagens de facetas são popcounts.
+# Construídos uma vez por versão do catálogo (ver CatalogSnapshot.cached).
+
+import numpy as np
+import pandas as pd
+
+
+class Bitmap:
+    """Bitset de tamanho fixo (um bit por linha do catálogo) em palavras uint64."""
+
+    __slots__ = ("words", "size")
+
+    def __init__(self, words: np.ndarray, size: int):
+        self.words = words
+        self.size = size
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "Bitmap":
+        packed = np.packbits(np.asarray(mask, dtype=bool), bitorder="little")
+        pad = -len(packed) % 8
+        if pad:
+            packed = np.concatenate([packed, np.zeros(pad, dtype=np.uint8)])
+        return cls(packed.view("<u8"), len(mask))
+
+    @classmethod
+    def from_positions(cls, positions: np.ndarray, size: int) -> "Bitmap":
+        mask = np.zeros(size, dtype=bool)
+        mask[positions] = True
+        return cls.from_mask(mask)
+
+    @classmethod
+    def full(cls, size: int) -> "Bitmap":
+        return cls.from_mask(np.ones(size, dtype=bool))
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        return Bitmap(self.words & other.words, self.size)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        return Bitmap(self.words | other.words, self.size)
+
+    def count(self) -> int:
+        return int(np.bitwise_count(self.words).sum())
+
+    def count_and(self, other: "Bitmap") -> int:
+        # Popcount da interseção sem guardar o bitmap resultante
+        return int(np.bitwise_count(self.words & other.words).sum())
+
+    def positions(self) -> np.ndarray:
+        bits = np.unpackbits(self.words.view(np.uint8), count=self.size, bitorder="little")
+        return np.flatnonzero(bits)
+
+
+class CatalogIndex:
+    """
+    Bitmaps por categoria e por rating mínimo, bitmap de disponibilidade e
+    preços ordenados (o intervalo de preço vira bitmap via busca binária).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.size = n = len(df)
+        self.all = Bitmap.full(n)
+
+        self.categories = {}
+        if "category" in df.columns:
+            category = df["category"].astype("category")
+            codes = category.cat.codes.to_numpy()
+            for code, name in enumerate(category.cat.categories):
+                self.categories[str(name)] = Bitmap.from_mask(codes == code)
+
+        # rating_at_least[k]: livros com rating >= k (já acumulado, uma única AND na consulta)
+        self.ratings = {}
+        self.rating_at_least = {}
+        if "rating" in df.columns:
+            rating = pd.to_numeric(df["rating"], errors="coerce").fillna(0).astype("int64").to_numpy()
+            values = sorted(int(v) for v in np.unique(rating))
+            for value in values:
+                self.ratings[value] = Bitmap.from_mask(rating == value)
+            acc = None
+            for value in reversed(values):
+                acc = self.ratings[value] if acc is None else acc | self.ratings[value]
+                self.rating_at_least[value] = acc
+
+        if "instock" in df.columns:
+            instock = pd.to_numeric(df["instock"], errors="coerce").fillna(0).to_numpy()
+            self.in_stock = Bitmap.from_mask(instock > 0)
+        else:
+            self.in_stock = self.all
+
+        # Mantém o dtype da coluna (float32 no schema compacto): os limites são
+        # convertidos para ele, como nas comparações do get_books_price_range
+        price = pd.to_numeric(df.get("raw_price", pd.Series(np.nan, index=df.index)),
+                              errors="coerce").to_numpy()
+        if price.dtype.kind != "f":
+            price = price.astype("float64")
+        valid = np.flatnonzero(~np.isnan(price))
+        order = np.argsort(price[valid], kind="stable")
+        self.price_order = valid[order]
+        self.price_sorted = price[valid][order]
+
+    def rating_min(self, value: int) -> Bitmap:
+        matches = [v for v in self.rating_at_least if v >= value]
+        if not matches:
+            return Bitmap.from_mask(np.zeros(self.size, dtype=bool))
+        return self.rating_at_least[min(matches)]
+
+    def price_range(self, low: float | None, high: float | None) -> Bitmap:
+        cast = self.price_sorted.dtype.type
+        start = 0 if low is None else np.searchsorted(self.price_sorted, cast(low), side="left")
+        stop = (len(self.price_sorted) if high is None
+                else np.searchsorted(self.price_sorted, cast(high), side="right"))
+        return Bitmap.from_positions(self.price_order[start:max(start, stop)], self.size)
+
+    def query(self, categories: list[str] | None = None, min_rating: int | None = None,
+              min_price: float | None = None, max_price: float | None = None,
+              in_stock: bool = False) -> Bitmap:
+        result = self.all
+
+        if categories:
+            empty = Bitmap.from_mask(np.zeros(self.size, dtype=bool))
+            selected = empty
+            for name in categories:
+                selected = selected | self.categories.get(name, empty)
+            result = result & selected
+
+        if min_rating is not None:
+            result = result & self.rating_min(min_rating)
+
+        if min_price is not None or max_price is not None:
+            result = result & self.price_range(min_price, max_price)
+
+        if in_stock:
+            result = result & self.in_stock
+
+        return result
+
+    def facets(self, result: Bitmap) -> dict:
+        """Contagem por categoria e por rating dentro do resultado (só valores presentes)."""
+        categories = {name: result.count_and(bitmap) for name, bitmap in self.categories.items()}
+        ratings = {value: result.count_and(bitmap) for value, bitmap in self.ratings.items()}
+        return {
+            "category": {k: v for k, v in categories.items() if v},
+            "rating": {k: v for k, v in ratings.items() if v},
+        }
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Autocomplete de títulos (/api/v1/books/suggest): arrays ordenados de chaves
+# normalizadas e busca binária (searchsorted) pelo intervalo [prefixo, prefixo+\xff).
+# Construído uma vez por versão do catálogo (ver CatalogSnapshot.cached).
+
+import os
+import re
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+# Mesma normalização aplicada aos títulos na silver
+from services.scraper.transformers.clean_books import _normalize_text as normalize_title
+
+# Chaves truncadas em bytes fixos (dtype "S"): prefixos maiores são conferidos no título
+KEY_CHARS = int(os.environ.get("SUGGEST_KEY_CHARS", 24))
+
+
+class TitleSuggester:
+    """
+    Dois índices ordenados: o título inteiro (casamentos do início do título,
+    que vêm primeiro) e cada palavra seguinte até o fim do título.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        # titles: como no catálogo (o que a API devolve); keys: normalizados, só para casar
+        self.titles = (df["title"].to_numpy(dtype=object, na_value="") if "title" in df.columns
+                       else np.array([], dtype=object))
+        self.ids = df["id"].to_numpy(dtype=object, na_value="") if "id" in df.columns else np.array([], dtype=object)
+        self.keys = np.array([normalize_title(t) for t in self.titles.tolist()], dtype=object)
+
+        starts, start_pos, words, word_pos = [], [], [], []
+        for pos, title in enumerate(self.keys.tolist()):
+            if not title:
+                continue
+            starts.append(title[:KEY_CHARS])
+            start_pos.append(pos)
+            for m in re.finditer(r" (?=\S)", title):
+                words.append(title[m.end():m.end() + KEY_CHARS])
+                word_pos.append(pos)
+
+        self.start_keys, self.start_pos = self._sorted(starts, start_pos)
+        self.word_keys, self.word_pos = self._sorted(words, word_pos)
+
+    @staticmethod
+    def _sorted(keys: list, positions: list) -> tuple[np.ndarray, np.ndarray]:
+        keys = np.array([k.encode("ascii") for k in keys], dtype=f"S{KEY_CHARS}")
+        positions = np.array(positions, dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        return keys[order], positions[order]
+
+    def _range(self, keys: np.ndarray, positions: np.ndarray, prefix: bytes, chunk: int):
+        # Percorre o intervalo do prefixo em blocos: quem consome para ao completar o limite
+        lo = np.searchsorted(keys, prefix, side="left")
+        hi = np.searchsorted(keys, prefix + b"\xff", side="left")
+        for start in range(lo, hi, chunk):
+            yield from positions[start:min(hi, start + chunk)].tolist()
+
+    def suggest(self, query: str, limit: int = 10) -> list[dict]:
+        q = normalize_title(query)
+        if not q:
+            return []
+        prefix = q[:KEY_CHARS].encode("ascii")
+
+        # Início do título primeiro, depois palavras; repetidos e prefixos além da
+        # chave truncada são descartados até completar o limite
+        chunk = limit * 4
+        candidates = chain(self._range(self.start_keys, self.start_pos, prefix, chunk),
+                           self._range(self.word_keys, self.word_pos, prefix, chunk))
+
+        out, seen = [], set()
+        for pos in candidates:
+            if pos in seen:
+                continue
+            seen.add(pos)
+            key = self.keys[pos]
+            if len(q) > KEY_CHARS and not (key.startswith(q) or f" {q}" in key):
+                continue
+            out.append({"id": self.ids[pos], "title": self.titles[pos]})
+            if len(out) == limit:
+                break
+        return out
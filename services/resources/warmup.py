@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# Warmup do worker: carrega o catálogo, constrói os índices e pré-renderiza as
+# respostas mais acessadas antes de o worker ser marcado como pronto. O estado
+# é exposto em /api/v1/ready para o balanceador só rotear para workers aquecidos.
+
+import threading
+import time
+from datetime import datetime
+
+PENDING, WARMING, READY, FAILED = "pending", "warming", "ready", "failed"
+
+
+class Warmup:
+    """
+    Executa passos nomeados em ordem e guarda a duração de cada um. Falha num
+    passo obrigatório deixa o worker em "failed"; nos opcionais só é registrada.
+    """
+
+    def __init__(self):
+        self.state = PENDING
+        self.version = None
+        self.steps = {}
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def run(self, steps: list, version=None) -> bool:
+        """steps: lista de (nome, função, obrigatório). version: função que devolve a versão aquecida."""
+        with self._lock:
+            if self.state != READY:
+                self.state = WARMING
+            self.started_at = datetime.now().isoformat()
+            failed, results = None, {}
+
+            for name, step, required in steps:
+                started = time.perf_counter()
+                try:
+                    step()
+                    results[name] = {"ms": round((time.perf_counter() - started) * 1000, 1)}
+                except Exception as e:
+                    results[name] = {"ms": round((time.perf_counter() - started) * 1000, 1), "error": str(e)}
+                    if required:
+                        failed = f"{name}: {e}"
+                        print(f"[WARN] Warmup interrompido em {name}: {e}")
+                        break
+                    print(f"[WARN] Warmup: passo opcional {name} falhou: {e}")
+
+            self.steps = results
+            self.finished_at = datetime.now().isoformat()
+            self.error = failed
+            if failed is None:
+                self.version = version() if version else None
+                self.state = READY
+                print(f"[OK] Warmup concluído (versão {self.version})")
+            elif self.state != READY:
+                # Um re-warmup que falha não derruba um worker que já estava pronto
+                self.state = FAILED
+            return failed is None
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.state,
+            "catalog_version": self.version,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "steps": self.steps,
+            "error": self.error,
+        }
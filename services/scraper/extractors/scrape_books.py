@@ -2,29 +2,162 @@
 # Scraper "corrido" (mínimo de funções), salva CSV em data/bronze e imagens em data/bronze/images
 
 from bs4 import BeautifulSoup
-import requests
 import pandas as pd
-import re
-import time, random
+import json, os, re, shutil, sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 
-BASE           = "https://books.toscrape.com/"
+try:
+    from services.scraper.extractors.transport import (
+        build_session, AdaptiveThrottle, RequestMetrics, retries_of, retry_after_of, TIMEOUT, CONCURRENCY, RETRIES)
+except ImportError:  # executado como script: python services/scraper/extractors/scrape_books.py
+    from transport import (
+        build_session, AdaptiveThrottle, RequestMetrics, retries_of, retry_after_of, TIMEOUT, CONCURRENCY, RETRIES)
+
+# Alvo do crawl; aponte para um servidor local (ex.: benchmarks/scraper_throttle.py) para testes
+BASE           = os.environ.get("SCRAPER_BASE_URL", "https://books.toscrape.com/").rstrip("/") + "/"
 START_URL      = urljoin(BASE, "index.html")
 MAX_PAGES_GUARD = 200 
 
 REPO_ROOT  = Path(__file__).resolve().parents[4]
 BRONZE_DIR = REPO_ROOT / "data" / "bronze"
-IMAGES_DIR = BRONZE_DIR / "images"
-BRONZE_DIR.mkdir(parents=True, exist_ok=True)
-IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+IMAGES_DIR = BRONZE_DIR / "images"  # criados em main(), não no import
 
 OUT_PATH = BRONZE_DIR / "books.csv"
+CHECKPOINT_DIR = BRONZE_DIR / "_checkpoint"
 
 W2D = {"One":1, "Two":2, "Three":3, "Four":4, "Five":5}
 
-session = requests.Session()
-session.headers.update({"User-Agent": "books-scraper/0.1"})
+
+class _NoProgress:
+    # Callbacks de progresso opcionais (ver services/jobs/scraping.py)
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class CrawlCheckpoint:
+    """
+    Estado do crawl em disco: linhas já coletadas (rows.jsonl, gravado a cada
+    página) e, por categoria, páginas/livros feitos e a próxima URL (state.json).
+    Se o processo cair, a próxima execução continua da última página gravada.
+    """
+
+    def __init__(self, directory: Path | None = None):
+        self.directory = directory or CHECKPOINT_DIR
+        self.rows_path = self.directory / "rows.jsonl"
+        self.state_path = self.directory / "state.json"
+        self.state = {"started_at": None, "categories": {}}
+        self._rows_file = None
+
+    def exists(self) -> bool:
+        return self.state_path.exists()
+
+    def start(self, resume: bool) -> list[dict]:
+        """Abre o checkpoint e retorna as linhas já coletadas (vazio se for do zero)."""
+        rows: list[dict] = []
+
+        if resume and self.exists():
+            with open(self.state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+            if self.rows_path.exists():
+                with open(self.rows_path, encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            rows.append(json.loads(line))
+                        except ValueError:
+                            break  # última linha truncada pela queda
+        else:
+            self.clear()
+            self.state = {"started_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "categories": {}}
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Reescreve as linhas válidas para descartar um final truncado
+        with open(self.rows_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._rows_file = open(self.rows_path, "a", encoding="utf-8")
+        self._save_state()
+        return rows
+
+    def category(self, name: str) -> dict:
+        return self.state["categories"].get(name, {})
+
+    def page_done(self, name: str, page_rows: list[dict], next_url: str | None):
+        for row in page_rows:
+            self._rows_file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._rows_file.flush()
+        os.fsync(self._rows_file.fileno())
+
+        cat = self.state["categories"].setdefault(name, {"pages": 0, "books": 0, "done": False})
+        cat["pages"] += 1
+        cat["books"] += len(page_rows)
+        cat["next_url"] = next_url
+        self._save_state()
+
+    def category_done(self, name: str):
+        cat = self.state["categories"].setdefault(name, {"pages": 0, "books": 0})
+        cat.update(done=True, next_url=None)
+        self._save_state()
+
+    def _save_state(self):
+        tmp = self.state_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_path)
+
+    def close(self):
+        if self._rows_file is not None:
+            self._rows_file.close()
+            self._rows_file = None
+
+    def clear(self):
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+session = build_session()
+metrics = RequestMetrics()
+throttle = AdaptiveThrottle()
+
+
+def _get(url: str, kind: str, **kwargs):
+    # Toda requisição passa por aqui: throttle adaptativo (listagens, produtos e
+    # imagens dividem a mesma janela), timeout (connect, read) e tempo de rede por tipo
+    for attempt in range(RETRIES + 1):
+        throttle.acquire()
+        started = time.perf_counter()
+        try:
+            r = session.get(url, timeout=TIMEOUT, **kwargs)
+        except Exception:
+            throttle.release(time.perf_counter() - started, error=True)
+            metrics.error(f"network:{kind}")
+            raise
+        elapsed = time.perf_counter() - started
+        retried = retries_of(r)
+        status = getattr(r, "status_code", 200)
+        throttle.release(elapsed, status=status, retried=retried, retry_after=retry_after_of(r))
+        metrics.record(f"network:{kind}", elapsed)
+        metrics.retried(retried)
+        if status != 429 or attempt == RETRIES:
+            break
+        metrics.retried(1)  # 429: o throttle já recuou (e respeita Retry-After); tenta de novo
+
+    if not r.encoding or r.encoding.lower() != "utf-8":
+        r.encoding = "utf-8"
+
+    return r
+
+def _transport_snapshot() -> dict:
+    return {**metrics.snapshot(), "throttle": throttle.snapshot()}
+
+def _soup(r, kind: str) -> BeautifulSoup:
+    with metrics.timer(f"parse:{kind}"):
+        return BeautifulSoup(r.text, "html.parser")
 
 
 def download_image(image_url: str, book_id: str) -> str | None:
@@ -32,10 +165,7 @@ def download_image(image_url: str, book_id: str) -> str | None:
         return None
     
     try:
-        r = session.get(image_url, timeout=30, stream=True)
-
-        if not r.encoding or r.encoding.lower() != "utf-8":
-            r.encoding = "utf-8"
+        r = _get(image_url, "image", stream=True)
 
         r.raise_for_status()
         ext = Path(urlparse(image_url).path).suffix.lower()
@@ -62,13 +192,10 @@ def download_image(image_url: str, book_id: str) -> str | None:
         return None
 
 def fetch_more_info(prod_url: str) -> tuple[dict, str | None]:
-    r = session.get(prod_url, timeout=30)
-
-    if not r.encoding or r.encoding.lower() != "utf-8":
-        r.encoding = "utf-8"
+    r = _get(prod_url, "product")
 
     r.raise_for_status()
-    sp = BeautifulSoup(r.text, "html.parser")
+    sp = _soup(r, "product")
 
     product_info = {}
     table = sp.select_one("table.table.table-striped")
@@ -89,21 +216,47 @@ def fetch_more_info(prod_url: str) -> tuple[dict, str | None]:
 
     return product_info, full_img_url
 
-def iterate_category(category_name: str, first_page_url: str, rows: list[dict]):
-    url = first_page_url
-    guard = 0
+def _parse_totals(sp) -> tuple[int | None, int | None]:
+    # "<strong>1000</strong> results" e "Page 1 of 50" na página de listagem
+    books_total = pages_total = None
+    strong = sp.select_one("form.form-horizontal strong")
+    if strong and strong.get_text(strip=True).isdigit():
+        books_total = int(strong.get_text(strip=True))
+
+    current = sp.select_one("li.current")
+    if current:
+        m = re.search(r"of\s+(\d+)", current.get_text(" ", strip=True))
+        if m:
+            pages_total = int(m.group(1))
+    elif books_total is not None:
+        pages_total = 1
+
+    return books_total, pages_total
+
+def iterate_category(category_name: str, first_page_url: str, rows: list[dict], progress=None,
+                     checkpoint: CrawlCheckpoint | None = None, pool: ThreadPoolExecutor | None = None):
+    progress = progress or _NoProgress()
+    fetch_all = pool.map if pool else map
+    saved = checkpoint.category(category_name) if checkpoint else {}
+    url = saved.get("next_url") or first_page_url
+    guard = saved.get("pages", 0)
+    started = False
 
     while url and guard < MAX_PAGES_GUARD:
         guard += 1
-        r = session.get(url, timeout=30)
-
-        if not r.encoding or r.encoding.lower() != "utf-8":
-            r.encoding = "utf-8"
+        r = _get(url, "listing")
 
         r.raise_for_status()
-        sp = BeautifulSoup(r.text, "html.parser")
+        sp = _soup(r, "listing")
+
+        if not started:
+            started = True
+            books_total, pages_total = _parse_totals(sp)
+            progress.category_started(category_name, books_total, pages_total)
 
         items = sp.select("ol.row li")
+        rows_before = len(rows)
+        listed = []
 
         for li in items:
             a = li.select_one("h3 a")
@@ -129,10 +282,15 @@ def iterate_category(category_name: str, first_page_url: str, rows: list[dict]):
             p = Path(urlparse(prod_url).path)
             book_id = p.parent.name if p.name == "index.html" else p.stem
 
-            product_info, full_img_url = fetch_more_info(prod_url)
-
             thumb = li.select_one("img")
             thumb_url = urljoin(url, thumb["src"]) if thumb and thumb.get("src") else None
+
+            listed.append((book_id, title, raw_price, rating, prod_url, thumb_url))
+
+        # Páginas de produto em paralelo (até SCRAPER_CONCURRENCY), na ordem da listagem
+        details = fetch_all(fetch_more_info, [item[4] for item in listed])
+
+        for (book_id, title, raw_price, rating, prod_url, thumb_url), (product_info, full_img_url) in zip(listed, details):
             image_url = full_img_url or thumb_url
 
             #image_path_rel = download_image(image_url, book_id)
@@ -152,39 +310,84 @@ def iterate_category(category_name: str, first_page_url: str, rows: list[dict]):
             })
 
         next_a = sp.select_one("li.next > a")
+        next_url = urljoin(r.url, next_a["href"]) if next_a and next_a.get("href") else None
 
-        if next_a and next_a.get("href"):
-            url = urljoin(r.url, next_a["href"])
-            time.sleep(random.uniform(0.2, 0.5))
-        else:
-            break
-
-def main():
-    r = session.get(START_URL, timeout=30)
+        if checkpoint:
+            checkpoint.page_done(category_name, rows[rows_before:], next_url)
+        progress.page_done(category_name, len(rows) - rows_before)
+        progress.transport_metrics(_transport_snapshot())
 
-    if not r.encoding or r.encoding.lower() != "utf-8":
-        r.encoding = "utf-8"
+        if not next_url:
+            break
+        url = next_url  # o ritmo entre páginas vem do throttle, não de um sleep fixo
+
+    if checkpoint:
+        checkpoint.category_done(category_name)
+    progress.category_finished(category_name)
+
+def main(progress=None, resume: bool | None = None):
+    """
+    resume=None retoma automaticamente se houver checkpoint; False força um crawl do zero.
+    """
+    progress = progress or _NoProgress()
+    IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+    checkpoint = CrawlCheckpoint()
+    if resume is None:
+        resume = checkpoint.exists()
+
+    metrics.reset()
+    throttle.reset()
+    r = _get(START_URL, "listing")
 
     r.raise_for_status()
-    sp = BeautifulSoup(r.text, "html.parser")
+    sp = _soup(r, "listing")
 
     cats = sp.select("ul.nav.nav-list > li > ul > li > a")
-    rows: list[dict] = []
+    rows = checkpoint.start(resume)
+
+    if rows:
+        print(f"[INFO] Retomando checkpoint com {len(rows)} livros já coletados")
+
+    progress.crawl_started([a.get_text(strip=True) for a in cats], _parse_totals(sp)[0])
 
-    for a in cats:
-        category_name = a.get_text(strip=True)
-        category_url = urljoin(BASE, a.get("href"))
-        iterate_category(category_name, category_url, rows)
+    pool = ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix="scraper") if CONCURRENCY > 1 else None
+
+    try:
+        for a in cats:
+            category_name = a.get_text(strip=True)
+            category_url = urljoin(BASE, a.get("href"))
+            saved = checkpoint.category(category_name)
+
+            if saved:
+                progress.category_restored(category_name, saved["pages"], saved["books"], saved.get("done", False))
+            if saved.get("done"):
+                continue
+
+            iterate_category(category_name, category_url, rows, progress, checkpoint, pool)
+    finally:
+        checkpoint.close()
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+        progress.transport_metrics(_transport_snapshot())
 
     print("yayy 3")
 
     df = pd.DataFrame(rows).drop_duplicates(subset=["id"], keep="first").reset_index(drop=True)
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(OUT_PATH, index=False, encoding="utf-8-sig")
+    checkpoint.clear()
 
     print(f"[OK] Categorias: {len(cats)} | Livros únicos: {len(df)}")
     print(f"[OK] CSV: {OUT_PATH.resolve()}")
     print(f"[OK] Imagens em: {IMAGES_DIR.resolve()}")
 
+    snap = metrics.snapshot()
+    print(f"[OK] Tempo de rede: {snap['network_s']}s | parse: {snap['parse_s']}s | retries: {snap['retries']}")
+    pace = throttle.snapshot()
+    print(f"[OK] Throttle: concorrência {pace['concurrency_limit']} | intervalo {pace['delay_s']}s | "
+          f"recuos {pace['decreases']} | 429: {pace['throttled_429']}")
+
+    return df
+
 if __name__ == "__main__":
-    main()
+    main(resume=False if "--fresh" in sys.argv else None)
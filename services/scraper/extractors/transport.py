@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+# Camada HTTP do scraper: pool de conexões do tamanho da concorrência do crawl,
+# keep-alive, retries com backoff exponencial em 5xx/timeouts e métricas de tempo
+# (rede vs. parse). HTTP/2 é opcional (SCRAPER_HTTP2=1 com httpx[http2] instalado).
+# AdaptiveThrottle ajusta a concorrência e o intervalo entre requisições (AIMD)
+# pela latência observada e pelas respostas 429/503/erros do servidor.
+
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONCURRENCY     = int(os.environ.get("SCRAPER_CONCURRENCY", 8))
+POOL_SIZE       = int(os.environ.get("SCRAPER_POOL_SIZE", CONCURRENCY))
+CONNECT_TIMEOUT = float(os.environ.get("SCRAPER_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT    = float(os.environ.get("SCRAPER_READ_TIMEOUT", 20))
+RETRIES         = int(os.environ.get("SCRAPER_RETRIES", 4))
+BACKOFF         = float(os.environ.get("SCRAPER_BACKOFF", 0.5))
+HTTP2           = os.environ.get("SCRAPER_HTTP2", "0") == "1"
+# Throttle adaptativo: começa em INITIAL_CONCURRENCY e sobe até CONCURRENCY
+INITIAL_CONCURRENCY = int(os.environ.get("SCRAPER_INITIAL_CONCURRENCY", 2))
+MIN_DELAY       = float(os.environ.get("SCRAPER_MIN_DELAY", 0))
+MAX_DELAY       = float(os.environ.get("SCRAPER_MAX_DELAY", 10))
+SLOW_FACTOR     = float(os.environ.get("SCRAPER_SLOW_FACTOR", 2))
+
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+RETRY_STATUS = (500, 502, 503, 504)
+USER_AGENT = "books-scraper/0.1"
+
+
+class RequestMetrics:
+    """Contadores e amostras de latência por fase ("network:<tipo>", "parse:<tipo>")."""
+
+    def __init__(self, reservoir: int = 2048):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=reservoir))
+        self._totals = defaultdict(float)
+        self._counts = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._retries = 0
+
+    def record(self, phase: str, seconds: float):
+        with self._lock:
+            self._samples[phase].append(seconds)
+            self._totals[phase] += seconds
+            self._counts[phase] += 1
+
+    def error(self, phase: str):
+        with self._lock:
+            self._errors[phase] += 1
+
+    def retried(self, count: int):
+        if count:
+            with self._lock:
+                self._retries += count
+
+    @contextmanager
+    def timer(self, phase: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            phases = {}
+            for phase, samples in self._samples.items():
+                ordered = sorted(samples)
+                n = len(ordered)
+                phases[phase] = {
+                    "count": self._counts[phase],
+                    "errors": self._errors.get(phase, 0),
+                    "total_s": round(self._totals[phase], 3),
+                    "mean_ms": round(self._totals[phase] / self._counts[phase] * 1000, 2),
+                    "p50_ms": round(ordered[n // 2] * 1000, 2),
+                    "p95_ms": round(ordered[min(n - 1, int(n * 0.95))] * 1000, 2),
+                    "max_ms": round(ordered[-1] * 1000, 2),
+                }
+            network = sum(v for k, v in self._totals.items() if k.startswith("network"))
+            parse = sum(v for k, v in self._totals.items() if k.startswith("parse"))
+            return {"phases": phases, "retries": self._retries,
+                    "network_s": round(network, 3), "parse_s": round(parse, 3)}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+            self._counts.clear()
+            self._errors.clear()
+            self._retries = 0
+
+
+class AdaptiveThrottle:
+    """
+    Controle AIMD da taxa do crawl, compartilhado por todas as requisições:
+    - resposta rápida e sem erro: +1 na concorrência por janela (limit += 1/limit)
+      e o intervalo entre requisições cai 20%;
+    - 429, 503, retry ou erro de rede: concorrência pela metade e intervalo
+      dobrado; latência média acima de SLOW_FACTOR x a latência base: só a
+      concorrência cai (o intervalo cresce quando ela já está no mínimo).
+      No máximo um recuo por latência média, para uma rajada não zerar tudo;
+    - Retry-After de um 429 pausa novas requisições até o prazo.
+    A latência base é o mínimo observado, que sobe devagar (1% por amostra) se o
+    servidor ficar permanentemente mais lento.
+    """
+
+    DELAY_STEP = 0.05  # primeiro recuo a partir de intervalo zero
+
+    def __init__(self, min_concurrency: int = 1, max_concurrency: int = CONCURRENCY,
+                 initial: int = INITIAL_CONCURRENCY, min_delay: float = MIN_DELAY,
+                 max_delay: float = MAX_DELAY, slow_factor: float = SLOW_FACTOR):
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.initial = min(max(initial, self.min_concurrency), self.max_concurrency)
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.slow_factor = slow_factor
+        self._cond = threading.Condition()
+        self.reset()
+
+    def reset(self):
+        with self._cond:
+            self.limit = float(self.initial)
+            self.delay = self.min_delay
+            self.in_flight = 0
+            self.ewma = None
+            self.baseline = None
+            self.increases = 0
+            self.decreases = 0
+            self.throttled = 0
+            self._last_start = 0.0
+            self._resume_at = 0.0
+            self._last_decrease = 0.0
+            self._cond.notify_all()
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = max(self._resume_at - now, self._last_start + self.delay - now)
+                if self.in_flight < int(self.limit) and wait <= 0:
+                    break
+                self._cond.wait(wait if wait > 0 else None)
+            self.in_flight += 1
+            self._last_start = now
+
+    def release(self, latency: float | None, status: int | None = None, retried: int = 0,
+                retry_after: float | None = None, error: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            congested = error or retried > 0 or status in (429, 503)
+            if not congested and latency is not None:
+                if self.baseline is None or latency < self.baseline:
+                    self.baseline = latency
+                else:
+                    self.baseline += (latency - self.baseline) * 0.01
+                self.ewma = latency if self.ewma is None else 0.8 * self.ewma + 0.2 * latency
+            slow = self.ewma is not None and self.ewma > self.baseline * self.slow_factor
+
+            if congested or slow:
+                if status == 429:
+                    self.throttled += 1
+                    if retry_after:
+                        self._resume_at = max(self._resume_at, now + retry_after)
+                if now - self._last_decrease >= (self.ewma or 0.0):
+                    # Só lentidão: reduz a concorrência; o intervalo só cresce em erro,
+                    # 429/503 ou quando já não há concorrência para reduzir
+                    if congested or self.limit < self.min_concurrency + 1:
+                        self.delay = min(self.max_delay, max(self.delay * 2, self.DELAY_STEP, self.min_delay))
+                    self.limit = max(float(self.min_concurrency), self.limit / 2)
+                    self.decreases += 1
+                    self._last_decrease = now
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+                self.delay = max(self.min_delay, self.delay * 0.8)
+                if self.delay < 0.001:
+                    self.delay = self.min_delay
+                self.increases += 1
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "concurrency_limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "delay_s": round(self.delay, 3),
+                "latency_ewma_ms": round(self.ewma * 1000, 2) if self.ewma is not None else None,
+                "latency_baseline_ms": round(self.baseline * 1000, 2) if self.baseline is not None else None,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "throttled_429": self.throttled,
+            }
+
+
+def retry_after_of(response) -> float | None:
+    value = (getattr(response, "headers", None) or {}).get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None  # formato de data HTTP: o recuo do AIMD já cobre
+
+
+class _Retry(Retry):
+    # 429 fica só com o _get do scraper, que passa pelo throttle (Retry-After e recuo);
+    # refazer aqui também multiplicaria as tentativas. 503 com Retry-After segue aqui.
+    RETRY_AFTER_STATUS_CODES = frozenset({503})
+
+
+def build_session(pool_size: int = POOL_SIZE, retries: int = RETRIES,
+                  backoff: float = BACKOFF, http2: bool = HTTP2):
+    if http2:
+        try:
+            return _Http2Session(pool_size, retries, backoff)
+        except ImportError:
+            print("[WARN] SCRAPER_HTTP2=1 mas httpx[http2] não está instalado; usando HTTP/1.1")
+
+    retry = _Retry(total=retries, connect=retries, read=retries, status=retries,
+                  backoff_factor=backoff, status_forcelist=RETRY_STATUS,
+                  allowed_methods=frozenset({"GET", "HEAD"}),
+                  respect_retry_after_header=True, raise_on_status=False)
+    # pool_block=True: nunca abre mais conexões que o pool; os workers esperam
+    # uma conexão keep-alive livre em vez de criar e descartar sockets.
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size,
+                          max_retries=retry, pool_block=True)
+
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def retries_of(response) -> int:
+    retried = getattr(response, "retried", None)  # _Http2Response
+    if retried is not None:
+        return retried
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    return len(retries.history) if retries is not None and retries.history else 0
+
+
+class _Http2Response:
+    """Adapta httpx.Response à interface de requests usada pelo scraper."""
+
+    def __init__(self, response, retried: int = 0):
+        self._response = response
+        self.retried = retried  # tentativas refeitas pelo _Http2Session.get
+        self.url = str(response.url)
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    @property
+    def encoding(self):
+        return self._response.encoding
+
+    @encoding.setter
+    def encoding(self, value):
+        self._response.encoding = value
+
+    @property
+    def text(self):
+        return self._response.text
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} para {self.url}", response=self)
+
+    def iter_content(self, chunk_size: int = 8192):
+        return self._response.iter_bytes(chunk_size)
+
+
+class _Http2Session:
+    def __init__(self, pool_size: int, retries: int, backoff: float):
+        import httpx
+        import h2  # noqa: F401  (httpx só negocia HTTP/2 com o pacote h2)
+
+        self._httpx = httpx
+        self.retries = retries
+        self.backoff = backoff
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self._client = httpx.Client(http2=True, limits=limits, follow_redirects=True,
+                                    transport=httpx.HTTPTransport(http2=True, limits=limits,
+                                                                  retries=retries))
+        self.headers = self._client.headers
+        self.headers["User-Agent"] = USER_AGENT
+
+    def get(self, url, timeout=TIMEOUT, stream=False, **kwargs):
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        attempt = 0
+        while True:
+            try:
+                r = self._client.get(url, timeout=self._httpx.Timeout(read, connect=connect))
+                if r.status_code not in RETRY_STATUS or attempt >= self.retries:
+                    return _Http2Response(r, retried=attempt)
+            except self._httpx.TimeoutException:
+                if attempt >= self.retries:
+                    raise
+            time.sleep(self.backoff * (2 ** attempt))
+            attempt += 1
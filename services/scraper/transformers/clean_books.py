@@ -1,16 +1,20 @@
+import json
+import os
 import re
 import unicodedata
 import pandas as pd
+from datetime import datetime
 from pathlib import Path
 
 BRONZE_DIR = Path(__file__).resolve().parents[4] / "data" / "bronze"
 SILVER_DIR = Path(__file__).resolve().parents[4] / "data" / "silver"
-SILVER_DIR.mkdir(parents=True, exist_ok=True)
+MANIFEST_NAME = "manifest.json"
+CHANGES_DIR = "changes"
 
 def _normalize_text(s: str) -> str:
     if pd.isna(s):
         return ""
-    
+
     s = str(s).strip().lower()
     s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
     s = re.sub(r"[^a-z0-9 _-]+", " ", s)
@@ -21,7 +25,7 @@ def _normalize_text(s: str) -> str:
 def _coerce_price(x):
     if pd.isna(x):
         return None
-    
+
     s = str(x)
     s = re.sub(r"[^0-9,.\-]", "", s)
 
@@ -33,7 +37,7 @@ def _coerce_price(x):
 
     try:
         return float(s)
-    
+
     except Exception:
         return None
 
@@ -42,64 +46,185 @@ def _pick_bronze_csv() -> Path:
 
     if not cands:
         raise SystemExit(f"[ERRO] Nenhum CSV encontrado em {BRONZE_DIR} (esperado books*.csv).")
-    
+
     cands.sort(key=lambda p: p.stat().st_mtime, reverse=True)
 
     return cands[0]
 
-INPUT_CSV = _pick_bronze_csv()
-print(f"[INFO] Lendo bronze: {INPUT_CSV}")
-
-df = pd.read_csv(INPUT_CSV)
-orig_rows = len(df)
-
-if "link" in df.columns and "product_url" not in df.columns:
-    df = df.rename(columns={"link": "product_url"})
-
-if "book_title" in df.columns:
-    df["book_title"] = df["book_title"].astype(str).map(_normalize_text)
-    df["title"] = df["book_title"]
-elif "title" in df.columns:
-    df["title"] = df["title"].astype(str).map(_normalize_text)
-
-if "category" in df.columns:
-    df["category"] = df["category"].astype(str).map(_normalize_text)
+def clean(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
 
-if "raw_price" in df.columns:
-    df["raw_price"] = df["raw_price"].map(_coerce_price)
+    if "link" in df.columns and "product_url" not in df.columns:
+        df = df.rename(columns={"link": "product_url"})
 
-if "rating" in df.columns:
-    df["rating"] = (
-        pd.to_numeric(df["rating"], errors="coerce")
-        .fillna(0)
-        .astype(int)
-        .clip(0, 5)
-    )
+    if "book_title" in df.columns:
+        df["book_title"] = df["book_title"].astype(str).map(_normalize_text)
+        df["title"] = df["book_title"]
+    elif "title" in df.columns:
+        df["title"] = df["title"].astype(str).map(_normalize_text)
 
-if "product_url" in df.columns:
-    df["product_url"] = df["product_url"].astype(str).str.strip()
+    if "category" in df.columns:
+        df["category"] = df["category"].astype(str).map(_normalize_text)
 
-prior = [c for c in ["title", "book_title", "category", "raw_price", "rating", "product_url"] if c in df.columns]
-cols  = prior + [c for c in df.columns if c not in prior]
-df = df[cols]
+    if "raw_price" in df.columns:
+        df["raw_price"] = df["raw_price"].map(_coerce_price)
 
-out_parquet = SILVER_DIR / "books.parquet"
-out_csv     = SILVER_DIR / "books.csv"
+    if "rating" in df.columns:
+        df["rating"] = (
+            pd.to_numeric(df["rating"], errors="coerce")
+            .fillna(0)
+            .astype(int)
+            .clip(0, 5)
+        )
 
-df.to_csv(out_csv, index=False, encoding="utf-8-sig")
+    if "product_url" in df.columns:
+        df["product_url"] = df["product_url"].astype(str).str.strip()
 
-parquet_ok, parquet_err = True, None
+    prior = [c for c in ["title", "book_title", "category", "raw_price", "rating", "product_url"] if c in df.columns]
+    cols  = prior + [c for c in df.columns if c not in prior]
+    return df[cols]
 
-try:
-    df.to_parquet(out_parquet, index=False)
+def _atomic_write(path: Path, write) -> None:
+    # Escreve em um temporário no mesmo diretório e troca com os.replace:
+    # leitores veem o arquivo antigo ou o novo, nunca um arquivo pela metade.
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        write(tmp)
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+def _write_arrow_stream(df: pd.DataFrame, path: Path) -> None:
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+def read_manifest(silver_dir: Path | None = None) -> dict:
+    silver_dir = silver_dir or SILVER_DIR
+    try:
+        with open(silver_dir / MANIFEST_NAME, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"version": 0}
+
+def _row_hashes(csv_path: Path) -> pd.Series | None:
+    """
+    Hash do conteúdo de cada linha (todas as colunas menos id), indexado por id.
+    Lido do CSV publicado como texto, então as duas versões são comparadas
+    exatamente como os clientes as veem, sem diferença de dtype.
+    """
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    if "id" not in df.columns:
+        return None
+    df = df.drop_duplicates("id", keep="first")
+    content = df[sorted(c for c in df.columns if c != "id")]
+    hashes = pd.util.hash_pandas_object(content, index=False)
+    return pd.Series(hashes.to_numpy(), index=pd.Index(df["id"], name="id"), name="hash")
+
+def diff_catalog(old: pd.Series | None, new: pd.Series) -> dict:
+    """Hash join por id: ids novos, alterados (hash diferente) e removidos."""
+    if old is None:
+        old = pd.Series([], dtype="uint64", index=pd.Index([], name="id", dtype=object), name="hash")
+
+    joined = pd.merge(old.rename("old").reset_index(), new.rename("new").reset_index(),
+                      on="id", how="outer", indicator=True, sort=True)
+    side = joined["_merge"]
+    return {
+        "added": joined.loc[side == "right_only", "id"].tolist(),
+        "changed": joined.loc[(side == "both") & (joined["old"] != joined["new"]), "id"].tolist(),
+        "removed": joined.loc[side == "left_only", "id"].tolist(),
+    }
+
+def read_changes(version: int, silver_dir: Path | None = None) -> dict | None:
+    silver_dir = silver_dir or SILVER_DIR
+    try:
+        with open(silver_dir / CHANGES_DIR / f"v{int(version)}.json", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
 
-except Exception as e:
-    parquet_ok, parquet_err = False, e
+def publish(df: pd.DataFrame, silver_dir: Path | None = None, before_manifest=None) -> dict:
+    """
+    Grava a nova versão da silver de forma atômica e incrementa a versão do catálogo.
+    `before_manifest(version)` grava artefatos derivados da versão (ex.: vizinhos)
+    antes do manifesto, para que já estejam no lugar quando a versão for anunciada.
+    """
+    silver_dir = silver_dir or SILVER_DIR
+    silver_dir.mkdir(parents=True, exist_ok=True)
+    out_csv     = silver_dir / "books.csv"
+    out_parquet = silver_dir / "books.parquet"
+    out_arrow   = silver_dir / "books.arrows"
+
+    files = ["books.csv"]
+    parquet_err = None
+
+    previous_version = int(read_manifest(silver_dir).get("version", 0))
+    version = previous_version + 1
+    old_hashes = _row_hashes(out_csv) if out_csv.exists() else None
 
-print(f"[INFO] Linhas de entrada: {orig_rows} | Linhas de saída: {len(df)}")
-print(f"[OK] CSV: {out_csv}")
+    try:
+        _atomic_write(out_parquet, lambda p: df.to_parquet(p, index=False))
+        files.append("books.parquet")
+    except Exception as e:
+        parquet_err = e
 
-if parquet_ok:
-    print(f"[OK] Parquet: {out_parquet}")
-else:
-    print(f"[WARN] Parquet falhou ({parquet_err})")
+    # Arrow IPC (stream) pronto para o /api/v1/export enviar sem conversão
+    try:
+        _atomic_write(out_arrow, lambda p: _write_arrow_stream(df, p))
+        files.append("books.arrows")
+    except Exception as e:
+        parquet_err = parquet_err or e
+
+    _atomic_write(out_csv, lambda p: df.to_csv(p, index=False, encoding="utf-8-sig"))
+    published_at = datetime.now().isoformat()
+
+    # Diff desta versão contra a anterior, para o feed /api/v1/books/changes
+    changes = None
+    new_hashes = _row_hashes(out_csv)
+    if new_hashes is not None:
+        changes = {"version": version, "previous_version": previous_version,
+                   "published_at": published_at, **diff_catalog(old_hashes, new_hashes)}
+        (silver_dir / CHANGES_DIR).mkdir(exist_ok=True)
+        _atomic_write(silver_dir / CHANGES_DIR / f"v{version}.json",
+                      lambda p: p.write_text(json.dumps(changes), encoding="utf-8"))
+
+    if before_manifest is not None:
+        before_manifest(version)
+
+    # O manifesto é gravado por último: é ele que anuncia a nova versão
+    manifest = {
+        "version": version,
+        "published_at": published_at,
+        "rows": int(len(df)),
+        "files": files,
+    }
+    if changes is not None:
+        manifest["changes"] = {k: len(changes[k]) for k in ("added", "changed", "removed")}
+    _atomic_write(silver_dir / MANIFEST_NAME,
+                  lambda p: p.write_text(json.dumps(manifest, indent=2), encoding="utf-8"))
+
+    if parquet_err is not None:
+        print(f"[WARN] Parquet/Arrow falhou ({parquet_err})")
+
+    return manifest
+
+def main():
+    input_csv = _pick_bronze_csv()
+    print(f"[INFO] Lendo bronze: {input_csv}")
+
+    df = pd.read_csv(input_csv)
+    orig_rows = len(df)
+
+    df = clean(df)
+    manifest = publish(df)
+
+    print(f"[INFO] Linhas de entrada: {orig_rows} | Linhas de saída: {len(df)}")
+    print(f"[OK] Silver v{manifest['version']}: {', '.join(manifest['files'])} em {SILVER_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,9 @@ import io
 import json
 import tempfile
 import threading as real_threading
+import tracemalloc
 from datetime import datetime
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -11,6 +13,12 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Banco descartável: o engine é criado no import do app, então a URL vem antes
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db"))
+os.environ.setdefault("ML_FEATURES_DIR", tempfile.mkdtemp())
+os.environ.setdefault("API_WARMUP", "off")  # cada teste aquece o catálogo que monta
+os.environ.setdefault("API_RATE_LIMIT", "off")  # testes de limite montam o próprio limiter
+
 import services.api.src.app as app_module
 from flask_jwt_extended import create_access_token
 
@@ -27,13 +35,16 @@ def client(tmp_path, monkeypatch):
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'  # Banco em memória
     app.config['WTF_CSRF_ENABLED'] = False  # Desabilita CSRF para testes
 
+    # Catálogo novo por teste: caches por versão (índices, respostas prontas) não vazam entre testes
+    from services.resources.Extract import Extract
+    monkeypatch.setattr(app_module, "extract", Extract())
+
     # Prepara o banco de dados para os testes
     with app.app_context():
-        app_module.db.init_app(app)
         app_module.db.create_all()  # Cria todas as tabelas
 
-    # Fornece o cliente de teste para os testes
-    with app.test_client() as client:
+    # Fornece o cliente de teste para os testes (com contexto de aplicação ativo)
+    with app.app_context(), app.test_client() as client:
         yield client
 
 
@@ -44,6 +55,24 @@ def test_home(client):
     assert b"Welcome to the Challanger." in response.data
 
 
+def test_app_import_is_lazy_and_apispec_is_cached(client):
+    """Testa que o import do app não carrega scraper/ML e que o /apispec.json vem de bytes em cache"""
+    import subprocess
+    probe = ("import sys, services.api.src.app; "
+             "print(sorted(m for m in ('bs4', 'services.scraper.extractors.scrape_books', "
+             "'services.pipeline.books_pipeline', 'services.ml.model') if m in sys.modules))")
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    out = subprocess.run([sys.executable, "-c", probe], cwd=root, capture_output=True, text=True,
+                         env=dict(os.environ, PYTHONPATH=root), check=True).stdout
+    assert out.strip().splitlines()[-1] == "[]"
+
+    first = client.get('/apispec.json')
+    assert first.status_code == 200
+    assert "/api/v1/books" in first.get_json()["paths"]
+    assert first.data == app_module._apispec_body
+    assert client.get('/apispec.json', headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+
 def test_get_books_monkeypatched(client, monkeypatch):
     """Testa a busca de livros com dados simulados"""
     # Simula dados que seriam retornados pelo banco/API externa
@@ -75,6 +104,227 @@ def test_get_book_found_and_not_found(client, monkeypatch):
     assert response.get_json()["msg"] == "Livro não encontrado!"
 
 
+def _silver_catalog(tmp_path, rows):
+    """Cria uma silver temporária e um Extract apontando para ela"""
+    from services.resources.Extract import Extract
+
+    csv_path = tmp_path / "books.csv"
+    pd.DataFrame(rows).to_csv(csv_path, index=False)
+    return Extract(csv_path=str(csv_path), manifest_path=str(tmp_path / "manifest.json"))
+
+
+def test_get_books_batch(client, monkeypatch, tmp_path):
+    """Testa a busca em lote: ordem pedida, ids ausentes e validação do corpo"""
+    catalog = _silver_catalog(tmp_path, [
+        {"id": f"livro_{i}", "title": f"livro {i}", "category": "poetry",
+         "raw_price": 10.0 + i, "rating": i % 6} for i in range(5)
+    ])
+    monkeypatch.setattr(app_module, "extract", catalog)
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+
+    response = client.post('/api/v1/books/batch', headers=headers,
+                           json={"ids": ["livro_3", "nao_existe", "livro_0", "livro_3"]})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [b["id"] for b in data["books"]] == ["livro_3", "livro_0"]
+    assert data["books"][0]["raw_price"] == 13.0
+    assert data["missing"] == ["nao_existe"]
+    assert data["count"] == 2
+
+    assert client.post('/api/v1/books/batch', headers=headers, json={"ids": "livro_1"}).status_code == 400
+    monkeypatch.setattr(app_module, "BOOKS_BATCH_MAX", 2)
+    response = client.post('/api/v1/books/batch', headers=headers,
+                           json={"ids": ["livro_1", "livro_2", "livro_4"]})
+    assert response.status_code == 400
+    assert "msg" in response.get_json()
+
+
+def test_query_books_matches_pandas_filters(client, monkeypatch, tmp_path):
+    """Testa a consulta facetada contra o mesmo filtro feito com pandas"""
+    import numpy as np
+
+    rng = np.random.default_rng(7)
+    n = 300  # não múltiplo de 64: cobre a última palavra parcial do bitmap
+    rows = pd.DataFrame({
+        "id": [f"livro_{i}" for i in range(n)],
+        "title": [f"livro {i}" for i in range(n)],
+        "category": rng.choice(["poetry", "travel", "history"], n),
+        "raw_price": rng.uniform(10, 60, n).round(2),
+        "rating": rng.integers(0, 6, n),
+        "instock": rng.integers(0, 3, n),
+    })
+    monkeypatch.setattr(app_module, "extract", _silver_catalog(tmp_path, rows.to_dict("records")))
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+
+    response = client.get('/api/v1/books/query?category=poetry,travel&min_rating=4'
+                          '&min_price=20&max_price=45.5&in_stock=true&limit=10', headers=headers)
+    assert response.status_code == 200
+    data = response.get_json()
+
+    expected = rows[rows["category"].isin(["poetry", "travel"]) & (rows["rating"] >= 4)
+                    & rows["raw_price"].between(20, 45.5) & (rows["instock"] > 0)]
+    assert data["total"] == len(expected)
+    assert [b["id"] for b in data["books"]] == expected["id"].head(10).tolist()
+    assert data["facets"]["category"] == expected["category"].value_counts().to_dict()
+    assert data["facets"]["rating"] == {str(k): v for k, v in expected["rating"].value_counts().items()}
+
+    everything = client.get('/api/v1/books/query?limit=0', headers=headers).get_json()
+    assert everything["total"] == n and everything["books"] == []
+    assert client.get('/api/v1/books/query?min_rating=x', headers=headers).status_code == 400
+
+
+def test_suggest_books_prefix_and_word_matches(client, monkeypatch, tmp_path):
+    """Testa o autocomplete: início do título primeiro, depois início de palavra"""
+    titles = ["the black maria", "black dust", "blackout", "a light in the attic",
+              "sharp objects", "the requiem red"]
+    monkeypatch.setattr(app_module, "extract", _silver_catalog(tmp_path, [
+        {"id": f"livro_{i}", "title": t, "category": "poetry", "raw_price": 10.0, "rating": 3}
+        for i, t in enumerate(titles)
+    ]))
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+
+    response = client.get('/api/v1/books/suggest?q=Black', headers=headers)
+    assert response.status_code == 200
+    suggestions = response.get_json()
+    assert [s["title"] for s in suggestions] == ["black dust", "blackout", "the black maria"]
+    assert set(suggestions[0]) == {"id", "title"}
+
+    limited = client.get('/api/v1/books/suggest?q=the&limit=1', headers=headers).get_json()
+    assert [s["id"] for s in limited] == ["livro_0"]
+    assert client.get('/api/v1/books/suggest?q=zzz', headers=headers).get_json() == []
+    assert client.get('/api/v1/books/suggest?q=', headers=headers).status_code == 400
+
+    # Consulta maior que a chave truncada: o casamento vem depois de muitos títulos com a mesma chave
+    from services.resources.suggest import TitleSuggester, KEY_CHARS
+    stem = "the complete history of "[:KEY_CHARS]
+    many = pd.DataFrame({"id": [f"v{i}" for i in range(51)],
+                         "title": [f"{stem}aaa volume {i}" for i in range(50)] + [f"{stem}zebras"]})
+    assert TitleSuggester(many).suggest(f"{stem}zeb", limit=1) == [{"id": "v50", "title": f"{stem}zebras"}]
+
+    # Casa pela chave normalizada, mas devolve o título como está no catálogo (igual a /books/<id>)
+    raw = pd.DataFrame({"id": ["x1"], "title": ["Ação & Reação: Vol. 2"]})
+    assert TitleSuggester(raw).suggest("acao") == [{"id": "x1", "title": "Ação & Reação: Vol. 2"}]
+    assert TitleSuggester(raw).suggest("reac") == [{"id": "x1", "title": "Ação & Reação: Vol. 2"}]
+
+
+def test_books_changes_feed_composes_versions(client, monkeypatch, tmp_path):
+    """Testa o feed de alterações: diffs por versão e delta líquido desde uma versão"""
+    from services.resources.Extract import Extract
+    from services.scraper.transformers.clean_books import publish
+
+    def book(book_id, price, instock=3):
+        return {"id": book_id, "title": book_id, "category": "poetry",
+                "raw_price": price, "rating": 3, "instock": instock}
+
+    v1 = publish(pd.DataFrame([book("a", 10.0), book("b", 20.0), book("c", 30.0)]), tmp_path)
+    v2 = publish(pd.DataFrame([book("a", 10.0), book("b", 25.0), book("d", 40.0)]), tmp_path)
+    v3 = publish(pd.DataFrame([book("a", 10.0), book("b", 25.0, instock=0), book("c", 30.0)]), tmp_path)
+    assert (v1["version"], v2["version"], v3["version"]) == (1, 2, 3)
+    assert v2["changes"] == {"added": 1, "changed": 1, "removed": 1}
+
+    monkeypatch.setattr(app_module, "extract", Extract(csv_path=str(tmp_path / "books.csv"),
+                                                       manifest_path=str(tmp_path / "manifest.json")))
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+
+    full = client.get('/api/v1/books/changes?since=0', headers=headers).get_json()
+    assert full["version"] == 3
+    assert sorted(full["added"]) == ["a", "b", "c"] and full["changed"] == full["removed"] == []
+    assert len(full["books"]) == 3
+
+    delta = client.get('/api/v1/books/changes?since=1', headers=headers).get_json()
+    assert delta["added"] == [] and delta["removed"] == []
+    # d entrou e saiu (some do delta); c saiu e voltou (reenviado como alterado)
+    assert sorted(delta["changed"]) == ["b", "c"]
+    assert {b["id"]: b["instock"] for b in delta["books"]} == {"b": 0, "c": 3}
+
+    delta = client.get('/api/v1/books/changes?since=2', headers=headers).get_json()
+    assert sorted(delta["added"]) == ["c"] and delta["changed"] == ["b"] and delta["removed"] == ["d"]
+
+    current = client.get('/api/v1/books/changes?since=3', headers=headers).get_json()
+    assert current["added"] == current["changed"] == current["removed"] == current["books"] == []
+    assert client.get('/api/v1/books/changes?since=4', headers=headers).status_code == 400
+
+    (tmp_path / "changes" / "v1.json").unlink()
+    assert client.get('/api/v1/books/changes?since=0', headers=headers).status_code == 410
+
+
+def test_catalog_swaps_only_when_manifest_announces_version(tmp_path):
+    """A CSV trocada antes do manifesto não é servida (nem cacheada) sob a versão antiga"""
+    from services.resources.Extract import Extract
+    from services.scraper.transformers.clean_books import publish
+    from services.ml.similar import NEIGHBOURS_FILE, META_KEY
+    import pyarrow.parquet as pq
+
+    frame = lambda ids: pd.DataFrame([{"id": i, "title": i, "category": "poetry",
+                                       "raw_price": 1.0, "rating": 1} for i in ids])
+    publish(frame(["a", "b"]), tmp_path)
+    catalog = Extract(csv_path=str(tmp_path / "books.csv"), manifest_path=str(tmp_path / "manifest.json"))
+    assert catalog.snapshot().version == 1
+
+    def before_manifest(version):
+        # CSV nova já no lugar, manifesto ainda na v1: a API continua na versão anterior
+        snapshot = catalog.snapshot()
+        assert (snapshot.version, snapshot.df["id"].tolist()) == (1, ["a", "b"])
+        from services.ml.similar import build_neighbours, save_neighbours
+        new = frame(["a", "b", "c"])
+        save_neighbours(new, *build_neighbours(new), version, tmp_path)
+
+    publish(frame(["a", "b", "c"]), tmp_path, before_manifest=before_manifest)
+    snapshot = catalog.snapshot()
+    assert (snapshot.version, snapshot.df["id"].tolist()) == (2, ["a", "b", "c"])
+    meta = json.loads(pq.read_schema(tmp_path / NEIGHBOURS_FILE).metadata[META_KEY])
+    assert meta["version"] == 2  # vizinhos da versão publicados junto com ela
+
+
+def test_catalog_uses_compact_schema_and_serializes_cleanly(tmp_path):
+    """O catálogo em memória usa tipos compactos sem mudar o JSON das rotas"""
+    from services.resources.Extract import Extract, to_records
+
+    csv_path = tmp_path / "books.csv"
+    pd.DataFrame([
+        {"id": "a_1", "title": "a", "category": "poetry", "raw_price": 45.17, "rating": 2,
+         "instock": 19, "UPC": "x", "image_path": None},
+        {"id": "b_2", "title": "b", "category": "travel", "raw_price": 10.0, "rating": 5,
+         "instock": 3, "UPC": "y", "image_path": None},
+    ]).to_csv(csv_path, index=False)
+
+    df = Extract(csv_path=str(csv_path), manifest_path=str(tmp_path / "m.json")).load_books()
+    assert isinstance(df["category"].dtype, pd.CategoricalDtype)
+    assert str(df["rating"].dtype) == "int8"
+    assert str(df["raw_price"].dtype) == "float32"
+    assert str(df["instock"].dtype) == "int32"
+
+    records = to_records(df)
+    assert records[0] == {"id": "a_1", "title": "a", "category": "poetry", "raw_price": 45.17,
+                          "rating": 2, "instock": 19, "UPC": "x", "image_path": ""}
+    assert json.dumps(records)
+
+
+@pytest.mark.parametrize("name", ["stdlib", "columnar", "orjson"])
+def test_json_encoders_match_records(name):
+    """Todos os encoders geram o mesmo JSON que to_records, inclusive com faltantes"""
+    from services.resources.Extract import to_records, compact_catalog
+    from services.resources import encoders
+
+    if name == "orjson" and encoders.orjson is None:
+        pytest.skip("orjson não instalado")
+
+    df = compact_catalog(pd.DataFrame([
+        {"id": "a_1", "title": 'aspas " e %s', "category": "poetry", "raw_price": 45.17,
+         "rating": 2, "instock": 19, "image_path": None},
+        {"id": "b_2", "title": "ção", "category": None, "raw_price": None,
+         "rating": 5, "instock": None, "image_path": None},
+        {"id": "c_3", "title": "c", "category": "poetry", "raw_price": float("inf"),
+         "rating": 1, "instock": 1, "image_path": None, "score": float("-inf")},
+    ]))
+    def reject(constant):
+        raise ValueError(f"JSON inválido: {constant}")
+
+    body = encoders.get_encoder(name).encode(df)
+    assert json.loads(body, parse_constant=reject) == to_records(df)
+    assert to_records(df)[2]["raw_price"] is None and to_records(df)[2]["score"] is None
+
+
 def test_search_books(client, monkeypatch):
     """Testa a funcionalidade de busca de livros por título e categoria"""
     # Simula resultados de busca
@@ -114,6 +364,53 @@ def test_health_endpoint(client, monkeypatch):
     assert "timestamp" in health_data  # Verifica timestamp da resposta
 
 
+def test_health_served_from_cached_probe(client, monkeypatch):
+    """Testa que o health lê o resultado em cache em vez de consultar o banco a cada chamada"""
+    from services.monitoring.health import HealthProbe
+    calls = []
+
+    def check():
+        calls.append(1)
+        return True
+
+    probe = HealthProbe(check, interval_s=60)
+    monkeypatch.setattr(app_module, "health_probe", probe)
+    try:
+        bodies = [client.get('/api/v1/health').get_json() for _ in range(3)]
+    finally:
+        probe.stop()
+    assert len(calls) == 1
+    assert {b["database"] for b in bodies} == {"Online"}
+    assert len({b["database_checked_at"] for b in bodies}) == 1
+
+    failing = HealthProbe(lambda: 1 / 0, interval_s=60)
+    assert failing.probe()["database"] == "Offline"
+
+
+def test_database_runs_in_wal_with_pooled_connections_and_cached_lookup(client):
+    """Testa os pragmas do SQLite, o pool dimensionado e a busca de usuário pelo statement pronto"""
+    from services.database import engine as db_engine
+
+    engine = app_module.db.engine
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == db_engine.DB_BUSY_TIMEOUT_MS
+    assert engine.pool.size() == db_engine.DB_POOL_SIZE and engine.pool._pre_ping
+    assert db_engine.engine_options("sqlite:///:memory:").get("pool_size") is None
+
+    user = app_module.User(username="wal_user")
+    user.password_hash = "x"
+    app_module.db.session.add(user)
+    app_module.db.session.commit()
+    try:
+        assert app_module.User.find_by_username("wal_user").id == user.id
+        assert app_module.User.find_by_username("ninguem") is None
+    finally:
+        app_module.db.session.delete(user)
+        app_module.db.session.commit()
+
+
 def _create_mock_user(username, valid_password=True):
     """Cria um usuário simulado para testes de autenticação"""
     class MockUser:
@@ -131,15 +428,12 @@ def test_login_success_and_failure(client, monkeypatch):
     """Testa os cenários de login: credenciais válidas e inválidas"""
     
     # Simula a consulta ao banco de usuários
-    def mock_filter_by(**filters):
-        class QueryResult:
-            def first(self):
-                if filters.get("username") == "usuario_valido":
-                    return _create_mock_user("usuario_valido", valid_password=True)
-                return None
-        return QueryResult()
+    def mock_find_by_username(username):
+        if username == "usuario_valido":
+            return _create_mock_user("usuario_valido", valid_password=True)
+        return None
 
-    monkeypatch.setattr(app_module.User, "query", type("MockQuery", (), {"filter_by": staticmethod(mock_filter_by)}))
+    monkeypatch.setattr(app_module.User, "find_by_username", staticmethod(mock_find_by_username))
 
     # Caso de sucesso: login com credenciais corretas
     response = client.post('/api/v1/auth/login', 
@@ -155,6 +449,124 @@ def test_login_success_and_failure(client, monkeypatch):
     assert response.get_json().get("error") == "Credenciais inválidas"
 
 
+def test_login_rate_limited_per_username(client, monkeypatch):
+    """Testa que rajadas de login para o mesmo usuário recebem 429 com Retry-After"""
+    app_module.login_user_limiter.reset()
+    app_module.login_ip_limiter.reset()
+    monkeypatch.setattr(app_module.User, "find_by_username", staticmethod(lambda username: None))
+
+    statuses = [
+        client.post('/api/v1/auth/login', json={"username": "alvo", "password": "x"}).status_code
+        for _ in range(int(app_module.login_user_limiter.capacity) + 1)
+    ]
+    assert statuses[:-1] == [401] * (len(statuses) - 1)
+    assert statuses[-1] == 429
+
+    response = client.post('/api/v1/auth/login', json={"username": "alvo", "password": "x"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    with pytest.raises(ValueError):
+        app_module.KeyedRateLimiter(capacity=5, per_minute=0)  # LOGIN_*_PER_MINUTE=0 falha na subida
+    app_module.login_user_limiter.reset()
+    app_module.login_ip_limiter.reset()
+
+
+def test_api_rate_limit_weighs_routes_per_token_and_shares_sqlite(client, monkeypatch, tmp_path):
+    """Testa o limite por token: custo por rota, headers RateLimit-*, 429, cota diária e backend SQLite"""
+    from services.auth.rate_limit import ApiRateLimiter
+
+    monkeypatch.setattr(app_module, "extract", _silver_catalog(tmp_path, [
+        {"id": "livro_1", "title": "livro", "category": "poetry", "raw_price": 10.0, "rating": 3}]))
+    monkeypatch.setattr(app_module, "api_limiter", ApiRateLimiter(burst=25, per_minute=1, daily_quota=1000))
+    pesado = {"Authorization": f"Bearer {create_access_token(identity='pesado')}"}
+    leve = {"Authorization": f"Bearer {create_access_token(identity='leve')}"}
+
+    first = client.get('/api/v1/books', headers=pesado)
+    assert first.status_code == 200
+    assert first.headers["RateLimit-Limit"] == "25" and first.headers["RateLimit-Remaining"] == "15"
+    assert int(first.headers["RateLimit-Reset"]) > 0
+    assert first.headers["RateLimit-Policy"] == "25;w=1500, 1000;w=86400"
+    assert client.get('/api/v1/books', headers=pesado).status_code == 200
+
+    # /books custa 10: o terceiro estoura a rajada, outro token e rotas isentas seguem livres
+    blocked = client.get('/api/v1/books', headers=pesado)
+    assert blocked.status_code == 429 and int(blocked.headers["Retry-After"]) >= 1
+    assert blocked.get_json()["policy"] == "burst" and blocked.headers["RateLimit-Remaining"] == "5"
+    assert client.get('/api/v1/categories', headers=pesado).status_code == 200  # custo 1
+    assert client.get('/api/v1/books', headers=leve).status_code == 200
+    health = client.get('/api/v1/health', headers=pesado)
+    assert health.status_code == 200 and "RateLimit-Limit" not in health.headers
+
+    # Cota diária esgotada antes da rajada
+    quota = ApiRateLimiter(burst=100, per_minute=600, daily_quota=15)
+    decisions = [quota.check("user:x", 10) for _ in range(2)]
+    assert decisions[0].allowed and decisions[0].policy == "daily"
+    assert not decisions[1].allowed and decisions[1].policy == "daily"
+    burst = dict(quota.policies)["burst"]
+    assert burst.take("user:x", dry_run=True)[2] == pytest.approx(89, abs=0.5)  # a negada não gastou da rajada
+    for backend in ("memory", "sqlite"):
+        with pytest.raises(ValueError):
+            ApiRateLimiter(burst=10, per_minute=0, backend=backend, path=str(tmp_path / "zero.db"))
+
+    # Backend SQLite: dois limiters (como dois workers) dividem o mesmo bucket
+    path = str(tmp_path / "rate" / "limits.db")
+    worker_a = ApiRateLimiter(burst=3, per_minute=1, backend="sqlite", path=path)
+    worker_b = ApiRateLimiter(burst=3, per_minute=1, backend="sqlite", path=path)
+    assert [worker_a.check("user:x").allowed, worker_b.check("user:x").allowed,
+            worker_a.check("user:x").allowed, worker_b.check("user:x").allowed] == [True, True, True, False]
+
+
+def test_login_rehashes_outdated_password_hash(client, monkeypatch):
+    """Testa que o hash é regravado com o método atual após um login válido"""
+    from werkzeug.security import generate_password_hash, check_password_hash
+
+    class LegacyUser:
+        username = "legado"
+        password_hash = generate_password_hash("senha_correta", method="pbkdf2:sha256:1000")
+
+        def check_password(self, password):
+            return check_password_hash(self.password_hash, password)
+
+    user = LegacyUser()
+    monkeypatch.setattr(app_module.User, "find_by_username", staticmethod(lambda username: user))
+    monkeypatch.setattr(app_module.db.session, "commit", lambda: None)
+
+    response = client.post('/api/v1/auth/login', json={"username": "legado", "password": "senha_correta"})
+    assert response.status_code == 200
+    assert user.password_hash.startswith("scrypt:")
+    assert check_password_hash(user.password_hash, "senha_correta")
+
+
+def test_login_returns_503_when_hasher_saturated(client, monkeypatch):
+    """Testa que o login é recusado quando a fila do pool de hash está cheia"""
+    def overloaded(user, password):
+        raise app_module.HasherOverloaded()
+
+    monkeypatch.setattr(app_module.hasher, "verify", overloaded)
+    monkeypatch.setattr(app_module.User, "find_by_username", staticmethod(lambda username: _create_mock_user("u")))
+
+    response = client.post('/api/v1/auth/login', json={"username": "sobrecarga", "password": "senha_correta"})
+    assert response.status_code == 503
+
+
+def test_password_hasher_times_out_and_hashes_unknown_users(monkeypatch):
+    """Testa que hash sem resposta vira HasherOverloaded e que usuário inexistente também paga o hash"""
+    from services.auth import hashing
+
+    release = real_threading.Event()
+    slow = hashing.PasswordHasher(workers=1, queue_depth=0, timeout=0.05)
+    with pytest.raises(hashing.HasherOverloaded):
+        slow.run(release.wait, 5)
+    release.set()
+
+    checked = []
+    hasher = hashing.PasswordHasher(workers=1)
+    original = hashing.check_password_hash
+    monkeypatch.setattr(hashing, "check_password_hash", lambda h, p: checked.append(h) or original(h, p))
+    assert hasher.verify(None, "qualquer") is False
+    assert checked == [hashing.dummy_hash()]
+
+
 def test_protected_route_requires_jwt(client):
     """Testa que rotas protegidas exigem token JWT válido"""
     
@@ -171,57 +583,576 @@ def test_protected_route_requires_jwt(client):
     assert "Dados de treinamento" in response.get_data(as_text=True) or response.get_json().get("message")
 
 
-def test_trigger_scraping_starts_thread_and_updates_status(client, monkeypatch, tmp_path):
-    """
-    Testa o acionamento do processo de scraping.
-    Simula a execução em thread e verifica atualização de status.
-    """
-    
-    # Cria arquivo CSV temporário para simular resultado do scraping
-    output_csv = tmp_path / "livros_scraped.csv"
-    sample_data = pd.DataFrame([{"title": "O Alienista", "author": "Machado de Assis"}])
-    sample_data.to_csv(output_csv, index=False, encoding="utf-8-sig")
-
-    # Simula o módulo de scraping
-    class MockScraper:
-        OUT_PATH = str(output_csv)
+class _SyncExecutor:
+    """Executa os jobs imediatamente (síncrono) em vez de no pool"""
+    def submit(self, fn, *args):
+        fn(*args)
 
-        @staticmethod
-        def main():
-            # Em um cenário real, aqui ocorreria o scraping
-            # Para testes, apenas simulamos a execução
-            return
 
-    monkeypatch.setattr(app_module, "books_scraper", MockScraper)
+def test_trigger_scraping_runs_pipeline_and_swaps_catalog(client, monkeypatch, tmp_path):
+    """
+    Testa o acionamento do pipeline (scraping -> limpeza -> publicação).
+    Executa o job de forma síncrona e verifica o status persistido e a troca
+    do catálogo servido pela API sem restart.
+    """
+    from services.resources.Extract import Extract
+    import services.pipeline.books_pipeline as books_pipeline
 
-    # Faz a thread executar sincronamente para facilitar testes
-    class SyncThread:
-        def __init__(self, target=None, daemon=None):
-            self._target = target
+    silver_dir = tmp_path / "silver"
+    silver_dir.mkdir()
+    pd.DataFrame([{"id": "antigo_1", "title": "antigo", "category": "poetry",
+                   "raw_price": 1.0, "rating": 1}]).to_csv(silver_dir / "books.csv", index=False)
+    catalog = Extract(csv_path=str(silver_dir / "books.csv"),
+                      manifest_path=str(silver_dir / "manifest.json"))
+    assert catalog.load_books()["id"].tolist() == ["antigo_1"]
 
-        def start(self):
-            # Executa imediatamente (sincrono) em vez de em background
-            if self._target:
-                self._target()
+    def fake_scraper_main(progress=None, resume=None):
+        progress.crawl_started(["Poetry"], 2)
+        progress.category_started("Poetry", 2, 1)
+        progress.page_done("Poetry", 2)
+        progress.category_finished("Poetry")
+        return pd.DataFrame([
+            {"id": "o-alienista_1", "book_title": "O Alienista", "category": "Poetry",
+             "raw_price": "£10.50", "rating": 4, "link": "http://x/1"},
+            {"id": "dom-casmurro_2", "book_title": "Dom Casmurro", "category": "Poetry",
+             "raw_price": "£20.00", "rating": 5, "link": "http://x/2"},
+        ])
 
-    monkeypatch.setattr(app_module, "threading", type("ThreadSync", (), {"Thread": SyncThread}))
+    monkeypatch.setattr(books_pipeline.books_scraper, "main", fake_scraper_main)
+    monkeypatch.setattr(books_pipeline.books_cleaner, "SILVER_DIR", silver_dir)
+    monkeypatch.setattr(books_pipeline.history, "HISTORY_DIR", tmp_path / "history")
+    monkeypatch.setattr(app_module, "extract", catalog)
+    monkeypatch.setattr(app_module.scrape_jobs, "_executor", _SyncExecutor())
 
-    # Aciona o scraping (rota protegida)
     token = create_access_token(identity="usuario_scraping")
-    response = client.post('/api/v1/scraping/trigger', 
+    response = client.post('/api/v1/scraping/trigger',
                           headers={"Authorization": f"Bearer {token}"})
-    
+
     assert response.status_code == 200
     response_data = response.get_json()
     assert response_data["message"] == "Scraping iniciado com sucesso."
 
-    # Verifica se o status foi atualizado após execução
-    import time
-    time.sleep(0.1)  # Pequena pausa para garantir processamento
-    
-    status = app_module.scraping_status
-    assert "running" in status
-    assert isinstance(status.get("books_scraped"), int)  # Deve ter contagem de livros
+    status = client.get('/api/v1/scraping/status',
+                        headers={"Authorization": f"Bearer {token}"}).get_json()
+    assert status["job_id"] == response_data["job_id"]
+    assert status["status"] == "finished"
+    assert status["running"] is False
+    assert status["books_scraped"] == 2
+    assert status["stage"] == "published"
+    assert status["catalog_version"] == 1
+    assert status["categories"]["Poetry"]["pages_done"] == 1
+    assert status["categories"]["Poetry"]["status"] == "done"
+
+    # Catálogo trocado a quente, com os dados já limpos
+    books = client.get('/api/v1/books', headers={"Authorization": f"Bearer {token}"}).get_json()
+    assert sorted(b["title"] for b in books) == ["dom casmurro", "o alienista"]
+    assert catalog.snapshot().version == 1
+    assert not [p for p in silver_dir.iterdir() if p.name.endswith(".tmp")]
+
+    # Snapshot de preço/estoque da execução gravado na partição do dia
+    history = client.get('/api/v1/books/dom-casmurro_2/history',
+                         headers={"Authorization": f"Bearer {token}"}).get_json()
+    assert [h["raw_price"] for h in history["history"]] == [20.0]
+
+
+def test_trigger_scraping_rejects_concurrent_job(client, monkeypatch):
+    """Testa que só um job ativo existe por vez e que ele pode ser cancelado e retomado"""
+    class IdleExecutor:
+        def submit(self, fn, *args):
+            pass  # mantém o job na fila
+
+    monkeypatch.setattr(app_module.scrape_jobs, "_executor", IdleExecutor())
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+
+    first = client.post('/api/v1/scraping/trigger', headers=headers)
+    assert first.status_code == 200
+    second = client.post('/api/v1/scraping/trigger', headers=headers)
+    assert second.status_code == 400
+
+    cancelled = client.post('/api/v1/scraping/cancel', headers=headers)
+    assert cancelled.status_code == 200
+    assert cancelled.get_json()["status"] == "cancelled"
+
+    resumed = client.post('/api/v1/scraping/resume', headers=headers)
+    assert resumed.status_code == 200
+    assert resumed.get_json()["job_id"] == first.get_json()["job_id"]
+    assert client.post('/api/v1/scraping/cancel', headers=headers).status_code == 200
+
+
+def test_scraping_heartbeat_keeps_long_stage_alive_and_worker_recovers_jobs(client, monkeypatch):
+    """Testa que etapa longa sem callbacks não é expirada e que a recuperação roda uma vez por processo"""
+    from concurrent.futures import ThreadPoolExecutor
+    import services.jobs.scraping as scraping
+
+    runner = app_module.scrape_jobs
+    gate, started = real_threading.Event(), real_threading.Event()
+
+    def target(progress, resume):
+        progress.stage_started("transform")
+        started.set()
+        assert gate.wait(5)  # etapa sem nenhum callback de progresso
+        return None
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(scraping, "HEARTBEAT_INTERVAL", 0.05)
+    monkeypatch.setattr(runner, "stale_after", 0.3)
+    monkeypatch.setattr(runner, "target", target)
+    monkeypatch.setattr(runner, "_executor", executor)
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+    try:
+        job_id = client.post('/api/v1/scraping/trigger', headers=headers).get_json()["job_id"]
+        assert started.wait(5)
+        real_threading.Event().wait(0.8)  # mais que stale_after sem progresso
+        assert client.post('/api/v1/scraping/trigger', headers=headers).status_code == 400
+        assert runner.get(job_id).status == scraping.RUNNING
+    finally:
+        gate.set()
+        executor.shutdown(wait=True)
+    app_module.db.session.expire_all()
+    assert runner.get(job_id).status == scraping.FINISHED
+
+    calls = []
+    monkeypatch.setattr(runner, "recover", lambda: calls.append(os.getpid()))
+    monkeypatch.setattr(app_module, "_worker_pid", None)
+    client.get('/')
+    client.get('/')
+    assert calls == [os.getpid()]
+
+
+def _sse_events(chunks):
+    """Lê (id, evento, dados) de um stream SSE até o evento finished"""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while "\n\n" in buffer:
+            block, buffer = buffer.split("\n\n", 1)
+            fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+            if fields:
+                yield fields.get("id"), fields["event"], json.loads(fields["data"])
+                if fields["event"] == "finished":
+                    return
+
+
+def test_scraping_events_stream_progress_from_callbacks(client, monkeypatch):
+    """Testa o stream SSE: snapshot, eventos dos callbacks do scraper na hora e retomada por Last-Event-ID"""
+    from concurrent.futures import ThreadPoolExecutor
+    from services.jobs import events
+
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+    assert client.get('/api/v1/scraping/events?job_id=999999', headers=headers).status_code == 404
+
+    gate = real_threading.Event()
+
+    def target(progress, resume):
+        progress.crawl_started(["Poetry"], 2)
+        progress.category_started("Poetry", 2, 1)
+        assert gate.wait(5)  # só avança depois que o cliente está conectado
+        progress.page_done("Poetry", 2)
+        progress.category_finished("Poetry")
+        return None
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(events, "SSE_POLL_S", 0.05)
+    monkeypatch.setattr(app_module.scrape_jobs, "events", events.ScrapeEventBus())
+    monkeypatch.setattr(app_module.scrape_jobs, "target", target)
+    monkeypatch.setattr(app_module.scrape_jobs, "_executor", executor)
+    try:
+        job_id = client.post('/api/v1/scraping/trigger', headers=headers).get_json()["job_id"]
+        response = client.get(f'/api/v1/scraping/events?job_id={job_id}', headers=headers, buffered=False)
+        assert response.mimetype == "text/event-stream"
+        received = []
+        for event in _sse_events(response.response):
+            received.append(event)
+            gate.set()
+        response.close()
+    finally:
+        gate.set()
+        executor.shutdown(wait=True)
+
+    kinds = [kind for _, kind, _ in received]
+    assert kinds[0] == "snapshot" and received[0][2]["job_id"] == job_id
+    assert kinds[-1] == "finished" and received[-1][2]["status"] == "finished"
+    assert "page_done" in kinds and "category_finished" in kinds
+    page = next(data for _, kind, data in received if kind == "page_done")
+    assert (page["category"], page["pages_scraped"], page["books_scraped"]) == ("Poetry", 1, 2)
+
+    # Reconexão: continua depois do último id visto, sem snapshot
+    replay = client.get(f'/api/v1/scraping/events?job_id={job_id}',
+                        headers={**headers, "Last-Event-ID": "2"}, buffered=False)
+    replayed = list(_sse_events(replay.response))
+    replay.close()
+    assert [int(i) for i, _, _ in replayed] == list(range(3, app_module.scrape_jobs.events.last_id(job_id) + 1))
+    assert replayed[0][1] != "snapshot" and replayed[-1][1] == "finished"
+
+    # Job já terminado e sem eventos neste processo: snapshot + finished do banco
+    monkeypatch.setattr(app_module.scrape_jobs, "events", events.ScrapeEventBus())
+    done = list(_sse_events(client.get(f'/api/v1/scraping/events?job_id={job_id}', headers=headers).response))
+    assert [kind for _, kind, _ in done] == ["snapshot", "finished"]
+
+
+def test_price_history_and_price_changes(client, monkeypatch, tmp_path):
+    """Testa o histórico particionado por data e as mudanças de preço desde uma data"""
+    from services.pipeline import history
+
+    def run(day, prices, instock=5):
+        df = pd.DataFrame([{"id": book_id, "title": book_id, "category": "poetry",
+                            "raw_price": price, "instock": instock, "rating": 3}
+                           for book_id, price in prices.items()])
+        history.append_snapshot(df, datetime.fromisoformat(day), history_dir=tmp_path)
+
+    run("2026-01-01T10:00:00", {"a": 10.0, "b": 20.0})
+    run("2026-01-02T10:00:00", {"a": 12.0, "b": 20.0}, instock=4)
+    run("2026-01-03T10:00:00", {"a": 11.0, "b": 18.0})
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "scrape_date=2026-01-01", "scrape_date=2026-01-02", "scrape_date=2026-01-03"]
+
+    monkeypatch.setattr(history, "HISTORY_DIR", tmp_path)
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+
+    data = client.get('/api/v1/books/a/history', headers=headers).get_json()
+    assert [h["raw_price"] for h in data["history"]] == [10.0, 12.0, 11.0]
+    assert [h["instock"] for h in data["history"]] == [5.0, 4.0, 5.0]
+    assert data["history"][0]["scraped_at"] == "2026-01-01T10:00:00"
+    assert client.get('/api/v1/books/zzz/history', headers=headers).status_code == 404
+
+    # A execução de 01/01 é a base: a mudança 10 -> 12 coletada em 02/01 aparece
+    stats = client.get('/api/v1/stats/price-changes?since=2026-01-02', headers=headers).get_json()
+    assert (stats["total"], stats["increases"], stats["decreases"]) == (3, 1, 2)
+    assert {(c["id"], c["old_price"], c["new_price"]) for c in stats["changes"]} == {
+        ("a", 10.0, 12.0), ("a", 12.0, 11.0), ("b", 20.0, 18.0)}
+
+    # Só uma execução depois de since: as mudanças todas atravessam a fronteira
+    stats = client.get('/api/v1/stats/price-changes?since=2026-01-03', headers=headers).get_json()
+    assert {(c["id"], c["old_price"], c["new_price"]) for c in stats["changes"]} == {
+        ("a", 12.0, 11.0), ("b", 20.0, 18.0)}
+    assert history.price_changes(datetime(2026, 1, 1), tmp_path).shape[0] == 3  # sem base anterior
+    assert client.get('/api/v1/stats/price-changes?since=ontem', headers=headers).status_code == 400
+
+
+def test_export_sends_published_file_or_streams_columns(client, monkeypatch, tmp_path):
+    """Testa a exportação: arquivo publicado sem filtro e lotes Arrow/Parquet/CSV com colunas"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from services.resources import export
+    from services.resources.Extract import Extract
+    from services.scraper.transformers.clean_books import publish
+
+    books = pd.DataFrame([{"id": f"livro_{i}", "title": f"livro {i}", "category": "poetry",
+                           "raw_price": 10.25 + i, "rating": i % 6} for i in range(25)])
+    publish(books, tmp_path)
+    monkeypatch.setattr(export, "BATCH_ROWS", 10)  # força vários lotes
+    monkeypatch.setattr(app_module, "extract", Extract(csv_path=str(tmp_path / "books.csv"),
+                                                       manifest_path=str(tmp_path / "manifest.json")))
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+
+    full = client.get('/api/v1/export?format=parquet', headers=headers)
+    assert full.status_code == 200
+    assert full.data == (tmp_path / "books.parquet").read_bytes()
+    assert "books-v1.parquet" in full.headers["Content-Disposition"]
+    full.close()
+
+    arrow = client.get('/api/v1/export?format=arrow&columns=id,raw_price', headers=headers)
+    assert arrow.is_streamed
+    table = pa.ipc.open_stream(arrow.data).read_all()
+    assert table.column_names == ["id", "raw_price"]
+    assert table.column("raw_price").to_pylist() == books["raw_price"].tolist()
+
+    parquet = client.get('/api/v1/export?format=parquet&columns=title', headers=headers)
+    table = pq.read_table(io.BytesIO(parquet.data))
+    assert table.column_names == ["title"] and table.num_rows == 25
+
+    csv = client.get('/api/v1/export?format=csv&columns=id,rating', headers=headers)
+    exported = pd.read_csv(io.BytesIO(csv.data), encoding="utf-8-sig")
+    assert exported.columns.tolist() == ["id", "rating"]
+    assert exported["rating"].tolist() == books["rating"].tolist()
+
+    assert client.get('/api/v1/export?format=xml', headers=headers).status_code == 400
+    assert client.get('/api/v1/export?columns=nao_existe', headers=headers).status_code == 400
+
+
+def test_export_published_file_with_relative_catalog_path(client, monkeypatch, tmp_path):
+    """Testa o envio do arquivo publicado com o caminho relativo padrão (data/silver/books.csv)"""
+    from services.resources.Extract import Extract
+    from services.scraper.transformers.clean_books import publish
+
+    publish(pd.DataFrame([{"id": "livro_1", "title": "livro", "category": "poetry",
+                           "raw_price": 10.0, "rating": 3}]), tmp_path / "data" / "silver")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app_module, "extract", Extract(csv_path="data/silver/books.csv",
+                                                       manifest_path="data/silver/manifest.json"))
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+
+    for fmt in ("csv", "parquet"):
+        response = client.get(f'/api/v1/export?format={fmt}', headers=headers)
+        assert response.status_code == 200
+        assert response.data == (tmp_path / "data" / "silver" / f"books.{fmt}").read_bytes()
+        response.close()
+
+
+def test_training_data_features_cached_per_version(client, monkeypatch, tmp_path):
+    """Testa a matriz de features: paginação, download Parquet e cache por versão"""
+    import pyarrow.parquet as pq
+    from services.ml import features
+
+    catalog = _silver_catalog(tmp_path, [
+        {"id": f"livro_{i}", "title": f"the lost {'river' if i % 2 else 'king'}", "instock": i,
+         "category": ["poetry", "travel"][i % 2], "raw_price": 10.0 + i, "rating": i % 6}
+        for i in range(12)
+    ])
+    monkeypatch.setattr(app_module, "extract", catalog)
+    monkeypatch.setattr(features, "FEATURES_DIR", tmp_path / "features")
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+
+    page = client.get('/api/v1/ml/training-data?offset=10&limit=5', headers=headers).get_json()
+    assert page["total"] == 12 and page["ids"] == ["livro_10", "livro_11"]
+    assert page["labels"] == [4, 5]
+    assert len(page["X"][0]) == len(page["features"])
+    row = dict(zip(page["features"], page["X"][1]))
+    assert row["cat=travel"] == 1.0 and row["cat=poetry"] == 0.0 and row["title_tokens"] == 3.0
+
+    # Segunda leitura vem do cache: nada é recalculado
+    monkeypatch.setattr(features, "build_matrix", lambda *a: pytest.fail("features recalculadas"))
+    download = client.get('/api/v1/ml/training-data?format=parquet', headers=headers)
+    table = pq.read_table(io.BytesIO(download.data))
+    assert table.num_rows == 12 and table.column_names[:3] == ["id", "label", "price_z"]
+    download.close()
+
+    # Processo reiniciado (catálogo recarregado, mesma versão): features lidas do disco
+    monkeypatch.setattr(app_module, "extract", type(catalog)(catalog.csv_path, catalog.manifest_path))
+    assert client.get('/api/v1/ml/training-data?limit=1', headers=headers).get_json()["total"] == 12
+
+
+def test_predictions_use_preloaded_model(client, monkeypatch, tmp_path):
+    """Testa previsões em lote: modelo treinado uma vez a partir das features e latência reportada"""
+    from services.ml import features
+    from services.ml.model import ModelHolder
+
+    monkeypatch.setattr(app_module, "extract", _silver_catalog(tmp_path, [
+        {"id": f"livro_{i}", "title": f"livro {i}", "category": "poetry",
+         "raw_price": 10.0 + i, "instock": i, "rating": i % 6} for i in range(30)
+    ]))
+    monkeypatch.setattr(features, "FEATURES_DIR", tmp_path / "features")
+    monkeypatch.setattr(app_module, "rating_model", ModelHolder(tmp_path / "model.npz"))
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+
+    books = [{"title": "livro novo", "category": "poetry", "raw_price": 12.5, "instock": 2},
+             {"title": "outro", "category": "desconhecida"}]
+    response = client.post('/api/v1/ml/predictions', headers=headers, json={"books": books})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data["predictions"]) == 2
+    assert all(0 <= p["rating"] <= 5 for p in data["predictions"])
+    assert data["latency_ms"]["total"] >= data["latency_ms"]["inference"] >= 0
+    assert (tmp_path / "model.npz").exists()
+
+    single = client.post('/api/v1/ml/predictions', headers=headers, json={"book": books[0]}).get_json()
+    assert single["predictions"] == data["predictions"][:1]
+    assert client.post('/api/v1/ml/predictions', headers=headers, json={"books": "x"}).status_code == 400
+
+
+def test_similar_books_served_from_precomputed_table(client, monkeypatch, tmp_path):
+    """Testa os livros parecidos lidos da tabela do ETL, sem cálculo na requisição"""
+    from services.ml import similar
+    from services.resources.Extract import Extract
+    from services.scraper.transformers.clean_books import publish
+
+    books = pd.DataFrame([
+        {"id": "a", "title": "the black maria", "category": "poetry", "raw_price": 20.0, "rating": 4},
+        {"id": "b", "title": "the black dust", "category": "poetry", "raw_price": 21.0, "rating": 4},
+        {"id": "c", "title": "sharp objects", "category": "mystery", "raw_price": 50.0, "rating": 1},
+        {"id": "d", "title": "black river", "category": "poetry", "raw_price": 22.0, "rating": 5},
+    ])
+    manifest = publish(books, tmp_path)
+    similar.save_neighbours(books, *similar.build_neighbours(books, k=3), manifest["version"], tmp_path)
+
+    monkeypatch.setattr(similar, "build_neighbours", lambda *a, **kw: pytest.fail("vizinhos recalculados"))
+    monkeypatch.setattr(app_module, "extract", Extract(csv_path=str(tmp_path / "books.csv"),
+                                                       manifest_path=str(tmp_path / "manifest.json")))
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+
+    data = client.get('/api/v1/books/a/similar?k=2', headers=headers).get_json()
+    assert [b["id"] for b in data["similar"]] == ["b", "d"]
+    assert data["scores"][0] >= data["scores"][1]
+
+    assert client.get('/api/v1/books/zzz/similar', headers=headers).status_code == 404
+    assert client.get('/api/v1/books/a/similar?k=0', headers=headers).status_code == 400
+
+    # Tabela de outra versão: 503 sem calcular na requisição; o warmup calcula em memória
+    stale = publish(books, tmp_path)
+    assert stale["version"] == manifest["version"] + 1
+    unavailable = client.get('/api/v1/books/a/similar?k=2', headers=headers)
+    assert unavailable.status_code == 503 and unavailable.headers["Retry-After"]
+    monkeypatch.setattr(similar, "build_neighbours", lambda df, *a, **kw: (
+        np.array([[1, 3, 2], [0, 3, 2], [0, 1, 3], [1, 0, 2]], dtype=np.int32),
+        np.array([[0.9, 0.8, 0.1]] * 4, dtype=np.float32)))
+    app_module.extract.warm()
+    assert [b["id"] for b in client.get('/api/v1/books/a/similar?k=2', headers=headers).get_json()["similar"]] == ["b", "d"]
+
+
+def test_ready_reports_warmup_and_serves_prerendered_responses(client, monkeypatch, tmp_path):
+    """Testa o /ready (503 até o warmup) e as respostas pré-renderizadas da versão aquecida"""
+    from services.resources.Extract import Extract
+    from services.resources.warmup import Warmup
+
+    monkeypatch.setattr(app_module, "warmup", Warmup())
+    monkeypatch.setattr(app_module, "extract", Extract(csv_path=str(tmp_path / "ausente.csv")))
+    assert client.get('/api/v1/ready').status_code == 503  # público e ainda não aquecido
+    assert app_module.run_warmup(ml=False) is False
+    failed = client.get('/api/v1/ready')
+    assert failed.status_code == 503 and failed.get_json()["status"] == "failed"
+
+    (tmp_path / "silver").mkdir()
+    catalog = _silver_catalog(tmp_path / "silver", [
+        {"id": f"livro_{i}", "title": f"livro {i}", "category": "poetry" if i % 2 else "travel",
+         "raw_price": 10.0 + i, "rating": i % 6} for i in range(8)
+    ])
+    monkeypatch.setattr(app_module, "extract", catalog)
+    assert app_module.run_warmup(ml=False) is True
+
+    ready = client.get('/api/v1/ready')
+    assert ready.status_code == 200
+    data = ready.get_json()
+    assert data["status"] == "ready" and data["catalog_version"] == catalog.snapshot().version
+    assert {"catalog", "indexes", "responses", "neighbours"} <= set(data["steps"])
+
+    # As rotas quentes servem os bytes renderizados no warmup
+    catalog.load_books = lambda: pytest.fail("não deveria recarregar o catálogo")
+    headers = {"Authorization": f"Bearer {create_access_token(identity='u')}"}
+    books = client.get('/api/v1/books', headers=headers)
+    assert books.data == catalog.snapshot().cached("response:books", None)
+    assert len(books.get_json()) == 8
+    assert client.get('/api/v1/categories', headers=headers).get_json()["total"] == 2
+    assert client.get('/api/v1/stats/overview', headers=headers).get_json()["total_books"] == 8
+
+
+def test_background_warmup_starts_on_first_request_of_the_process(client, monkeypatch):
+    """Testa que o warmup em background sobe na primeira requisição do processo (seguro com pre-fork --preload)"""
+    warmed = real_threading.Event()
+    monkeypatch.setattr(app_module, "WARMUP_MODE", "background")
+    monkeypatch.setattr(app_module, "run_warmup", lambda: warmed.set())
+    monkeypatch.setattr(app_module.scrape_jobs, "recover", lambda: None)
+    monkeypatch.setattr(app_module, "_worker_pid", os.getpid())
+    client.get('/api/v1/ready')
+    assert not warmed.is_set()  # processo já iniciado: nada a fazer
+
+    monkeypatch.setattr(app_module, "_worker_pid", os.getpid() + 1)  # como um worker recém-criado pelo fork
+    client.get('/api/v1/ready')
+    assert warmed.wait(5)
+
+
+def test_request_profiling_by_admin_header_and_sampling(client, monkeypatch, tmp_path):
+    """Testa o profiling sob demanda: header só para admin, fases, amostragem e download protegido"""
+    import pstats
+    from services.auth import admin
+    from services.monitoring import profiling
+
+    monkeypatch.setattr(admin, "ADMIN_USERS", {"chefe"})
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path / "profiles")
+    monkeypatch.setattr(app_module, "extract", _silver_catalog(tmp_path, [
+        {"id": f"livro_{i}", "title": f"livro {i}", "category": "poetry",
+         "raw_price": 10.0 + i, "rating": i % 6} for i in range(20)
+    ]))
+    chefe = {"Authorization": f"Bearer {create_access_token(identity='chefe')}"}
+    comum = {"Authorization": f"Bearer {create_access_token(identity='comum')}"}
+
+    # Usuário comum: header ignorado e rotas de admin negadas
+    response = client.get('/api/v1/books/query?min_rating=2', headers={**comum, "X-Profile": "sample"})
+    assert response.status_code == 200 and "X-Profile-Id" not in response.headers
+    assert client.get('/api/v1/admin/profiles', headers=comum).status_code == 403
+
+    sampled = client.get('/api/v1/books/query?min_rating=2', headers={**chefe, "X-Profile": "sample"})
+    profile_id = sampled.headers["X-Profile-Id"]
+    listed = client.get('/api/v1/admin/profiles', headers=chefe).get_json()["profiles"]
+    assert [p["id"] for p in listed] == [profile_id]
+    assert listed[0]["reason"] == "header" and listed[0]["path"] == "/api/v1/books/query"
+    assert {"auth", "load", "filter", "serialize", "log"} <= set(listed[0]["phases_ms"])
+    collapsed = client.get(f'/api/v1/admin/profiles/{profile_id}?format=collapsed', headers=chefe)
+    assert collapsed.status_code == 200 and collapsed.mimetype == "text/plain"
+    assert client.get(f'/api/v1/admin/profiles/{profile_id}?format=prof', headers=chefe).status_code == 404
+
+    deterministic = client.get('/api/v1/books', headers={**chefe, "X-Profile": "cprofile"})
+    prof = profiling.profile_file(deterministic.headers["X-Profile-Id"], "prof")
+    assert pstats.Stats(str(prof)).total_calls > 0
+    assert client.get('/api/v1/admin/profiles/..%2Fsegredo', headers=chefe).status_code == 404
+
+    # Amostragem: perfila sem header, inclusive rotas públicas
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    response = client.get('/api/v1/health')
+    assert "X-Profile-Id" in response.headers
+    meta = json.loads(profiling.profile_file(response.headers["X-Profile-Id"], "json").read_text())
+    assert meta["reason"] == "sampled" and meta["status"] == 200
+
+
+def test_profile_phases_do_not_exceed_wall_time(client, monkeypatch, tmp_path):
+    """Testa que log, rate limit e JWT do before_request não entram em filter nem contam duas vezes"""
+    from services.auth import admin
+    from services.auth.rate_limit import ApiRateLimiter
+    from services.monitoring import profiling
+
+    monkeypatch.setattr(admin, "ADMIN_USERS", {"chefe"})
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path / "profiles")
+    monkeypatch.setattr(app_module, "extract", _silver_catalog(tmp_path, [
+        {"id": "livro_1", "title": "livro", "category": "poetry", "raw_price": 10.0, "rating": 3}]))
+    monkeypatch.setattr(app_module, "api_limiter", ApiRateLimiter(burst=1000, per_minute=1000))
+    headers = {"Authorization": f"Bearer {create_access_token(identity='chefe')}", "X-Profile": "sample"}
+
+    # before_request lento (log e rate limit): deve aparecer em log e auth, não em filter
+    real_check = app_module.api_limiter.check
+
+    def slow_check(*args):
+        real_threading.Event().wait(0.1)
+        return real_check(*args)
+
+    monkeypatch.setattr(app_module.api_limiter, "check", slow_check)
+    monkeypatch.setattr(app_module.logger, "info", lambda *a, **kw: real_threading.Event().wait(0.05))
+
+    response = client.get('/api/v1/categories', headers=headers)
+    meta = json.loads(profiling.profile_file(response.headers["X-Profile-Id"], "json").read_text())
+    phases = meta["phases_ms"]
+    assert sum(phases.values()) <= meta["duration_ms"] + 1
+    assert phases["auth"] >= 100 and phases["log"] >= 50
+    assert phases["filter"] < 50
+
+
+def test_memory_report_accounts_catalog_and_sampled_routes(client, monkeypatch, tmp_path):
+    """Testa a contabilidade de memória: catálogo por coluna, caches derivados e pico por rota"""
+    from services.auth import admin
+    from services.monitoring import memory
+
+    monkeypatch.setattr(admin, "ADMIN_USERS", {"chefe"})
+    monkeypatch.setattr(memory, "allocations", memory.RouteAllocations())
+    monkeypatch.setattr(app_module, "extract", _silver_catalog(tmp_path, [
+        {"id": f"livro_{i}", "title": f"livro {i}", "category": "poetry",
+         "raw_price": 10.0 + i, "rating": i % 6} for i in range(50)
+    ]))
+    chefe = {"Authorization": f"Bearer {create_access_token(identity='chefe')}"}
+    comum = {"Authorization": f"Bearer {create_access_token(identity='comum')}"}
+
+    # Sem amostragem nada é rastreado
+    monkeypatch.setattr(memory, "MEMORY_SAMPLE_RATE", 0.0)
+    client.get('/api/v1/books')
+    assert memory.allocations.to_dict() == {}
+
+    monkeypatch.setattr(memory, "MEMORY_SAMPLE_RATE", 1.0)
+    books = client.get('/api/v1/books', headers=comum)
+    client.get('/api/v1/books/search?title=livro', headers=comum)
+    client.get('/api/v1/stats/overview', headers=comum)
+    assert not tracemalloc.is_tracing()
+
+    assert client.get('/api/v1/admin/memory', headers=comum).status_code == 403
+    report = client.get('/api/v1/admin/memory', headers=chefe).get_json()
+    assert {"books", "search", "stats_overview"} <= set(report["routes"])
+    assert report["routes"]["books"]["samples"] == 1 and report["routes"]["books"]["peak_mb_max"] >= 0
+    assert report["routes"]["search"]["top_sites_at_max"]
+    catalog = report["catalog"]
+    assert catalog["rows"] == 50 and {"id", "title", "raw_price"} <= set(catalog["columns_mb"])
+    assert "response:books" in catalog["derived_mb"]
+    assert memory.deep_nbytes(books.data) >= len(books.data)
+    assert catalog["total_mb"] >= catalog["frame_mb"]
+
+    analytics = client.get('/api/v1/analytics', headers=comum).get_json()
+    assert analytics["memory"]["catalog_mb"] == catalog["frame_mb"]
+    assert set(analytics["memory"]["routes_peak_mb"]) == set(report["routes"])
 
 
 def test_get_scraping_status_requires_jwt(client):
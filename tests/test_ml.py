@@ -0,0 +1,109 @@
+import sys
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.ml.features import build_matrix
+from services.ml.model import MicroBatcher, ModelHolder, RatingModel
+from services.ml import similar
+
+
+def _catalog(n=60):
+    rng = np.random.default_rng(3)
+    rating = rng.integers(0, 6, n)
+    return pd.DataFrame({
+        "id": [f"livro_{i}" for i in range(n)],
+        "title": [f"the {'good' if r >= 3 else 'bad'} book {i}" for i, r in enumerate(rating)],
+        "category": rng.choice(["poetry", "travel"], n),
+        "raw_price": rng.uniform(10, 60, n),
+        "instock": rng.integers(0, 20, n),
+        "rating": rating,
+    })
+
+
+def test_model_trains_once_and_reloads_from_disk(tmp_path):
+    """Testa que o modelo é treinado uma vez, gravado e recarregado com as mesmas previsões"""
+    calls = []
+
+    def source():
+        calls.append(1)
+        return build_matrix(_catalog(), version=1)
+
+    holder = ModelHolder(tmp_path / "model.npz")
+    model = holder.get(source)
+    assert holder.get(source) is model and len(calls) == 1
+
+    X = model.spec.transform(pd.DataFrame([{"title": "the good book", "category": "poetry",
+                                            "raw_price": 20.0, "instock": 3}]))
+    reloaded = ModelHolder(tmp_path / "model.npz").get()
+    assert np.allclose(model.predict(X), reloaded.predict(X))
+    assert reloaded.trained_on == "1"
+    assert 0.0 <= float(model.predict(X)[0]) <= 5.0
+
+
+def test_micro_batcher_groups_concurrent_requests():
+    """Testa que pedidos concorrentes viram um único lote e cada um recebe suas linhas"""
+    sizes = []
+
+    def predict(X):
+        sizes.append(len(X))
+        return X[:, 0] * 10
+
+    batcher = MicroBatcher(predict, window_ms=200, max_rows=1000)
+    start = threading.Barrier(8)
+    results = [None] * 8
+
+    def request(i):
+        start.wait()
+        results[i] = batcher.submit(np.full((i + 1, 2), float(i))).result(timeout=5)
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(sizes) == sum(range(1, 9))
+    assert len(sizes) < 8  # agrupou pedidos
+    for i, result in enumerate(results):
+        assert result["predictions"].tolist() == [i * 10.0] * (i + 1)
+        assert result["inference_ms"] >= 0 and result["batch_requests"] >= 1
+
+
+def test_neighbours_match_brute_force_and_survive_roundtrip(tmp_path):
+    """Testa o top-k por candidatos do índice invertido contra o cálculo direto na categoria e a leitura da tabela"""
+    df = _catalog(50)
+    positions, scores = similar.build_neighbours(df, k=5, block_rows=7, window=64)
+
+    T = similar.title_tfidf(df["title"])
+    dense = T.toarray()
+    assert np.allclose(np.linalg.norm(dense, axis=1), 1, atol=1e-5)
+    assert np.allclose(T.dot(np.arange(50), np.zeros(50, dtype=np.int64)), dense @ dense[0], atol=1e-6)
+    bands = similar._price_bands(df["raw_price"])
+    rating = df["rating"].to_numpy(dtype=float)
+    category = df["category"].to_numpy()
+    for i in (0, 13, 49):
+        full = (similar.W_TITLE * (dense @ dense[i]) + similar.W_CATEGORY
+                + similar.W_PRICE * (bands == bands[i]) + similar.W_RATING * (1 - abs(rating - rating[i]) / 5))
+        full[(category != category[i]) | (np.arange(50) == i)] = -np.inf
+        assert np.allclose(np.sort(full)[::-1][:5], scores[i], atol=1e-5)
+        assert i not in positions[i]
+        assert (category[positions[i]] == category[i]).all()
+
+    # Categoria com um livro só: sem vizinhos (posições -1), gravados e lidos como lista vazia
+    lonely = pd.concat([df, df.iloc[[0]].assign(id="sozinho", category="unica")], ignore_index=True)
+    lonely_positions, lonely_scores = similar.build_neighbours(lonely, k=5)
+    assert (lonely_positions[50] == -1).all()
+    similar.save_neighbours(lonely, lonely_positions, lonely_scores, 8, tmp_path)
+    assert similar.load_neighbours(lonely, 8, tmp_path).lookup(50, 5)[0].tolist() == []
+    assert len(similar.load_neighbours(lonely, 8, tmp_path).lookup(0, 5)[0]) == 5
+
+    similar.save_neighbours(df, positions, scores, 7, tmp_path)
+    served = df.drop(index=[int(positions[0, 0])]).reset_index(drop=True)  # vizinho removido da versão
+    table = similar.load_neighbours(served, 7, tmp_path)
+    ids, _ = table.lookup(0, 5)
+    assert served["id"].iloc[ids].tolist() == df["id"].iloc[positions[0, 1:]].tolist()
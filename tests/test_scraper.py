@@ -0,0 +1,241 @@
+import sys
+import os
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import services.scraper.extractors.scrape_books as scrape_books
+
+BASE = scrape_books.BASE
+
+
+def _listing(category, books, page, pages):
+    items = "".join(
+        f'<li><h3><a href="../../../{b}/index.html" title="{b}">{b}</a></h3>'
+        f'<p class="star-rating Three"></p><p class="price_color">£10.00</p></li>'
+        for b in books)
+    nxt = f'<li class="next"><a href="page-{page + 1}.html">next</a></li>' if page < pages else ""
+    return (f'<form class="form-horizontal"><strong>{len(books) * pages}</strong> results</form>'
+            f'<li class="current">Page {page} of {pages}</li><ol class="row">{items}</ol><ul>{nxt}</ul>')
+
+
+def _fake_site():
+    """books.toscrape.com em miniatura: Poetry (2 páginas) e Travel (1 página)"""
+    index = ('<form class="form-horizontal"><strong>6</strong> results</form>'
+             '<ul class="nav nav-list"><li><ul>'
+             '<li><a href="catalogue/category/books/poetry_1/index.html">Poetry</a></li>'
+             '<li><a href="catalogue/category/books/travel_2/index.html">Travel</a></li>'
+             '</ul></li></ul>')
+    pages = {
+        BASE + "index.html": index,
+        BASE + "catalogue/category/books/poetry_1/index.html": _listing("poetry", ["p1", "p2"], 1, 2),
+        BASE + "catalogue/category/books/poetry_1/page-2.html": _listing("poetry", ["p3", "p4"], 2, 2),
+        BASE + "catalogue/category/books/travel_2/index.html": _listing("travel", ["t1", "t2"], 1, 1),
+    }
+    product = ('<table class="table table-striped"><tr><th>UPC</th><td>upc-{id}</td></tr>'
+               '<tr><th>Availability</th><td>In stock (7 available)</td></tr></table>')
+    return pages, product
+
+
+class _Response:
+    def __init__(self, url, text):
+        self.url = url
+        self.text = text
+        self.encoding = "utf-8"
+        self.headers = {}
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def fake_site(tmp_path, monkeypatch):
+    pages, product = _fake_site()
+    fetched = []
+    state = {"fail_on": None}
+
+    def get(url, timeout=None, **kwargs):
+        fetched.append(url)
+        if state["fail_on"] and state["fail_on"] in url:
+            raise RuntimeError("falha simulada")
+        if url in pages:
+            return _Response(url, pages[url])
+        book_id = url.rstrip("/").split("/")[-2]
+        return _Response(url, product.format(id=book_id))
+
+    monkeypatch.setattr(scrape_books.session, "get", get)
+    monkeypatch.setattr(scrape_books.time, "sleep", lambda s: None)
+    monkeypatch.setattr(scrape_books, "OUT_PATH", tmp_path / "books.csv")
+    monkeypatch.setattr(scrape_books, "CHECKPOINT_DIR", tmp_path / "_checkpoint")
+    return fetched, state, tmp_path
+
+
+def test_scraper_resumes_from_checkpoint(fake_site):
+    """Uma falha no meio do crawl não perde o que já foi coletado"""
+    fetched, state, tmp_path = fake_site
+
+    state["fail_on"] = "/t2/"
+    with pytest.raises(RuntimeError):
+        scrape_books.main(resume=False)
+
+    checkpoint = (tmp_path / "_checkpoint")
+    assert (checkpoint / "state.json").exists()
+    assert not (tmp_path / "books.csv").exists()
+
+    fetched.clear()
+    state["fail_on"] = None
+    df = scrape_books.main()  # retoma automaticamente
+
+    assert sorted(df["id"]) == ["p1", "p2", "p3", "p4", "t1", "t2"]
+    assert not any("poetry" in url or "/p1/" in url for url in fetched)
+    assert (df.loc[df["id"] == "p3", "instock"] == "7").all()
+    assert not checkpoint.exists()
+
+
+def test_scraper_fresh_run_ignores_checkpoint(fake_site):
+    fetched, state, tmp_path = fake_site
+
+    state["fail_on"] = "page-2"
+    with pytest.raises(RuntimeError):
+        scrape_books.main(resume=False)
+
+    fetched.clear()
+    state["fail_on"] = None
+    df = scrape_books.main(resume=False)
+
+    assert len(df) == 6
+    assert any("poetry_1/index.html" in url for url in fetched)
+
+
+def test_scraper_exports_network_and_parse_timings(fake_site):
+    scrape_books.main(resume=False)
+
+    snap = scrape_books.metrics.snapshot()
+    assert snap["phases"]["network:product"]["count"] == 6
+    assert snap["phases"]["parse:listing"]["count"] == 4  # index + 3 listagens
+    assert snap["network_s"] >= 0 and snap["parse_s"] > 0
+
+
+def test_session_retries_5xx_with_backoff():
+    """O adapter do transporte refaz GETs que recebem 5xx"""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from services.scraper.extractors.transport import build_session, retries_of
+
+    calls = []
+
+    class Flaky(BaseHTTPRequestHandler):
+        def do_GET(self):
+            calls.append(self.path)
+            status = 503 if len(calls) < 3 else 200
+            self.send_response(status)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Flaky)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        session = build_session(pool_size=2, retries=3, backoff=0.01, http2=False)
+        r = session.get(f"http://127.0.0.1:{server.server_port}/x", timeout=(2, 2))
+        assert r.status_code == 200
+        assert len(calls) == 3
+        assert retries_of(r) == 2
+    finally:
+        server.shutdown()
+
+
+def test_429_retried_once_per_attempt_and_http2_retry_count(monkeypatch):
+    """429 é refeito só pelo _get (RETRIES + 1 requisições, não o quadrado) e o HTTP/2 informa os retries"""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from services.scraper.extractors.transport import (
+        AdaptiveThrottle, build_session, retries_of, _Http2Response)
+
+    calls = []
+
+    class Limited(BaseHTTPRequestHandler):
+        def do_GET(self):
+            calls.append(self.path)
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Limited)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(scrape_books, "session", build_session(pool_size=2, retries=3, backoff=0.01, http2=False))
+    monkeypatch.setattr(scrape_books, "throttle", AdaptiveThrottle(max_delay=0.01))
+    monkeypatch.setattr(scrape_books, "RETRIES", 3)
+    try:
+        r = scrape_books._get(f"http://127.0.0.1:{server.server_port}/x", "page")
+        assert r.status_code == 429 and len(calls) == 4
+    finally:
+        server.shutdown()
+
+    class Raw:
+        url, status_code, headers, encoding = "http://x/", 200, {}, "utf-8"
+
+    assert retries_of(_Http2Response(Raw(), retried=2)) == 2
+
+
+def test_adaptive_throttle_aimd():
+    """Sobe a concorrência com respostas rápidas e recua em 429, erro e lentidão"""
+    from services.scraper.extractors.transport import AdaptiveThrottle
+
+    throttle = AdaptiveThrottle(min_concurrency=1, max_concurrency=8, initial=2, min_delay=0, max_delay=5)
+    for _ in range(40):
+        throttle.acquire()
+        throttle.release(0.01, status=200)
+    assert throttle.snapshot()["concurrency_limit"] == 8 and throttle.delay == 0
+
+    # 429 com Retry-After: metade da concorrência, intervalo > 0 e pausa até o prazo
+    throttle.acquire()
+    throttle.release(0.01, status=429, retry_after=0.2)
+    snap = throttle.snapshot()
+    assert snap["concurrency_limit"] == 4 and snap["delay_s"] > 0 and snap["throttled_429"] == 1
+    started = time.monotonic()
+    throttle.acquire()
+    assert time.monotonic() - started >= 0.15
+    throttle.release(0.01, status=200)
+
+    # Lentidão sem erro: só a concorrência cai
+    slow = AdaptiveThrottle(min_concurrency=1, max_concurrency=8, initial=8, min_delay=0)
+    slow.acquire()
+    slow.release(0.01)
+    for _ in range(3):
+        slow.acquire()
+        slow.release(0.2)
+    assert slow.limit < 8 and slow.delay == 0 and slow.decreases >= 1
+
+
+def test_scraper_backs_off_against_standin_server(tmp_path, monkeypatch):
+    """Crawl completo contra o site local com latência injetada que recusa (429) acima da capacidade"""
+    from benchmarks.scraper_throttle import StandinSite
+    from services.scraper.extractors.transport import AdaptiveThrottle, build_session
+
+    throttle = AdaptiveThrottle(max_concurrency=8, initial=2, max_delay=0.05)
+    monkeypatch.setattr(scrape_books, "session", build_session(pool_size=8, backoff=0.01, http2=False))
+    with StandinSite(categories=2, pages=2, latency_ms=10, jitter_ms=0,
+                     capacity=1, max_queue=1, retry_after=0) as site:
+        monkeypatch.setattr(scrape_books, "BASE", site.url)
+        monkeypatch.setattr(scrape_books, "START_URL", site.url + "index.html")
+        monkeypatch.setattr(scrape_books, "OUT_PATH", tmp_path / "books.csv")
+        monkeypatch.setattr(scrape_books, "CHECKPOINT_DIR", tmp_path / "_checkpoint")
+        monkeypatch.setattr(scrape_books, "IMAGES_DIR", tmp_path / "images")
+        monkeypatch.setattr(scrape_books, "throttle", throttle)
+        df = scrape_books.main(resume=False)
+
+    assert len(df) == 2 * 2 * 20 and df["instock"].eq("3").all()
+    snap = throttle.snapshot()
+    assert site.stats["rejected_429"] > 0 and snap["decreases"] > 0
+    assert site.stats["max_waiting"] == 1 and snap["in_flight"] == 0